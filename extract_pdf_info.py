@@ -1,7 +1,36 @@
 import os
-from PyPDF2 import PdfReader
 import re
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
+
+from pdf_document import DEFAULT_TEXT_PAGES, PdfDocument
+
+# Form fields holding the CIN and the reporting period of an AOC-4 filing
+CIN_FIELD = 'data[0].FormAOC4_Dtls[0].Segment1_PartA[0].CIN_C[0]'
+FROM_DATE_FIELD = 'data[0].FormAOC4_Dtls[0].Segment1_PartA[0].FromDate[0]'
+TO_DATE_FIELD = 'data[0].FormAOC4_Dtls[0].Segment1_PartA[0].ToDate[0]'
+INFO_FIELD_PATHS = frozenset((CIN_FIELD, FROM_DATE_FIELD, TO_DATE_FIELD))
+
+# Pattern for CIN: L followed by 5 digits, 2 letters, 4 digits, 3 letters, 6 digits
+CIN_PATTERN = re.compile(r'L[0-9]{5}[A-Z]{2}[0-9]{4}[A-Z]{3}[0-9]{6}')
+
+# Multiple patterns to match different financial year formats, in order of preference
+FINANCIAL_YEAR_PATTERNS = [
+    (re.compile(pattern, re.IGNORECASE), year_type) for pattern, year_type in [
+        (r'Financial Year\s*(\d{4}[-–]\d{2,4})', 'Financial Year'),
+        (r'FY\s*(\d{4}[-–]\d{2,4})', 'FY'),
+        (r'Year ended\s*(\d{1,2}(?:st|nd|rd|th)?\s*(?:March|April)\s*\d{4})', 'Year ended'),
+        (r'Year\s*(\d{4}[-–]\d{2,4})', 'Year'),
+        (r'(\d{4}[-–]\d{2,4})\s*Financial Year', 'Financial Year')
+    ]
+]
+
+# One pass of this pattern tells whether a piece of text can contain a CIN or a financial year at all
+SCAN_PATTERN = re.compile('|'.join(
+    [CIN_PATTERN.pattern] + [f'(?i:{pattern.pattern})' for pattern, _ in FINANCIAL_YEAR_PATTERNS]
+))
+
+# Characters of the previous pages searched again with a new page, so values split across pages are found
+SCAN_OVERLAP = 100
 
 
 def extract_cin(text: str) -> Optional[str]:
@@ -15,9 +44,7 @@ def extract_cin(text: str) -> Optional[str]:
     Returns:
         CIN if found, None otherwise
     """
-    # Pattern for CIN: L followed by 5 digits, 2 letters, 4 digits, 3 letters, 6 digits
-    cin_pattern = r'L[0-9]{5}[A-Z]{2}[0-9]{4}[A-Z]{3}[0-9]{6}'
-    match = re.search(cin_pattern, text)
+    match = CIN_PATTERN.search(text)
     return match.group(0) if match else None
 
 
@@ -31,144 +58,129 @@ def extract_financial_year(text: str) -> Optional[str]:
     Returns:
         Financial year if found, None otherwise
     """
-    # Multiple patterns to match different financial year formats
-    patterns = [
-        (r'Financial Year\s*(\d{4}[-–]\d{2,4})', 'Financial Year'),
-        (r'FY\s*(\d{4}[-–]\d{2,4})', 'FY'),
-        (r'Year ended\s*(\d{1,2}(?:st|nd|rd|th)?\s*(?:March|April)\s*\d{4})', 'Year ended'),
-        (r'Year\s*(\d{4}[-–]\d{2,4})', 'Year'),
-        (r'(\d{4}[-–]\d{2,4})\s*Financial Year', 'Financial Year')
-    ]
-    
-    for pattern, year_type in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern, year_type in FINANCIAL_YEAR_PATTERNS:
+        match = pattern.search(text)
         if match:
             return f"{year_type}: {match.group(1)}"
     
     return None
 
 
-def get_fields(obj, tree=None, retval=None, fileobj=None):
+def scan_pages_for_info(page_texts: Iterable[str], cin: Optional[str] = None,
+                        financial_year: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
     """
-    Extracts field data if this PDF contains interactive form fields.
-    The *tree* and *retval* parameters are for recursive use.
+    Search page texts for the CIN and the financial year, stopping as soon as both are known.
+    Pages are consumed one at a time, so with PdfDocument.iter_page_texts the pages after the one completing
+    the search are never extracted. A page is only searched with the individual patterns if the combined
+    SCAN_PATTERN matches in it; the values are then taken from the text read so far, so the financial year
+    comes from the first pages holding one, with the pattern preference of extract_financial_year.
+    Args:
+        page_texts: Iterable of page texts in page order
+        cin: CIN already known (e.g. from the form fields); not searched for
+        financial_year: Financial year already known; not searched for
+    Returns:
+        Tuple of (CIN, financial year)
     """
-    from collections import OrderedDict
-    fieldAttributes = {'/FT': 'Field Type', '/Parent': 'Parent', '/T': 'Field Name', '/TU': 'Alternate Field Name',
-                    '/TM': 'Mapping Name', '/Ff': 'Field Flags', '/V': 'Value', '/DV': 'Default Value'}
-    if retval is None:
-        retval = OrderedDict()
-        catalog = obj.trailer["/Root"]
-        # get the AcroForm tree
-        if "/AcroForm" in catalog:
-            tree = catalog["/AcroForm"]
-        else:
-            return None
-    if tree is None:
-        return retval
-
-    obj._check_kids(tree, retval, fileobj)
-    for attr in fieldAttributes:
-        if attr in tree:
-            # Tree is a field
-            obj._build_field(tree, retval, fileobj, fieldAttributes)
+    if cin and financial_year:
+        return cin, financial_year
+    text = ""
+    for page_text in page_texts:
+        start = max(0, len(text) - SCAN_OVERLAP)
+        text += page_text
+        if SCAN_PATTERN.search(text, start) is None:
+            continue
+        if not cin:
+            cin = extract_cin(text)
+        if not financial_year:
+            financial_year = extract_financial_year(text)
+        if cin and financial_year:
             break
-
-    if "/Fields" in tree:
-        fields = tree["/Fields"]
-        for f in fields:
-            field = f.get_object()
-            obj._build_field(field, retval, fileobj, fieldAttributes)
-
-    return retval
+    return cin, financial_year
 
 
 def get_form_fields(infile):
-    infile = PdfReader(open(infile, 'rb'))
-    fields = get_fields(infile)
-    if fields is None:
-        return {}
-    from collections import OrderedDict
-    return OrderedDict((k, v.get('/V', '')) for k, v in fields.items())
+    with PdfDocument(infile) as document:
+        return document.form_fields()
 
 
-def extract_text_from_pdf(pdf_path: str, max_pages: int = 5) -> str:
+def extract_text_from_pdf(pdf_path: str, max_pages: int = DEFAULT_TEXT_PAGES) -> str:
     """
-    Extract text from PDF pages using PyPDF2.
+    Extract text from PDF pages.
     Args:
         pdf_path: Path to PDF file
         max_pages: Maximum number of pages to process
     Returns:
         Combined text from all processed pages
     """
-    text = ""
     try:
-        reader = PdfReader(open(pdf_path, 'rb'))
-        for page_num in range(min(max_pages, len(reader.pages))):
-            page = reader.pages[page_num]
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text
+        with PdfDocument(pdf_path) as document:
+            return document.page_text(max_pages)
     except Exception as e:
-        print(f"Warning: Error extracting text from page {page_num + 1}: {e}")
-    return text
+        print(f"Warning: Error extracting text from {pdf_path}: {e}")
+        return ""
 
 
-def process_pdf(pdf_path: str) -> Tuple[Optional[str], Optional[str], Dict[str, str]]:
+def process_pdf(pdf_path: str, required_fields: Optional[frozenset] = None, raise_errors: bool = False
+                ) -> Tuple[Optional[str], Optional[str], Dict[str, str]]:
     """
-    Process a single PDF file and extract required information using PyPDF2.
+    Process a single PDF file and extract required information.
+    The PDF is opened once; the form fields and, if needed, the page text are read from the same document.
+    By default every form field is read; pass required_fields, e.g. INFO_FIELD_PATHS for the CIN and date fields,
+    to resolve only those.
     Args:
         pdf_path: Path to PDF file
+        required_fields: Field paths to read (None for all)
+        raise_errors: Raise errors reading the PDF instead of returning (None, None, {})
     Returns:
         Tuple of (CIN, financial year, form fields)
     """
     try:
-        # Get form fields
-        form_fields = get_form_fields(pdf_path)
-        # Try to extract CIN and financial year from form fields first
-        cin = form_fields.get('data[0].FormAOC4_Dtls[0].Segment1_PartA[0].CIN_C[0]')
-        from_date = form_fields.get('data[0].FormAOC4_Dtls[0].Segment1_PartA[0].FromDate[0]')
-        to_date = form_fields.get('data[0].FormAOC4_Dtls[0].Segment1_PartA[0].ToDate[0]')
-        if from_date and to_date:
-            financial_year = f"{from_date} to {to_date}"
-        else:
-            financial_year = None
-        # If not found in form fields, fall back to text extraction
-        if not cin or not financial_year:
-            text = extract_text_from_pdf(pdf_path)
-            if not cin:
-                cin = extract_cin(text)
-            if not financial_year:
-                financial_year = extract_financial_year(text)
+        with PdfDocument(pdf_path) as document:
+            # Get form fields
+            form_fields = document.form_fields(required=required_fields)
+            # Try to extract CIN and financial year from form fields first
+            cin = form_fields.get(CIN_FIELD)
+            from_date = form_fields.get(FROM_DATE_FIELD)
+            to_date = form_fields.get(TO_DATE_FIELD)
+            if from_date and to_date:
+                financial_year = f"{from_date} to {to_date}"
+            else:
+                financial_year = None
+            # If not found in form fields, fall back to the page text, extracted only until both are found
+            if not cin or not financial_year:
+                cin, financial_year = scan_pages_for_info(document.iter_page_texts(), cin, financial_year)
         return cin, financial_year, form_fields
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error processing {pdf_path}: {e}")
         return None, None, {}
 
 
 def main():
+    # filing_index reads the PDFs with process_pdf, so it is imported here rather than at module level
+    from filing_index import FILING_INDEX_PATH, KIND_NO_XBRL, lookup_filings, open_filing_index, update_filing_index
+
     # Directory containing No-XBRL PDFs
     input_dir = "No_XBRL"
     if not os.path.exists(input_dir):
         print(f"Error: Directory '{input_dir}' does not exist")
         return
-    # Get all PDF files
-    pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
-    if not pdf_files:
+    # Index new and changed PDFs; unchanged ones are read from the filing index
+    conn = open_filing_index(FILING_INDEX_PATH)
+    try:
+        counts = update_filing_index(conn, {KIND_NO_XBRL: input_dir})
+        filings = [filing for filing in lookup_filings(conn) if filing["kind"] == KIND_NO_XBRL]
+    finally:
+        conn.close()
+    if not filings:
         print(f"No PDF files found in {input_dir}")
         return
-    print(f"Found {len(pdf_files)} PDF files to process")
-    # Process each PDF file
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(input_dir, pdf_file)
-        cin, financial_year, form_fields = process_pdf(pdf_path)
-        print(f"\nFile: {pdf_file}")
-        print(f"CIN: {cin if cin else 'Not found'}")
-        print(f"Financial Year: {financial_year if financial_year else 'Not found'}")
-        # if form_fields:
-        #     print("\nForm Fields Found:")
-        #     for field_name, field_value in form_fields.items():
-        #         print(f"{field_name}: {field_value}")
+    print(f"Found {len(filings)} PDF files ({counts['indexed'] + counts['copied']} newly indexed)")
+    for filing in sorted(filings, key=lambda filing: filing["path"]):
+        print(f"\nFile: {os.path.basename(filing['path'])}")
+        print(f"CIN: {filing['cin'] if filing['cin'] else 'Not found'}")
+        print(f"Financial Year: {filing['financial_year'] if filing['financial_year'] else 'Not found'}")
 
 
 if __name__ == "__main__":
@@ -1,10 +1,14 @@
+import argparse
 import os
 import subprocess
-import camelot
 from PyPDF2 import PdfReader
 import pikepdf
 import pandas as pd
 
+from pdf_document import PdfDocument
+from process_pool import process_pool
+from table_page_detector import detect_table_pages, format_page_ranges, parse_page_ranges, split_page_chunks
+
 # Get the absolute path to the current script's directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -12,6 +16,12 @@ SIGNED_PDF_PATH = os.path.join(BASE_DIR, "No_XBRL", "2__Form_AOC-4-13122024_sign
 UNSIGNED_PDF_PATH = os.path.join(BASE_DIR, "No_XBRL", "2__Form_AOC-4-13122024_unsigned.pdf")
 OCR_PDF_PATH = os.path.join(BASE_DIR, "No_XBRL", "2__Form_AOC-4-13122024_ocr.pdf")
 
+# Page chunks per worker in parallel Camelot runs; a few chunks per worker even out pages of different cost
+CHUNKS_PER_WORKER = 4
+
+# Options passed to ocrmypdf before the input and output paths
+OCRMYPDF_ARGS = ("--force-ocr",)
+
 def run_qpdf(input_path, output_path):
     print(f"Removing signature using qpdf: {input_path} -> {output_path}")
     try:
@@ -24,27 +34,108 @@ def run_qpdf(input_path, output_path):
 def run_ocrmypdf(input_path, output_path):
     print(f"Running OCR with ocrmypdf: {input_path} -> {output_path}")
     try:
-        subprocess.run(["ocrmypdf", "--force-ocr", input_path, output_path], check=True)
+        subprocess.run(["ocrmypdf", *OCRMYPDF_ARGS, input_path, output_path], check=True)
     except Exception as e:
         print(f"ocrmypdf failed: {e}")
         return False
     return True
 
-def extract_tables_with_camelot(pdf_path):
+def ocrmypdf_version():
+    """Return the version reported by the installed ocrmypdf, or None if it cannot be run"""
+    try:
+        result = subprocess.run(["ocrmypdf", "--version"], check=True, capture_output=True, text=True)
+    except Exception:
+        return None
+    return result.stdout.strip()
+
+def select_camelot_pages(pdf_path, pages="auto"):
+    """
+    Resolve the pages argument of extract_tables_with_camelot into a Camelot pages string.
+    With "auto", only the pages selected by the table page detector (table_page_detector.py) are returned;
+    any other value (e.g. "all" or "1,3-5") is passed through.
+    Returns:
+        str: Camelot pages string, or None if no page is worth analysing
+    """
+    if pages != "auto":
+        return pages
+    try:
+        table_pages = detect_table_pages(pdf_path)
+    except Exception as e:
+        print(f"Table page detection failed, analysing all pages: {e}")
+        return "all"
+    if not table_pages:
+        return None
+    pages = format_page_ranges(table_pages)
+    print(f"Sending {len(table_pages)} page(s) to Camelot: {pages}")
+    return pages
+
+def read_tables_chunk(pdf_path, pages):
+    """Run Camelot on one chunk of pages. Runs in worker processes, so the tables are returned as a plain list."""
+    import camelot
+
+    return list(camelot.read_pdf(pdf_path, pages=pages, strip_text='\n'))
+
+def read_tables_parallel(pdf_path, pages, workers):
+    """
+    Run Camelot over the pages in a pool of worker processes.
+    The pages are split into chunks of consecutive pages, each chunk is read by one worker, and the tables of
+    the chunks are concatenated in chunk order. Every table keeps the page number and order Camelot gave it, so
+    the merged TableList is the one a single read_pdf call over the same pages returns, and exports the same files.
+    Args:
+        pdf_path: Path of the PDF
+        pages: Camelot pages string, e.g. "all" or "2-5,9"
+        workers: Number of worker processes
+    Returns:
+        TableList
+    """
+    import camelot
+    from camelot.core import TableList
+
+    with PdfDocument(pdf_path) as document:
+        page_count = len(document.reader.pages)
+    page_numbers = parse_page_ranges(pages, page_count)
+    chunks = [format_page_ranges(chunk)
+              for chunk in split_page_chunks(page_numbers, workers * CHUNKS_PER_WORKER)]
+    if len(chunks) <= 1:
+        return camelot.read_pdf(pdf_path, pages=pages, strip_text='\n')
+    print(f"Reading {len(page_numbers)} page(s) in {len(chunks)} chunk(s) with {workers} worker processes")
+    with process_pool(min(workers, len(chunks))) as executor:
+        # map() yields the chunks in submission order, i.e. in page order
+        chunk_tables = list(executor.map(read_tables_chunk, [pdf_path] * len(chunks), chunks))
+    return TableList([table for tables in chunk_tables for table in tables])
+
+def extract_tables_with_camelot(pdf_path, pages="auto", workers=1, output_dir=None):
+    """
+    Extract the tables of a PDF with Camelot and save them as Excel, CSV and JSON in output_dir
+    (default: Extracted_Tables).
+    Returns:
+        int: Number of tables saved, or None if the extraction failed
+    """
+    # Camelot is imported only where it runs, so the signature and OCR steps can be imported without it
+    import camelot
+
     found_any = False
+    pages = select_camelot_pages(pdf_path, pages)
+    if pages is None:
+        print("No table pages detected.")
+        return 0
     try:
-        tables = camelot.read_pdf(pdf_path, pages="all", strip_text='\n')
+        if workers > 1:
+            tables = read_tables_parallel(pdf_path, pages, workers)
+        else:
+            tables = camelot.read_pdf(pdf_path, pages=pages, strip_text='\n')
     except Exception as e:
         print(f"Error extracting tables: {e}")
-        return
+        return None
 
     print(f"Total tables extracted: {tables.n}")
     if tables.n == 0:
         print("No tables found.")
-        return
+        return 0
 
     found_any = True
-    output_dir = os.path.join(BASE_DIR, "Extracted_Tables")
+    if output_dir is None:
+        output_dir = os.path.join(BASE_DIR, "Extracted_Tables")
     os.makedirs(output_dir, exist_ok=True)
     excel_path = os.path.join(output_dir, "all_tables.xlsx")
     csv_path = os.path.join(output_dir, "all_tables.csv")
@@ -63,6 +154,7 @@ def extract_tables_with_camelot(pdf_path):
     tables.export(json_path, f='json', compress=True)
     print(f"All tables saved to {json_path}")
     print(f"All tables saved to {excel_path}")
+    return tables.n
 
 def extract_text_with_pypdf2(pdf_path):
     print("\nExtracting all text from each page using PyPDF2:\n")
@@ -117,7 +209,14 @@ def remove_pdf_signatures(input_path, output_path):
         print(f"pikepdf failed: {e}")
         return False
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove signatures, OCR and extract the tables of an AOC-4 PDF.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes reading page chunks with Camelot (default: 1)")
+    parser.add_argument("--all-pages", action="store_true",
+                        help="Send every page to Camelot instead of the detected table pages")
+    args = parser.parse_args(argv)
+
     # Step 1: Remove signature if unsigned file doesn't exist
     if not os.path.exists(UNSIGNED_PDF_PATH):
         if not remove_pdf_signatures(SIGNED_PDF_PATH, UNSIGNED_PDF_PATH):
@@ -135,7 +234,7 @@ def main():
         print("OCR'd PDF already exists.")
 
     # Step 3: Extract tables from the OCR'd PDF
-    extract_tables_with_camelot(OCR_PDF_PATH)
+    extract_tables_with_camelot(OCR_PDF_PATH, pages="all" if args.all_pages else "auto", workers=args.workers)
     # extract_text_with_pypdf2(OCR_PDF_PATH)
 
 if __name__ == "__main__":
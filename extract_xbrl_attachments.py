@@ -1,6 +1,11 @@
+import argparse
 import os
 import logging
-from pypdf import PdfReader
+import tempfile
+
+from pdf_document import PdfDocument
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, recorded_outputs, source_version
+from stage_readiness import clear_ready, publish_ready, ready_files
 
 # Configure logging
 logging.basicConfig(
@@ -14,24 +19,62 @@ logging.basicConfig(
 
 XBRL_DIR = "XBRL"
 OUTPUT_DIR = "XBRL_XML"
+# Name of this stage in the pipeline manifest
+MANIFEST_STAGE = "extract_xbrl_attachments"
+
+
+def default_file_mode():
+    """Mode open() gives new files under the current umask, e.g. 0o644 with the usual umask of 0o022"""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Extracted attachments get the mode of files written with open() rather than mkstemp's 0o600
+FILE_MODE = default_file_mode()
+
+
+def stage_version():
+    """Version of this stage recorded in the pipeline manifest"""
+    return source_version(__file__)
+
+
+def write_file_atomically(path, data):
+    """
+    Write data to path through a temporary file in the same directory and rename it into place, so readers
+    and concurrent writers of the same name (e.g. two PDFs carrying the same attachment) never see a partial file.
+    """
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            os.fchmod(f.fileno(), FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
 
 def extract_attachments(pdf_path, output_dir):
     """
-    Extracts all attachments from a PDF document using pypdf's attachments property.
+    Extracts all attachments from a PDF document through a PdfDocument session (pdf_document.py).
+
+    Returns:
+        list: Paths of the extracted attachments, or None if the PDF could not be processed
     """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
 
     try:
-        reader = PdfReader(pdf_path)
-        attachments = reader.attachments
+        with PdfDocument(pdf_path) as document:
+            attachments = document.attachments
 
         if not attachments:
             logging.info(f"No attachments found in: {pdf_path}")
-            return
+            return []
 
         logging.info(f"Found {len(attachments)} attachment(s) in '{os.path.basename(pdf_path)}'.")
+        extracted_paths = []
 
         for attachment_id, filename in attachments.items():
             try:
@@ -50,37 +93,72 @@ def extract_attachments(pdf_path, output_dir):
                     safe_filename = f"attachment_{attachment_id}"
 
                 output_filepath = os.path.join(output_dir, safe_filename)
-                with open(output_filepath, "wb") as f:
-                    f.write(attachment_data)
+                write_file_atomically(output_filepath, attachment_data)
 
+                extracted_paths.append(output_filepath)
                 logging.info(f"  - Extracted attachment: '{safe_filename}' to '{output_filepath}'")
             except Exception as e:
                 logging.error(f"  - Error extracting attachment '{filename}' (ID: {attachment_id}): {e}")
 
         logging.info(f"Successfully extracted attachments from '{os.path.basename(pdf_path)}' to '{output_dir}'")
+        return extracted_paths
     except Exception as e:
         logging.error(f"Error processing PDF '{pdf_path}': {e}")
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract the XBRL attachments of the PDFs in XBRL.")
+    parser.add_argument("--force", action="store_true",
+                        help="Process every PDF, even those already recorded as done in the pipeline manifest")
+    args = parser.parse_args(argv)
 
-def main():
     if not os.path.exists(XBRL_DIR):
         logging.error(f"XBRL directory '{XBRL_DIR}' does not exist.")
         return
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-    pdf_files = [f for f in os.listdir(XBRL_DIR) if f.lower().endswith('.pdf')]
+    # Withdraw the completion sentinel while XBRL_XML is being written
+    clear_ready(OUTPUT_DIR)
+    output_paths = extract_all_attachments(args)
+    # Only reached when the extraction did not raise, so a crashed run never declares XBRL_XML ready; only the
+    # attachments of this run's PDFs are declared, never files left over from PDFs that failed
+    publish_ready(OUTPUT_DIR, sorted({os.path.basename(path) for path in output_paths}), MANIFEST_STAGE)
+
+def extract_all_attachments(args):
+    """
+    Extract the attachments of every PDF declared ready in XBRL.
+
+    Returns:
+        list: Paths of the attachments extracted in this run or recorded for PDFs that are current
+    """
+    pdf_files = ready_files(XBRL_DIR, '.pdf')
     if not pdf_files:
         logging.warning(f"No PDF files found in '{XBRL_DIR}'.")
-        return
+        return []
 
     logging.info(f"Found {len(pdf_files)} PDF files to process in '{XBRL_DIR}'.")
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(XBRL_DIR, pdf_file)
-        logging.info(f"Processing PDF: {pdf_file}")
-        extract_attachments(pdf_path, OUTPUT_DIR)
+    manifest = open_manifest(MANIFEST_FILE)
+    version = stage_version()
+    output_paths = []
+    try:
+        for pdf_file in pdf_files:
+            pdf_path = os.path.join(XBRL_DIR, pdf_file)
+            if not args.force and is_current(manifest, MANIFEST_STAGE, pdf_path, version):
+                logging.info(f"Skipping PDF: {pdf_file} (attachments already extracted)")
+                output_paths.extend(recorded_outputs(manifest, MANIFEST_STAGE, pdf_path))
+                continue
+            logging.info(f"Processing PDF: {pdf_file}")
+            extracted_paths = extract_attachments(pdf_path, OUTPUT_DIR)
+            if extracted_paths is not None:
+                record_done(manifest, MANIFEST_STAGE, pdf_path, version, extracted_paths)
+                output_paths.extend(extracted_paths)
+    finally:
+        manifest.close()
 
     logging.info("All PDFs processed.")
+    return output_paths
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
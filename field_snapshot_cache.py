@@ -0,0 +1,165 @@
+"""
+field_snapshot_cache.py
+
+Persistent cache of the form field snapshots (field path -> value) extracted from the No_XBRL PDFs.
+
+Extracting a snapshot means parsing the PDF and walking its form; mapping the snapshot into tables is cheap.
+When only the mappings change, rerunning pdf_no_xbrl_table_mapper.py over the whole archive therefore reads the
+snapshots from this cache and only repeats the mapping step.
+
+Snapshots are keyed by the SHA-256 of the PDF, the version of the extractor (pdf_document.py, xfa_form_fields.py
+and the XFA option) and a digest of the required field paths, so a changed PDF or a changed extractor never hits a
+stale entry. A miss only extracts the required paths (the targeted walk of PdfDocument.form_fields), so a new PDF
+never pays for the full form; mapping changes that keep the field paths are served from the cache, while a new
+set of paths extracts the PDF again. A full snapshot, cached for requests without required paths, serves every
+set of paths. Values are returned as strings on hits and misses alike; other values (e.g. signature dictionaries)
+take their string form. They are stored as compressed JSON. The cache is a SQLite database bounded in size: when
+it grows beyond its limit, the least recently used snapshots are evicted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+
+import pdf_document
+from pdf_document import PdfDocument
+from pdf_hash_index import sha256_file
+from pdf_table_extractor import xfa_form_fields
+from pipeline_manifest import source_version
+
+# Default location of the cache, next to the pipeline manifest
+SNAPSHOT_CACHE_PATH = "field_snapshot_cache.db"
+
+# Default bound of the stored snapshot data
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def extractor_version(use_xfa=False):
+    """Version of the snapshot extractor; snapshots cached by another version are never returned"""
+    return source_version(pdf_document.__file__, xfa_form_fields.__file__, extra={"xfa": use_xfa})
+
+
+def open_snapshot_cache(db_path=SNAPSHOT_CACHE_PATH):
+    """
+    Open (and create if needed) the snapshot cache database.
+
+    Returns:
+        sqlite3.Connection: Connection in autocommit mode
+    """
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS snapshots ("
+        "sha256 TEXT NOT NULL, version TEXT NOT NULL, data BLOB NOT NULL, size INTEGER NOT NULL, "
+        "last_used REAL NOT NULL, PRIMARY KEY (sha256, version))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS snapshots_last_used ON snapshots (last_used)")
+    return conn
+
+
+def paths_digest(required):
+    """Cache key part of a set of required field paths; "all" for full snapshots"""
+    if required is None:
+        return "all"
+    return hashlib.sha256("\n".join(sorted(required)).encode("utf-8")).hexdigest()[:16]
+
+
+def string_values(fields):
+    """Return the snapshot with every value in its string form, as values come out of the cache"""
+    return OrderedDict((path, str(value)) for path, value in fields.items())
+
+
+def encode_snapshot(fields):
+    """Serialize a snapshot to compressed JSON, keeping the field order"""
+    return zlib.compress(json.dumps(list(fields.items()), ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def decode_snapshot(data):
+    """Inverse of encode_snapshot"""
+    return OrderedDict(json.loads(zlib.decompress(data).decode("utf-8")))
+
+
+def load_snapshot(conn, sha256, version):
+    """
+    Look up a cached snapshot and mark it as recently used.
+
+    Returns:
+        OrderedDict: The snapshot, or None if it is not cached
+    """
+    row = conn.execute(
+        "SELECT data FROM snapshots WHERE sha256 = ? AND version = ?", (sha256, version)
+    ).fetchone()
+    if row is None:
+        return None
+    conn.execute(
+        "UPDATE snapshots SET last_used = ? WHERE sha256 = ? AND version = ?", (time.time(), sha256, version)
+    )
+    return decode_snapshot(row[0])
+
+
+def evict_snapshots(conn, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Remove the least recently used snapshots until the stored data fits in max_bytes.
+
+    Returns:
+        int: Number of snapshots removed
+    """
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM snapshots").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for sha256, version, size in conn.execute(
+        "SELECT sha256, version, size FROM snapshots ORDER BY last_used"
+    ).fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute("DELETE FROM snapshots WHERE sha256 = ? AND version = ?", (sha256, version))
+        total -= size
+        removed += 1
+    return removed
+
+
+def store_snapshot(conn, sha256, version, fields, max_bytes=DEFAULT_MAX_BYTES):
+    """Cache a snapshot, then evict old snapshots if the cache has outgrown max_bytes"""
+    data = encode_snapshot(fields)
+    conn.execute(
+        "INSERT OR REPLACE INTO snapshots (sha256, version, data, size, last_used) VALUES (?, ?, ?, ?, ?)",
+        (sha256, version, data, len(data), time.time())
+    )
+    evict_snapshots(conn, max_bytes)
+
+
+def cached_form_fields(conn, pdf_path, use_xfa=False, required=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Return the form field snapshot of a PDF, from the cache when its content was extracted before.
+
+    On a miss only the required paths are extracted and cached under the digest of the paths; a cached full
+    snapshot also serves any set of required paths.
+
+    Args:
+        conn: Snapshot cache connection.
+        pdf_path (str): PDF file.
+        use_xfa (bool): Read the form values from the XFA packets (see PdfDocument.form_fields).
+        required (frozenset): Optional field paths the snapshot is limited to.
+        max_bytes (int): Size bound of the cache.
+
+    Returns:
+        OrderedDict: Field path -> value (str)
+    """
+    sha256 = sha256_file(pdf_path)
+    version = extractor_version(use_xfa)
+    key = f"{version}:{paths_digest(required)}"
+    fields = load_snapshot(conn, sha256, key)
+    if fields is None and required is not None:
+        fields = load_snapshot(conn, sha256, f"{version}:{paths_digest(None)}")
+        if fields is not None:
+            fields = OrderedDict((path, value) for path, value in fields.items() if path in required)
+    if fields is None:
+        with PdfDocument(pdf_path) as document:
+            # Converted while the file is open, as dictionary values may still resolve indirect objects
+            fields = string_values(document.form_fields(use_xfa=use_xfa, required=required))
+        store_snapshot(conn, sha256, key, fields, max_bytes)
+    return fields
@@ -0,0 +1,374 @@
+"""
+filing_index.py
+
+Persistent CIN / financial year index of the filings stored in the 'No_XBRL' and 'XBRL' directories.
+
+Every filing is recorded with its CIN, financial year, reporting period, source PDF and the PDF's SHA-256:
+
+1. No_XBRL PDFs are read with extract_pdf_info.process_pdf (form fields first, page text as fallback),
+2. XBRL PDFs are indexed per XBRL instance they carry as an attachment (standalone and consolidated statements
+   are separate filings); the CIN is the entity identifier of the instance's contexts and the financial year the
+   duration context ending last.
+
+The index is a SQLite database with indexes on CIN and financial year end, so looking up the filings of a company
+is a single query instead of a text extraction run over the whole folder. Updates are incremental: PDFs whose
+size and modification time (or, if touched, content) are unchanged since they were indexed with the same code
+version are skipped, content already indexed under another name is copied instead of read again, and files that
+were removed from the directories are dropped from the index.
+
+Usage:
+    python filing_index.py update
+    python filing_index.py lookup --cin L35921TN1992PLC022845 [--year 2019] [--json]
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+
+import extract_pdf_info
+import pdf_document
+from extract_pdf_info import INFO_FIELD_PATHS, process_pdf
+from pdf_document import PdfDocument
+from pdf_hash_index import sha256_file
+from pipeline_manifest import source_version
+from stage_readiness import ready_files
+from xbrl_xml_extractor import xbrl_xml_to_json_batch
+from xbrl_xml_extractor.xbrl_xml_to_json_batch import namespaces, parse_context
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+# Default location of the index, next to the XBRL and No_XBRL directories
+FILING_INDEX_PATH = "filing_index.db"
+
+KIND_NO_XBRL = "no_xbrl"
+KIND_XBRL = "xbrl"
+# Directory indexed for each kind of filing
+FILING_DIRECTORIES = {KIND_NO_XBRL: "No_XBRL", KIND_XBRL: "XBRL"}
+
+CONTEXT_TAG = f"{{{namespaces['xbrli']}}}context"
+
+# Dates of the AOC-4 form fields, e.g. 31/03/2022
+FORM_DATE_PATTERN = re.compile(r'(\d{2})/(\d{2})/(\d{4})')
+# Year ranges of the text fallback, e.g. 2021-22 or 2021-2022
+YEAR_RANGE_PATTERN = re.compile(r'(\d{4})[-–](\d{2,4})')
+YEAR_PATTERN = re.compile(r'\d{4}')
+
+
+def index_version():
+    """Version of the indexing code; files indexed by another version are indexed again"""
+    return source_version(__file__, extract_pdf_info.__file__, pdf_document.__file__,
+                          xbrl_xml_to_json_batch.__file__)
+
+
+def open_filing_index(db_path=FILING_INDEX_PATH):
+    """
+    Open (and create if needed) the filing index database.
+
+    Returns:
+        sqlite3.Connection: Connection in autocommit mode
+    """
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        "path TEXT PRIMARY KEY, kind TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+        "sha256 TEXT NOT NULL, version TEXT NOT NULL, indexed REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS filings ("
+        "path TEXT NOT NULL, document TEXT NOT NULL, kind TEXT NOT NULL, sha256 TEXT NOT NULL, cin TEXT, "
+        "financial_year TEXT, period_start TEXT, period_end TEXT, year_end INTEGER, "
+        "PRIMARY KEY (path, document))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+    conn.execute("CREATE INDEX IF NOT EXISTS filings_cin ON filings (cin, year_end)")
+    conn.execute("CREATE INDEX IF NOT EXISTS filings_year_end ON filings (year_end)")
+    return conn
+
+
+def form_date_to_iso(value):
+    """Convert a dd/mm/yyyy form date to yyyy-mm-dd; returns None for anything else"""
+    match = FORM_DATE_PATTERN.fullmatch((value or "").strip())
+    return f"{match.group(3)}-{match.group(2)}-{match.group(1)}" if match else None
+
+
+def year_end_of(financial_year, period_end=None):
+    """
+    Calendar year in which a financial year ends, the key financial year lookups use.
+
+    Args:
+        financial_year (str): Financial year as extracted, e.g. "Financial Year: 2021-22".
+        period_end (str): Optional ISO end date of the reporting period, which takes precedence.
+
+    Returns:
+        int: The year, or None if it cannot be determined
+    """
+    if period_end:
+        return int(period_end[:4])
+    if not financial_year:
+        return None
+    match = YEAR_RANGE_PATTERN.search(financial_year)
+    if match:
+        start, end = match.groups()
+        return int(end) if len(end) == 4 else int(start[:2] + end[-2:])
+    years = YEAR_PATTERN.findall(financial_year)
+    return int(years[-1]) if years else None
+
+
+def no_xbrl_filings(pdf_path):
+    """
+    Read the filing of one No_XBRL PDF.
+
+    Returns:
+        list: One (document, cin, financial year, period start, period end) tuple; the document is ''
+    """
+    # Only the CIN and date fields are indexed; a PDF that cannot be read raises, so it is not recorded as indexed
+    # and is read again by the next update
+    cin, financial_year, form_fields = process_pdf(pdf_path, required_fields=INFO_FIELD_PATHS, raise_errors=True)
+    period_start = form_date_to_iso(form_fields.get(extract_pdf_info.FROM_DATE_FIELD))
+    period_end = form_date_to_iso(form_fields.get(extract_pdf_info.TO_DATE_FIELD))
+    if period_start is None or period_end is None:
+        period_start = period_end = None
+    return [("", cin, financial_year, period_start, period_end)]
+
+
+def xbrl_instance_info(xml_data):
+    """
+    Read the entity identifier and the reporting period of an XBRL instance from its contexts.
+
+    The instance is parsed incrementally and every top-level element is discarded once read, so only one
+    context or fact is held in memory at a time.
+
+    Args:
+        xml_data (bytes): The XBRL instance.
+
+    Returns:
+        tuple: (entity identifier, period start, period end); the period is the duration context ending last,
+               the longest one if several end on the same day
+    """
+    identifier = None
+    period_start = period_end = None
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(io.BytesIO(xml_data), events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        if elem.tag == CONTEXT_TAG:
+            context = parse_context(elem)
+            if identifier is None and context["entity"].get("value"):
+                identifier = context["entity"]["value"]
+            if context["period"].get("type") == "duration":
+                start, end = context["period"]["startDate"], context["period"]["endDate"]
+                # ISO dates compare as strings: latest end first, then earliest start
+                if period_end is None or end > period_end or (end == period_end and start < period_start):
+                    period_start, period_end = start, end
+        root.clear()
+    return identifier, period_start, period_end
+
+
+def xbrl_filings(pdf_path):
+    """
+    Read the filings of one XBRL PDF: one per XBRL instance attached to it.
+
+    Returns:
+        list: (document, cin, financial year, period start, period end) tuples, the document being the name of
+              the attachment; attachments that cannot be parsed are logged and skipped
+    """
+    with PdfDocument(pdf_path) as document:
+        attachments = document.attachments
+    filings = []
+    for name, contents in sorted(attachments.items()):
+        if not name.lower().endswith('.xml'):
+            continue
+        for xml_data in contents:
+            try:
+                cin, period_start, period_end = xbrl_instance_info(xml_data)
+            except ET.ParseError as e:
+                logging.warning(f"Could not parse XBRL attachment {name} of {pdf_path}: {e}")
+                continue
+            financial_year = f"{period_start} to {period_end}" if period_end else None
+            filings.append((name, cin, financial_year, period_start, period_end))
+    return filings
+
+
+FILING_READERS = {KIND_NO_XBRL: no_xbrl_filings, KIND_XBRL: xbrl_filings}
+
+
+def _is_indexed(conn, path, stat, version):
+    """Check whether path is indexed with the current version and unchanged content"""
+    row = conn.execute("SELECT size, mtime_ns, sha256, version FROM files WHERE path = ?", (path,)).fetchone()
+    if row is None or row[3] != version or row[0] != stat.st_size:
+        return False
+    if row[1] != stat.st_mtime_ns:
+        # Touched or rewritten: only the content decides
+        if sha256_file(path) != row[2]:
+            return False
+        conn.execute("UPDATE files SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, path))
+    return True
+
+
+def _copy_filings(conn, kind, sha256, version):
+    """Return the filings of content already indexed as kind under another path with the same version, or None"""
+    row = conn.execute(
+        "SELECT path FROM files WHERE kind = ? AND sha256 = ? AND version = ? LIMIT 1", (kind, sha256, version)
+    ).fetchone()
+    if row is None:
+        return None
+    return conn.execute(
+        "SELECT document, cin, financial_year, period_start, period_end FROM filings WHERE path = ? "
+        "ORDER BY document", (row[0],)
+    ).fetchall()
+
+
+def _store_filings(conn, path, kind, stat, sha256, version, filings):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM filings WHERE path = ?", (path,))
+        conn.executemany(
+            "INSERT INTO filings (path, document, kind, sha256, cin, financial_year, period_start, period_end, "
+            "year_end) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(path, document, kind, sha256, cin, financial_year, period_start, period_end,
+              year_end_of(financial_year, period_end))
+             for document, cin, financial_year, period_start, period_end in filings]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO files (path, kind, size, mtime_ns, sha256, version, indexed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, kind, stat.st_size, stat.st_mtime_ns, sha256, version, time.time())
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def update_filing_index(conn, directories=None):
+    """
+    Bring the index up to date with the PDFs in the filing directories.
+
+    Args:
+        conn: Filing index connection.
+        directories (dict): Directory to index per kind (KIND_NO_XBRL, KIND_XBRL); defaults to
+                            FILING_DIRECTORIES. Kinds left out are not touched.
+
+    Returns:
+        dict: Counts of "indexed", "copied" (same content indexed under another name), "unchanged",
+              "failed" and "removed" files
+    """
+    directories = FILING_DIRECTORIES if directories is None else directories
+    version = index_version()
+    counts = {"indexed": 0, "copied": 0, "unchanged": 0, "failed": 0, "removed": 0}
+    for kind, directory in directories.items():
+        pdf_paths = []
+        if os.path.isdir(directory):
+            pdf_paths = [os.path.abspath(os.path.join(directory, f)) for f in sorted(ready_files(directory, '.pdf'))]
+        else:
+            logging.warning(f"Directory '{directory}' does not exist")
+        for pdf_path in pdf_paths:
+            try:
+                stat = os.stat(pdf_path)
+                if _is_indexed(conn, pdf_path, stat, version):
+                    counts["unchanged"] += 1
+                    continue
+                sha256 = sha256_file(pdf_path)
+                filings = _copy_filings(conn, kind, sha256, version)
+                if filings is not None:
+                    counts["copied"] += 1
+                else:
+                    logging.info(f"Indexing {os.path.basename(pdf_path)}")
+                    filings = FILING_READERS[kind](pdf_path)
+                    counts["indexed"] += 1
+                _store_filings(conn, pdf_path, kind, stat, sha256, version, filings)
+            except Exception as e:
+                logging.error(f"Failed to index {pdf_path}: {e}")
+                counts["failed"] += 1
+        # Drop files that were removed from the directory
+        present = set(pdf_paths)
+        for (path,) in conn.execute("SELECT path FROM files WHERE kind = ?", (kind,)).fetchall():
+            if path not in present:
+                conn.execute("DELETE FROM filings WHERE path = ?", (path,))
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                counts["removed"] += 1
+    return counts
+
+
+def lookup_filings(conn, cin=None, year_end=None):
+    """
+    Look up indexed filings.
+
+    Args:
+        conn: Filing index connection.
+        cin (str): Optional CIN the filings must belong to.
+        year_end (int): Optional calendar year in which the financial year ends (see year_end_of).
+
+    Returns:
+        list: Filings as dicts with "cin", "financial_year", "period_start", "period_end", "year_end", "kind",
+              "path" (source PDF), "document" (XBRL attachment, '' for No_XBRL PDFs) and "sha256", ordered by
+              CIN, financial year and path
+    """
+    conditions, parameters = [], []
+    if cin is not None:
+        conditions.append("cin = ?")
+        parameters.append(cin.strip().upper())
+    if year_end is not None:
+        conditions.append("year_end = ?")
+        parameters.append(int(year_end))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor = conn.execute(
+        "SELECT cin, financial_year, period_start, period_end, year_end, kind, path, document, sha256 FROM filings"
+        f"{where} ORDER BY cin, year_end, path, document", parameters
+    )
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index the stored filings by CIN and financial year, and look them up.")
+    parser.add_argument("--db", default=FILING_INDEX_PATH, help=f"Index database (default: {FILING_INDEX_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("update", help="Index new and changed PDFs in No_XBRL and XBRL")
+    lookup_parser = subparsers.add_parser("lookup", help="List the indexed filings matching the criteria")
+    lookup_parser.add_argument("--cin", help="CIN of the company")
+    lookup_parser.add_argument("--year", type=int, help="Calendar year in which the financial year ends")
+    lookup_parser.add_argument("--json", action="store_true", help="Print the filings as JSON")
+    args = parser.parse_args(argv)
+
+    conn = open_filing_index(args.db)
+    try:
+        if args.command == "update":
+            counts = update_filing_index(conn)
+            logging.info(", ".join(f"{count} {outcome}" for outcome, count in counts.items()))
+            return
+        filings = lookup_filings(conn, cin=args.cin, year_end=args.year)
+    finally:
+        conn.close()
+    if args.json:
+        print(json.dumps(filings, indent=4))
+        return
+    for filing in filings:
+        source = filing["path"] + (f" [{filing['document']}]" if filing["document"] else "")
+        print(f"{filing['cin'] or '-'}\t{filing['financial_year'] or '-'}\t{source}\t{filing['sha256'][:12]}")
+    print(f"{len(filings)} filing(s)")
+
+
+if __name__ == "__main__":
+    main()
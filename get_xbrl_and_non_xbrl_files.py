@@ -1,18 +1,43 @@
 """
 check_xbrl.py
 
-This script scans all ZIP files in the 'Input_data' directory, extracts their PDF files, and checks if each PDF filename contains 'XBRL'.
-- PDFs with 'XBRL' in the name are reported.
-- PDFs without 'XBRL' in the name are moved to the 'No_XBRL' directory, with duplicate names handled by appending a suffix.
-- Temporary extraction directories are cleaned up after each ZIP is processed.
+This script scans all ZIP files in the 'Input_data' directory and checks if each PDF filename contains 'XBRL'.
+- PDFs with 'XBRL' in the name are copied to the 'XBRL' directory.
+- PDFs without 'XBRL' in the name are copied to the 'No_XBRL' directory, with duplicate names handled by appending a suffix.
+- Byte-identical PDFs are stored once: their SHA-256 is computed while streaming and checked against a persistent
+  hash index (pdf_hash_index.db); repeated copies are recorded as aliases instead of being stored as name_1.pdf.
+  Copies stored by earlier runs are recorded as aliases too and left out of the set declared ready downstream.
+- Archives are classified from their member list and only PDF members are streamed out; nothing is extracted to a temporary directory.
+- With --workers N several archives are ingested in parallel; destination names are claimed atomically, so
+  concurrent workers never overwrite each other's files.
 
 This helps segregate and identify PDFs that do not follow the XBRL naming convention for further review.
 """
 
+import argparse
 import os
 import zipfile
 import shutil
 import logging
+import tempfile
+
+from pdf_hash_index import (
+    HASH_INDEX_PATH,
+    alias_file_names,
+    copy_and_hash,
+    index_existing_files,
+    index_transaction,
+    lookup_hash,
+    open_hash_index,
+    record_alias,
+    record_file
+)
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, source_version
+from process_pool import process_pool
+from stage_readiness import clear_ready, publish_directory
+
+# Name of this stage in the pipeline manifest
+MANIFEST_STAGE = "get_xbrl_and_non_xbrl_files"
 
 # Configure logging
 logging.basicConfig(
@@ -24,79 +49,201 @@ logging.basicConfig(
 )
 
 
-def check_pdf_xbrl(zip_path, temp_dir):
+# Buffer size used when streaming PDF members out of the archive
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def default_file_mode():
+    """Mode open() gives new files under the current umask, e.g. 0o644 with the usual umask of 0o022"""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Stored PDFs get the mode of a plain copy rather than mkstemp's 0o600, so other accounts can read them
+FILE_MODE = default_file_mode()
+
+
+def check_pdf_xbrl(zip_path, hash_index_path=HASH_INDEX_PATH):
     """
     Check each PDF in the zip file for XBRL designation in filename.
-    Move No-XBRL PDFs to No_XBRL folder.
+    Copy XBRL PDFs to the XBRL folder and No-XBRL PDFs to the No_XBRL folder.
+
+    The decision only depends on the member name, so the archive is classified from its central
+    directory (ZipFile.infolist()) and only the PDF members are streamed straight to their destination.
+    Nothing is extracted to a temporary directory and non-PDF members are never read.
+
+    With a hash index, each PDF is hashed while it is streamed; content that is already stored is
+    recorded as an alias of the stored file instead of being kept a second time under a suffixed name.
+    Pass hash_index_path=None to keep every copy.
+
+    Returns:
+        list: Paths of the stored PDFs of the archive (the existing copy for duplicates), or None on error
     """
+    conn = None
+    stored_paths = []
     try:
-        # Clean up temp directory if it exists
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        os.makedirs(temp_dir)
-        
-        # Extract zip file to temp directory
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
         # Get zip filename for reporting
         zip_name = os.path.splitext(os.path.basename(zip_path))[0]
-        logging.info(f"Checking PDFs in: {zip_name}")
-        
-        # Find all PDF files in the extracted directory
-        pdf_files = []
-        for root, _, files in os.walk(temp_dir):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    pdf_files.append(os.path.join(root, file))
-        
-        if not pdf_files:
-            logging.warning(f"No PDF files found in {zip_name}")
-            return
-        
-        # Ensure No_XBRL and XBRL directories exist
-        no_xbrl_dir = "No_XBRL"
-        xbrl_dir = "XBRL"
-        if not os.path.exists(no_xbrl_dir):
-            os.makedirs(no_xbrl_dir)
-        if not os.path.exists(xbrl_dir):
-            os.makedirs(xbrl_dir)
-        
-        # Check each PDF filename
-        for pdf_file in pdf_files:
-            pdf_name = os.path.basename(pdf_file)
-            if "XBRL" in pdf_name:
-                logging.info(f"File: {pdf_name} - (XBRL) -> Moving to {xbrl_dir}")
-                # Move the file to XBRL folder
-                dest_path = os.path.join(xbrl_dir, pdf_name)
-                # If file with same name exists, add a suffix
-                base, ext = os.path.splitext(pdf_name)
-                counter = 1
-                while os.path.exists(dest_path):
-                    dest_path = os.path.join(xbrl_dir, f"{base}_{counter}{ext}")
-                    counter += 1
-                shutil.move(pdf_file, dest_path)
-            else:
-                logging.info(f"File: {pdf_name} - (No-XBRL) -> Moving to {no_xbrl_dir}")
-                # Move the file to No_XBRL folder
-                dest_path = os.path.join(no_xbrl_dir, pdf_name)
-                # If file with same name exists, add a suffix
-                base, ext = os.path.splitext(pdf_name)
-                counter = 1
-                while os.path.exists(dest_path):
-                    dest_path = os.path.join(no_xbrl_dir, f"{base}_{counter}{ext}")
-                    counter += 1
-                shutil.move(pdf_file, dest_path)
-        
+
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            logging.info(f"Checking PDFs in: {zip_name}")
+
+            # Find all PDF members of the archive
+            pdf_members = [info for info in zip_ref.infolist()
+                           if not info.is_dir() and info.filename.lower().endswith('.pdf')]
+
+            if not pdf_members:
+                logging.warning(f"No PDF files found in {zip_name}")
+                return stored_paths
+
+            # Ensure No_XBRL and XBRL directories exist
+            no_xbrl_dir = "No_XBRL"
+            xbrl_dir = "XBRL"
+            os.makedirs(no_xbrl_dir, exist_ok=True)
+            os.makedirs(xbrl_dir, exist_ok=True)
+            if hash_index_path:
+                conn = open_hash_index(hash_index_path)
+
+            # Check each PDF filename
+            for info in pdf_members:
+                pdf_name = os.path.basename(info.filename)
+                if "XBRL" in pdf_name:
+                    dest_dir = xbrl_dir
+                    logging.info(f"File: {pdf_name} - (XBRL) -> Copying to {xbrl_dir}")
+                else:
+                    dest_dir = no_xbrl_dir
+                    logging.info(f"File: {pdf_name} - (No-XBRL) -> Copying to {no_xbrl_dir}")
+                if conn is None:
+                    stored_paths.append(copy_zip_member(zip_ref, info, dest_dir, pdf_name))
+                    continue
+                dest_path, stored_path = store_unique_zip_member(conn, zip_ref, info, dest_dir, pdf_name, zip_name)
+                if stored_path is not None:
+                    logging.info(f"File: {pdf_name} - duplicate of {stored_path}, recorded as alias")
+                    dest_path = stored_path
+                stored_paths.append(dest_path)
+        return stored_paths
+
     except Exception as e:
         logging.error(f"Error processing zip file {zip_path}: {e}")
+        return None
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def claim_destination(dest_dir, file_name):
+    """
+    Atomically reserve a file name in dest_dir, adding a _1, _2, ... suffix if the name is taken.
+
+    The file is created with O_CREAT | O_EXCL, so concurrent workers can never pick the same name.
+
+    Returns:
+        tuple: (destination path, writable binary file object)
+    """
+    base, ext = os.path.splitext(file_name)
+    dest_path = os.path.join(dest_dir, file_name)
+    counter = 1
+    while True:
+        try:
+            fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            dest_path = os.path.join(dest_dir, f"{base}_{counter}{ext}")
+            counter += 1
+            continue
+        return dest_path, os.fdopen(fd, 'wb')
+
+
+def copy_zip_member(zip_ref, info, dest_dir, file_name):
+    """
+    Stream one archive member into dest_dir without extracting the rest of the archive.
+    A partially written file is removed if the copy fails.
+
+    Returns:
+        str: Path the member was written to
+    """
+    dest_path, dst = claim_destination(dest_dir, file_name)
+    try:
+        with zip_ref.open(info) as src, dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+    except BaseException:
+        os.remove(dest_path)
+        raise
+    return dest_path
+
+
+def store_unique_zip_member(conn, zip_ref, info, dest_dir, file_name, archive=None):
+    """
+    Stream one archive member into dest_dir unless its content is already stored.
+
+    The member is copied to a hidden temporary file in dest_dir while its SHA-256 is computed. Under the
+    index write lock it is then either renamed to a freshly claimed name and registered, or discarded and
+    recorded as an alias of the stored file.
+
+    Returns:
+        tuple: (path the member was stored at or None, path of the already stored copy or None)
+    """
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".part", dir=dest_dir)
+    try:
+        with zip_ref.open(info) as src, os.fdopen(fd, 'wb') as dst:
+            sha256, size = copy_and_hash(src, dst, COPY_BUFFER_SIZE)
+        with index_transaction(conn):
+            stored_path = lookup_hash(conn, sha256)
+            if stored_path is not None:
+                record_alias(conn, sha256, file_name, archive=archive)
+                os.remove(temp_path)
+                return None, stored_path
+            dest_path, dst = claim_destination(dest_dir, file_name)
+            dst.close()
+            os.chmod(temp_path, FILE_MODE)
+            os.replace(temp_path, dest_path)
+            record_file(conn, sha256, dest_path, size)
+            return dest_path, None
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Separate the XBRL and non-XBRL PDFs of the ZIP files in Input_data.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes used to ingest archives in parallel (default: 1)")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Keep byte-identical PDFs as suffixed copies instead of recording them as aliases")
+    parser.add_argument("--force", action="store_true",
+                        help="Process every archive, even those already recorded as done in the pipeline manifest")
+    args = parser.parse_args(argv)
+
+    # Withdraw the completion sentinels while XBRL/ and No_XBRL/ are being written
+    for output_dir in ("XBRL", "No_XBRL"):
+        clear_ready(output_dir)
+    ingest_zip_files(args)
+    # Declare exactly the PDFs that are complete for the downstream stages; if the ingestion raised, the
+    # directories stay undeclared
+    publish_output_dirs(None if args.no_dedup else HASH_INDEX_PATH)
+
+
+def publish_output_dirs(hash_index_path):
+    """
+    Publish the PDFs of XBRL/ and No_XBRL/ as ready, leaving out the files the hash index records as aliases
+    of content stored under another name, so each filing is processed once downstream.
+    """
+    conn = open_hash_index(hash_index_path) if hash_index_path and os.path.exists(hash_index_path) else None
+    try:
+        for output_dir in ("XBRL", "No_XBRL"):
+            aliases = alias_file_names(conn, output_dir) if conn is not None else set()
+            declared = publish_directory(output_dir, MANIFEST_STAGE, suffixes=(".pdf",), exclude=aliases)
+            if aliases:
+                logging.info(f"Declared {len(declared)} PDF file(s) in {output_dir} ready, "
+                             f"leaving out {len(aliases)} duplicate(s)")
     finally:
-        # Clean up temp directory after processing this zip
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        if conn is not None:
+            conn.close()
 
 
-def main():
+def ingest_zip_files(args):
+    """Route the PDFs of every new or changed ZIP file in Input_data"""
     # Process all zip files in Input_data directory
     input_dir = "Input_data"
     if not os.path.exists(input_dir):
@@ -110,11 +257,50 @@ def main():
         return
     
     logging.info(f"Found {len(zip_files)} zip files to process")
-    
-    # Process each zip file
+
+    # Skip archives whose PDFs were already routed by this version of the script
+    manifest = open_manifest(MANIFEST_FILE)
+    version = source_version(__file__, extra={"dedup": not args.no_dedup})
+    zip_paths = []
     for zip_file in zip_files:
         zip_path = os.path.join(input_dir, zip_file)
-        check_pdf_xbrl(zip_path, "temp_extract")
+        if not args.force and is_current(manifest, MANIFEST_STAGE, zip_path, version):
+            logging.info(f"Skipping {zip_file}: already processed")
+            continue
+        zip_paths.append(zip_path)
+    if not zip_paths:
+        logging.info("All zip files are up to date")
+        manifest.close()
+        return
+
+    hash_index_path = None if args.no_dedup else HASH_INDEX_PATH
+    if hash_index_path:
+        # Register PDFs stored by earlier runs, so re-ingested filings are recognised
+        conn = open_hash_index(hash_index_path)
+        try:
+            added = index_existing_files(conn, ["XBRL", "No_XBRL"])
+        finally:
+            conn.close()
+        if added:
+            logging.info(f"Indexed {added} previously stored PDF file(s)")
+
+    if args.workers > 1 and len(zip_paths) > 1:
+        workers = min(args.workers, len(zip_paths))
+        logging.info(f"Processing zip files with {workers} worker processes")
+        # check_pdf_xbrl logs its own errors; destination names are claimed atomically across workers
+        with process_pool(workers) as executor:
+            results = list(executor.map(check_pdf_xbrl, zip_paths, [hash_index_path] * len(zip_paths)))
+    else:
+        # Process each zip file
+        results = [check_pdf_xbrl(zip_path, hash_index_path) for zip_path in zip_paths]
+
+    # Only archives that were processed without errors are recorded as done
+    try:
+        for zip_path, stored_paths in zip(zip_paths, results):
+            if stored_paths is not None:
+                record_done(manifest, MANIFEST_STAGE, zip_path, version, stored_paths)
+    finally:
+        manifest.close()
 
 
 if __name__ == "__main__":
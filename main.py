@@ -1,23 +1,26 @@
-from pypdf import PdfReader
 # from pypdf.annotations import FileAttachmentAnnotation
+import argparse
 import os
+import shutil
+import tempfile
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from pdf_document import PdfDocument
+
 
 def extract_attachments(pdf_path, output_dir):
     """
-    Extracts all attachments from a PDF document using pypdf's attachments property.
+    Extracts all attachments from a PDF document through a PdfDocument session (pdf_document.py).
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     try:
-        # Create PdfReader object
-        reader = PdfReader(pdf_path)
-        
-        # Get the attachments dictionary
-        attachments = reader.attachments
+        # Open the PDF and read its attachments once
+        with PdfDocument(pdf_path) as document:
+            attachments = document.attachments
         
         if not attachments:
             print(f"No attachments found in: {pdf_path}")
@@ -70,11 +73,10 @@ def process_zip_file(zip_path, main_output_dir):
     """
     Process a zip file containing PDFs and extract attachments maintaining hierarchy.
     """
+    temp_dir = None
     try:
-        # Create a temporary directory to extract PDFs
-        temp_dir = os.path.join(main_output_dir, "temp_extract")
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
+        # Create a private temporary directory to extract PDFs, so archives can be processed concurrently
+        temp_dir = tempfile.mkdtemp(prefix="temp_extract_", dir=main_output_dir)
 
         # Get zip filename without extension for creating output directory
         zip_name = os.path.splitext(os.path.basename(zip_path))[0]
@@ -109,15 +111,20 @@ def process_zip_file(zip_path, main_output_dir):
                 print(f"\nProcessing PDF: {rel_path}")
                 extract_attachments(pdf_file, output_dir)
         
-        # Clean up temporary directory
-        import shutil
-        shutil.rmtree(temp_dir)
-        
     except Exception as e:
         print(f"Error processing zip file {zip_path}: {e}")
+    finally:
+        # Clean up temporary directory
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract the attachments of the PDFs in the ZIP files in Input_data.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes used to process archives in parallel (default: 1)")
+    args = parser.parse_args(argv)
 
-def main():
     # Create main Extracted_data directory
     main_output_dir = "Extracted_data"
     if not os.path.exists(main_output_dir):
@@ -137,8 +144,16 @@ def main():
     
     print(f"Found {len(zip_files)} zip files to process")
     
-    for zip_file in zip_files:
-        zip_path = os.path.join(input_dir, zip_file)
+    zip_paths = [os.path.join(input_dir, zip_file) for zip_file in zip_files]
+    if args.workers > 1 and len(zip_paths) > 1:
+        workers = min(args.workers, len(zip_paths))
+        print(f"Processing zip files with {workers} worker processes")
+        # Each archive writes below its own Extracted_data/<zip name> and uses its own temp directory
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(process_zip_file, zip_paths, [main_output_dir] * len(zip_paths)))
+        return
+
+    for zip_path in zip_paths:
         process_zip_file(zip_path, main_output_dir)
 
 
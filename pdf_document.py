@@ -0,0 +1,252 @@
+"""
+pdf_document.py
+
+A PDF document session: the file is opened and its cross-reference table and catalog are parsed once, and the
+pieces the pipeline reads from it are extracted on first use and kept for the life of the session:
+
+1. form_fields() - the field path -> value snapshot of the AcroForm tree (or of the XFA packets), optionally
+   limited to a required set of field paths so that the rest of the tree is never resolved,
+2. page_text() - the text of the first N pages (or iter_page_texts(), page by page),
+3. attachments - the embedded files.
+
+extract_pdf_info.py, pdf_no_xbrl_table_mapper.py, extract_xbrl_attachments.py and main.py all read PDFs through
+this class, so a PDF that is both searched for its CIN and mapped into tables is only parsed once, with one
+library (pypdf).
+
+Usage:
+    with PdfDocument(pdf_path) as document:
+        fields = document.form_fields()
+        text = document.page_text(max_pages=5)
+"""
+
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+
+from pypdf import PdfReader
+
+from pdf_table_extractor.xfa_form_fields import get_xfa_form_fields
+
+# Attributes marking a dictionary of the AcroForm tree as a field
+FIELD_ATTRIBUTES = ('/FT', '/Parent', '/T', '/TU', '/TM', '/Ff', '/V', '/DV', '/Opt')
+# The AcroForm dictionary itself is checked against the narrower set the original form readers used
+ACROFORM_ATTRIBUTES = FIELD_ATTRIBUTES[:-1]
+
+# Pages searched for text by default
+DEFAULT_TEXT_PAGES = 5
+
+
+def _collect_fields(tree, retval, attributes=FIELD_ATTRIBUTES):
+    """Walk a node of the AcroForm tree: its kids first, then the node itself and its /Fields"""
+    _collect_kids(tree, retval)
+    if any(attr in tree for attr in attributes):
+        _add_field(tree, retval)
+    if "/Fields" in tree:
+        for field in tree["/Fields"]:
+            _add_field(field.get_object(), retval)
+
+
+def _collect_kids(tree, retval):
+    if "/Kids" in tree:
+        for kid in tree["/Kids"]:
+            _collect_fields(kid.get_object(), retval)
+
+
+def _add_field(field, retval):
+    _collect_kids(field, retval)
+    # Keyed by mapping name, else by partial name; fields without either are ignored
+    if "/TM" in field:
+        key = field["/TM"]
+    elif "/T" in field:
+        key = field["/T"]
+    else:
+        return
+    retval[key] = field["/V"] if "/V" in field else ''
+
+
+@lru_cache(maxsize=16)
+def field_path_prefixes(required):
+    """
+    Return every dotted prefix of the required field paths (including the paths themselves), i.e. the qualified
+    names of the AcroForm nodes a targeted walk has to enter. Computed once per required set.
+    """
+    prefixes = set()
+    for path in required:
+        parts = path.split('.')
+        for end in range(1, len(parts) + 1):
+            prefixes.add('.'.join(parts[:end]))
+    return frozenset(prefixes)
+
+
+def _collect_required(node, parent_name, retval, required, prefixes):
+    """Walk a node of the AcroForm tree, entering only nodes whose qualified name leads to a required path"""
+    partial_name = node.get("/T")
+    if partial_name is None:
+        # Widgets and other unnamed nodes carry the name of their parent
+        name = parent_name
+    else:
+        name = partial_name if parent_name is None else f"{parent_name}.{partial_name}"
+    if name not in prefixes:
+        return
+    if "/Kids" in node:
+        for kid in node["/Kids"]:
+            _collect_required(kid.get_object(), name, retval, required, prefixes)
+    key = node["/TM"] if "/TM" in node else partial_name
+    if key in required:
+        retval[key] = node["/V"] if "/V" in node else ''
+
+
+def read_acroform_fields(reader, required=None):
+    """
+    Read the field values of the AcroForm tree.
+
+    Fields are named and ordered exactly like the PyPDF2 based walk the form readers used before, so the
+    snapshots (and the tables mapped from them) are unchanged: leaf fields carry their fully qualified name,
+    e.g. data[0].FormAOC4_Dtls[0].Segment1_PartA[0].CIN_C[0].
+
+    With required, only those field paths are read: the walk follows the qualified names of the nodes and skips
+    every subtree whose name is not a prefix of a required path, so the field objects below it are never
+    resolved. Required paths missing from the form are left out of the snapshot.
+
+    Args:
+        reader: An open pypdf PdfReader.
+        required (frozenset): Optional field paths to read; defaults to every field.
+
+    Returns:
+        OrderedDict: Field name -> value ('' when unset), or None if the PDF has no AcroForm
+    """
+    catalog = reader.trailer["/Root"]
+    if "/AcroForm" not in catalog:
+        return None
+    retval = OrderedDict()
+    acroform = catalog["/AcroForm"]
+    if required is None:
+        _collect_fields(acroform, retval, ACROFORM_ATTRIBUTES)
+    else:
+        prefixes = field_path_prefixes(required)
+        for field in acroform.get("/Fields", ()):
+            _collect_required(field.get_object(), None, retval, required, prefixes)
+    return retval
+
+
+class PdfDocument:
+    """
+    One open PDF whose form fields, page text and attachments are read lazily and cached.
+
+    Args:
+        pdf_path (str): Path of the PDF file.
+    """
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self._file = open(pdf_path, 'rb')
+        try:
+            self.reader = PdfReader(self._file)
+        except Exception:
+            self._file.close()
+            raise
+        self._form_fields = {}
+        self._xfa_fields = None
+        self._xfa_read = False
+        self._page_texts = []
+        self._attachments = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the underlying file; cached results stay available"""
+        self._file.close()
+
+    def form_fields(self, use_xfa=False, required=None):
+        """
+        Return the field path -> value snapshot of the form.
+
+        With use_xfa the values are read from the XFA template/datasets packets (see xfa_form_fields.py), already
+        normalized to the AcroForm representation, and the AcroForm tree is only walked for required paths the XFA
+        template does not define (e.g. intermediate nodes or signature fields); a full XFA snapshot holds the XFA
+        fields only. PDFs without XFA packets fall back to the AcroForm walk. With required (a frozenset of field
+        paths, e.g. pdf_no_xbrl_table_mapper.REQUIRED_FIELD_PATHS) the snapshot is limited to those paths, and the
+        AcroForm walk skips every subtree that cannot contain one of them.
+
+        Returns:
+            OrderedDict: Field name -> value (empty if the PDF has no form)
+        """
+        cache_key = (use_xfa, required)
+        if cache_key not in self._form_fields:
+            fields = self._xfa_form_fields(required) if use_xfa else None
+            if fields is None:
+                fields = self._acroform_fields(required)
+            self._form_fields[cache_key] = fields
+        return self._form_fields[cache_key]
+
+    def _acroform_fields(self, required):
+        """AcroForm snapshot limited to required; a full snapshot read earlier in the session serves every request"""
+        fields = self._form_fields.get((False, None))
+        if fields is None:
+            fields = read_acroform_fields(self.reader, required) or OrderedDict()
+            if required is None:
+                self._form_fields[(False, None)] = fields
+                return fields
+        if required is not None:
+            fields = OrderedDict((path, value) for path, value in fields.items() if path in required)
+        return fields
+
+    def _xfa_form_fields(self, required):
+        """XFA snapshot limited to required, completed from the AcroForm tree; None if the PDF has no XFA form"""
+        if not self._xfa_read:
+            self._xfa_fields = get_xfa_form_fields(self.reader)
+            self._xfa_read = True
+        if self._xfa_fields is None or required is None:
+            return self._xfa_fields
+        fields = OrderedDict((path, value) for path, value in self._xfa_fields.items() if path in required)
+        missing = required.difference(fields)
+        if missing:
+            fields.update(self._acroform_fields(frozenset(missing)))
+        return fields
+
+    def iter_page_texts(self, max_pages=DEFAULT_TEXT_PAGES):
+        """
+        Yield the text of the first max_pages pages, one page at a time.
+
+        Pages are only extracted when the iteration reaches them, so a caller that stops early (e.g. once the
+        values it searches for are found) never extracts the later pages. Pages extracted before are not
+        extracted again. The iteration stops at the first page that fails.
+
+        Yields:
+            str: Text of one page
+        """
+        page_count = min(max_pages, len(self.reader.pages))
+        for page_num in range(page_count):
+            if page_num == len(self._page_texts):
+                try:
+                    page_text = self.reader.pages[page_num].extract_text()
+                except Exception as e:
+                    logging.warning(f"Error extracting text from page {page_num + 1} of {self.pdf_path}: {e}")
+                    return
+                self._page_texts.append(page_text or "")
+            yield self._page_texts[page_num]
+
+    def page_text(self, max_pages=DEFAULT_TEXT_PAGES):
+        """
+        Return the combined text of the first max_pages pages.
+
+        Pages already extracted by an earlier call are not extracted again. Extraction stops at the first page
+        that fails, returning the text of the pages before it.
+
+        Returns:
+            str: Combined text
+        """
+        return "".join(self.iter_page_texts(max_pages))
+
+    @property
+    def attachments(self):
+        """
+        dict: Embedded file name -> list of file contents (bytes), as pypdf's PdfReader.attachments, read once
+        """
+        if self._attachments is None:
+            self._attachments = dict(self.reader.attachments)
+        return self._attachments
@@ -0,0 +1,215 @@
+"""
+pdf_hash_index.py
+
+Content-hash index of the PDFs stored in the 'XBRL' and 'No_XBRL' directories.
+
+Every stored PDF is identified by the SHA-256 of its bytes. The index is a small SQLite database that maps
+each hash to the one file kept on disk and records every other name the same bytes arrived under (aliases),
+so byte-identical filings are stored and processed once no matter how often they are re-ingested.
+The database is safe to share between the worker processes of a parallel ingestion run.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# Default location of the index, next to the XBRL and No_XBRL directories
+HASH_INDEX_PATH = "pdf_hash_index.db"
+
+# Read size used when hashing files
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def sha256_file(path):
+    """
+    Compute the SHA-256 of a file without loading it into memory.
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def unique_by_content(paths):
+    """
+    Drop the files whose bytes equal those of an earlier file in paths.
+
+    Returns:
+        tuple: (paths with the first file of each content, in order; list of (duplicate, kept path) pairs)
+    """
+    kept = {}
+    unique, duplicates = [], []
+    for path in paths:
+        sha256 = sha256_file(path)
+        if sha256 in kept:
+            duplicates.append((path, kept[sha256]))
+        else:
+            kept[sha256] = path
+            unique.append(path)
+    return unique, duplicates
+
+
+def copy_and_hash(src, dst, buffer_size=HASH_BUFFER_SIZE):
+    """
+    Copy a binary stream while hashing it, so the data is read only once.
+
+    Returns:
+        tuple: (SHA-256 hex digest, number of bytes copied)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: src.read(buffer_size), b''):
+        digest.update(chunk)
+        dst.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def open_hash_index(db_path=HASH_INDEX_PATH):
+    """
+    Open (and create if needed) the hash index database.
+
+    Returns:
+        sqlite3.Connection: Connection in autocommit mode; use index_transaction() for atomic updates
+    """
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        "sha256 TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, added REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS aliases ("
+        "sha256 TEXT NOT NULL, name TEXT NOT NULL, archive TEXT, path TEXT, seen REAL NOT NULL)"
+    )
+    _split_alias_source(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS aliases_sha256 ON aliases (sha256)")
+    conn.execute("CREATE INDEX IF NOT EXISTS files_path ON files (path)")
+    return conn
+
+
+def _split_alias_source(conn):
+    """
+    Move the single source column of indexes written by earlier versions into archive and path.
+
+    source held the ZIP archive name for routed members and the file path for files indexed in place; archive
+    names never contain a path separator, the paths always do.
+    """
+    with index_transaction(conn):
+        # Checked under the write lock, so concurrent workers opening the index migrate it once
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(aliases)")}
+        if "source" in columns:
+            conn.execute("ALTER TABLE aliases RENAME COLUMN source TO archive")
+            conn.execute("ALTER TABLE aliases ADD COLUMN path TEXT")
+            conn.execute("UPDATE aliases SET path = archive, archive = NULL WHERE instr(archive, ?) > 0", (os.sep,))
+
+
+@contextmanager
+def index_transaction(conn):
+    """
+    Hold the index write lock (BEGIN IMMEDIATE) for a check-then-store sequence,
+    so two workers can never both decide to store the same content.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def lookup_hash(conn, sha256):
+    """
+    Find the stored file of a hash.
+
+    Returns:
+        str: Path of the stored file, or None if the content is unknown or its file no longer exists
+    """
+    row = conn.execute("SELECT path FROM files WHERE sha256 = ?", (sha256,)).fetchone()
+    if row is None or not os.path.exists(row[0]):
+        return None
+    return row[0]
+
+
+def record_file(conn, sha256, path, size):
+    """Register path as the stored copy of the content sha256"""
+    conn.execute(
+        "INSERT OR REPLACE INTO files (sha256, path, size, added) VALUES (?, ?, ?, ?)",
+        (sha256, path, size, time.time())
+    )
+
+
+def record_alias(conn, sha256, name, archive=None, path=None):
+    """
+    Record that the content sha256 was also received as name.
+
+    Args:
+        archive (str): ZIP archive the name was a member of, if any
+        path (str): File the name is kept on disk as, if any (a copy stored before the index existed)
+    """
+    conn.execute(
+        "INSERT INTO aliases (sha256, name, archive, path, seen) VALUES (?, ?, ?, ?, ?)",
+        (sha256, name, archive, path, time.time())
+    )
+
+
+def get_aliases(conn, sha256):
+    """
+    Returns:
+        list: (name, archive, path) tuples the content sha256 was received under besides its stored file
+    """
+    return conn.execute(
+        "SELECT name, archive, path FROM aliases WHERE sha256 = ? ORDER BY seen", (sha256,)
+    ).fetchall()
+
+
+def alias_file_names(conn, directory):
+    """
+    List the files of directory that index_existing_files recorded as aliases of content stored elsewhere.
+
+    Such files (typically name_1.pdf copies from runs before the index existed) stay on disk, but downstream
+    stages should not process them a second time.
+
+    Returns:
+        set: File names relative to directory
+    """
+    names = set()
+    for (path,) in conn.execute("SELECT path FROM aliases WHERE path IS NOT NULL"):
+        if os.path.dirname(path) == directory and os.path.isfile(path):
+            names.add(os.path.basename(path))
+    return names
+
+
+def index_existing_files(conn, directories):
+    """
+    Add PDFs already present in directories (e.g. from runs before the index existed) to the index.
+    A file whose content is already stored under another name is recorded as an alias; no file is deleted.
+
+    Returns:
+        int: Number of files that were not indexed before
+    """
+    known_paths = {row[0] for row in conn.execute("SELECT path FROM files")}
+    known_paths.update(row[0] for row in conn.execute("SELECT path FROM aliases WHERE path IS NOT NULL"))
+    added = 0
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if path in known_paths or not name.lower().endswith('.pdf') or not os.path.isfile(path):
+                continue
+            sha256 = sha256_file(path)
+            with index_transaction(conn):
+                if lookup_hash(conn, sha256) is None:
+                    record_file(conn, sha256, path, os.path.getsize(path))
+                else:
+                    record_alias(conn, sha256, name, path=path)
+            added += 1
+    return added
@@ -0,0 +1,104 @@
+"""
+mapping_plan.py
+
+Compiles the nested table mappings of mapping_config.py into flat mapping plans.
+
+A mapping describes an output table as nested dicts whose leaves are form field paths, or (current, previous)
+pairs of field paths for tables reported over two periods. Instead of deep-copying and recursively walking the
+mapping for every PDF, the mapping is compiled once into a plan: a flat list of entries
+
+    (parent slot, output key, field path, child slot)
+
+in output order. An entry either fills output key of the dict in parent slot with the value of field path, or
+(field path None) creates the nested dict that later entries fill through child slot. Running a plan is a single
+loop over its entries, producing exactly the dicts the recursive mapping functions produced.
+
+The plan also lists its line items (the key path of every leaf below the period level, with the field path
+read for each period), which is what the columnar batch mapping of pdf_no_xbrl_table_mapper.py builds on.
+"""
+
+# Slot of the outermost output dict
+ROOT_SLOT = 0
+
+
+def compile_mapping_plan(mapping, periods=None):
+    """
+    Compile a nested mapping into a flat mapping plan.
+
+    Args:
+        mapping (dict): Nested dict whose leaves are field paths, or (current, previous) tuples of field paths
+                        when periods is given.
+        periods (tuple): Optional (output key, tuple index) pairs, e.g.
+                         (("Current reporting period", 0), ("Previous reporting period", 1)); every period gets
+                         its own copy of the mapping under its output key, filled from that element of the tuples.
+
+    Returns:
+        dict: "entries" (list of (parent slot, key, field path, child slot) tuples), "slot_count" (number of dicts
+              in the output), "field_paths" (every field path the plan reads, in plan order), "periods" (output
+              keys of the periods, or None) and "line_items" (list of (key path, field paths) tuples with one
+              field path per period, or a single one without periods)
+
+    Raises:
+        ValueError: If a leaf does not match the layout (a tuple without periods, or a single path with them)
+    """
+    entries = []
+    slot_count = [ROOT_SLOT + 1]
+    line_items = {}
+
+    def add_dict(parent, key):
+        child = slot_count[0]
+        slot_count[0] += 1
+        entries.append((parent, key, None, child))
+        return child
+
+    def add_node(node, parent, period_index, location):
+        for key, value in node.items():
+            if isinstance(value, dict):
+                add_node(value, add_dict(parent, key), period_index, location + (key,))
+            elif period_index is None:
+                if not isinstance(value, str):
+                    raise ValueError(f"Expected a field path at {' > '.join(location + (key,))}, got {value!r}")
+                entries.append((parent, key, value, None))
+                line_items.setdefault(location + (key,), []).append(value)
+            else:
+                if not isinstance(value, tuple) or len(value) <= period_index:
+                    raise ValueError(f"Expected a (current, previous) pair at {' > '.join(location + (key,))}, "
+                                     f"got {value!r}")
+                entries.append((parent, key, value[period_index], None))
+                line_items.setdefault(location[1:] + (key,), []).append(value[period_index])
+
+    if periods is None:
+        add_node(mapping, ROOT_SLOT, None, ())
+    else:
+        for period_key, period_index in periods:
+            add_node(mapping, add_dict(ROOT_SLOT, period_key), period_index, (period_key,))
+
+    return {
+        "entries": entries,
+        "slot_count": slot_count[0],
+        "field_paths": [field_path for _, _, field_path, _ in entries if field_path is not None],
+        "periods": [period_key for period_key, _ in periods] if periods is not None else None,
+        "line_items": [(key_path, tuple(field_paths)) for key_path, field_paths in line_items.items()]
+    }
+
+
+def run_mapping_plan(plan, fields):
+    """
+    Fill the output of a compiled mapping plan from a field snapshot.
+
+    Args:
+        plan (dict): Plan returned by compile_mapping_plan.
+        fields (dict): Field path -> value snapshot of one PDF; missing paths map to None.
+
+    Returns:
+        dict: The mapped table
+    """
+    get = fields.get
+    slots = [None] * plan["slot_count"]
+    result = slots[ROOT_SLOT] = {}
+    for parent, key, field_path, child in plan["entries"]:
+        if child is None:
+            slots[parent][key] = get(field_path)
+        else:
+            slots[child] = slots[parent][key] = {}
+    return result
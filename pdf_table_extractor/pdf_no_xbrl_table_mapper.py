@@ -3,25 +3,27 @@ pdf_no_xbrl_table_mapper.py
 
 This script automates the extraction and mapping of tabular data from PDF files, specifically for financial and XBRL-related forms. It provides:
 
-1. Batch processing of all PDFs in the No_XBRL directory, generating mapped tables and saving results as JSON in No_XBRL_JSON.
+1. Batch processing of all PDFs in the No_XBRL directory, generating mapped tables and saving results as JSON in No_XBRL_JSON,
+   in a pool of worker processes (--workers N, one per CPU by default), followed by a consolidated per-file status report.
 2. Command-line mode to generate a specific table for a given PDF.
+   With --frames, batch mode instead writes one wide Parquet table per table type, with a row per (filing, period)
+   and a column per line item, built column-wise from the field snapshots of all PDFs.
 3. Mapping logic for various financial tables (balance sheet, borrowings, profit and loss, etc.) using configuration mappings.
-4. Extraction of interactive form fields from PDFs using PyPDF2.
+4. Extraction of interactive form fields from PDFs through a PdfDocument session (pdf_document.py), or directly from the XFA packets (--xfa).
 5. Logging of execution flow, errors, and key actions for debugging and traceability.
-6. Modular mapping functions for different table types and periods.
+6. Table mappings with their output periods, compiled once into flat mapping plans (mapping_plan.py).
 7. Output of available table types and error handling for invalid input.
 
 This script is intended for use in financial data extraction pipelines where structured tabular data is required from regulatory PDF forms.
 """
 
-import copy
+import argparse
 import json
 import os
-import sys
 import logging
-from collections import OrderedDict
+import time
 
-from PyPDF2 import PdfReader
+import pandas as pd
 
 from pdf_table_extractor.mapping_config import (
     balance_sheet_mapping,
@@ -37,6 +39,15 @@ from pdf_table_extractor.mapping_config import (
     expenditure_in_foreign_exchange_mapping,
     financial_parameter_profit_and_loss_mapping
 )
+from pdf_table_extractor import mapping_config, mapping_plan, xfa_form_fields
+from pdf_table_extractor.mapping_plan import compile_mapping_plan, run_mapping_plan
+import pdf_document
+from pdf_document import PdfDocument
+from extract_pdf_info import INFO_FIELD_PATHS
+from field_snapshot_cache import SNAPSHOT_CACHE_PATH, cached_form_fields, open_snapshot_cache
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, source_version
+from process_pool import process_pool
+from stage_readiness import ready_files
 
 # Configure logging
 logging.basicConfig(
@@ -47,276 +58,140 @@ logging.basicConfig(
     ]
 )
 
-def get_fields(obj, tree=None, retval=None, fileobj=None):
-    """
-    Extracts field data if this PDF contains interactive form fields.
-    The *tree* and *retval* parameters are for recursive use.
-
-    :param fileobj: A file object (usually a text file) to write
-        a report to on all interactive form fields found.
-    :return: A dictionary where each key is a field name, and each
-        value is a :class:`Field<PyPDF2.generic.Field>` object. By
-        default, the mapping name is used for keys.
-    :rtype: dict, or ``None`` if form data could not be located.
-    """
-    fieldAttributes = {'/FT': 'Field Type', '/Parent': 'Parent', '/T': 'Field Name', '/TU': 'Alternate Field Name',
-                       '/TM': 'Mapping Name', '/Ff': 'Field Flags', '/V': 'Value', '/DV': 'Default Value'}
-    if retval is None:
-        retval = OrderedDict()
-        catalog = obj.trailer["/Root"]
-        # get the AcroForm tree
-        if "/AcroForm" in catalog:
-            tree = catalog["/AcroForm"]
-        else:
-            return None
-    if tree is None:
-        return retval
-
-    obj._check_kids(tree, retval, fileobj)
-    for attr in fieldAttributes:
-        if attr in tree:
-            # Tree is a field
-            obj._build_field(tree, retval, fileobj, fieldAttributes)
-            break
-
-    if "/Fields" in tree:
-        fields = tree["/Fields"]
-        for f in fields:
-            field = f.get_object()
-            obj._build_field(field, retval, fileobj, fieldAttributes)
-
-    return retval
-
-
-def get_form_fields(infile):
-    infile = PdfReader(open(infile, 'rb'))
-    fields = get_fields(infile)
-    return OrderedDict((k, v.get('/V', '')) for k, v in fields.items())
-
+# Name of the batch stage in the pipeline manifest
+MANIFEST_STAGE = "pdf_no_xbrl_table_mapper"
 
-def map_balance_sheet_data(mapping, resulted_dictionary):
-    """Map balance sheet data with current and previous periods"""
-    balance_sheet_current = copy.deepcopy(mapping)
-    balance_sheet_previous = copy.deepcopy(mapping)
+# Slowest files listed in the batch report
+REPORT_SLOWEST = 5
 
-    mapped_data = {
-        "Current balance sheet": balance_sheet_current,
-        "Previous balance sheet": balance_sheet_previous
-    }
+def get_form_fields(infile, use_xfa=False, required=None):
+    """
+    Return the field path -> value snapshot of a PDF form.
 
-    def fill_values(template_dict, result_dict, is_current):
-        for key, value in template_dict.items():
-            if isinstance(value, dict):
-                fill_values(value, result_dict, is_current)
-            elif isinstance(value, tuple):
-                if is_current:
-                    template_dict[key] = result_dict.get(value[0])
-                else:
-                    template_dict[key] = result_dict.get(value[1])
+    With use_xfa the values are read from the XFA template/datasets packets (see xfa_form_fields.py), which is
+    much cheaper than resolving the AcroForm field objects; the values are normalized to the AcroForm
+    representation. PDFs without XFA packets fall back to the AcroForm walk.
 
-    fill_values(mapped_data["Current balance sheet"], resulted_dictionary, True)
-    fill_values(mapped_data["Previous balance sheet"], resulted_dictionary, False)
+    With required (e.g. REQUIRED_FIELD_PATHS) only those field paths are extracted; AcroForm subtrees that
+    cannot contain one of them are skipped without resolving their field objects.
+    """
+    with PdfDocument(infile) as document:
+        return document.form_fields(use_xfa=use_xfa, required=required)
 
-    return mapped_data
 
+def read_field_snapshot(pdf_path, use_xfa=False, snapshot_cache=None):
+    """
+    Return the REQUIRED_FIELD_PATHS snapshot of a PDF, from the persistent snapshot cache when one is given
+    (see field_snapshot_cache.py), so that re-mapping an unchanged PDF does not parse it again.
+    """
+    if snapshot_cache is None:
+        return get_form_fields(pdf_path, use_xfa=use_xfa, required=REQUIRED_FIELD_PATHS)
+    return cached_form_fields(snapshot_cache, pdf_path, use_xfa=use_xfa, required=REQUIRED_FIELD_PATHS)
 
-def map_period_data(template, data_dict, mapping_dict):
-    """Generic function to map data with current and previous periods"""
-    mapped_data = {
-        "Current reporting period": {},
-        "Previous reporting period": {}
-    }
 
-    def fill_data(target_dict, source_data, is_current):
-        for key, value_map in mapping_dict.items():
-            if isinstance(value_map, dict):
-                target_dict[key] = {}
-                for sub_key, sub_value_map in value_map.items():
-                    if is_current:
-                        target_dict[key][sub_key] = source_data.get(sub_value_map[0])
-                    else:
-                        target_dict[key][sub_key] = source_data.get(sub_value_map[1])
-            else:
-                if is_current:
-                    target_dict[key] = source_data.get(value_map[0])
-                else:
-                    target_dict[key] = source_data.get(value_map[1])
-
-    fill_data(mapped_data["Current reporting period"], data_dict, True)
-    fill_data(mapped_data["Previous reporting period"], data_dict, False)
-
-    return mapped_data
-
-
-def map_simple_data(template, data_dict, mapping_dict):
-    """Generic function to map simple data without periods"""
-    mapped_data = {}
-    for key, value_map in mapping_dict.items():
-        mapped_data[key] = data_dict.get(value_map)
-    return mapped_data
-
-
-def map_share_capital_data(template, data_dict):
-    """Map share capital data with current and previous periods"""
-    mapped_data = {
-        "Current reporting period": {},
-        "Previous reporting period": {}
-    }
+# Output periods of the tables whose mappings hold (current, previous) field path pairs
+BALANCE_SHEET_PERIODS = (("Current balance sheet", 0), ("Previous balance sheet", 1))
+REPORTING_PERIODS = (("Current reporting period", 0), ("Previous reporting period", 1))
 
-    def fill_data(target_dict, source_data, is_current):
-        for key, value_map in share_capital_raised_mapping.items():
-            if isinstance(value_map, dict):
-                target_dict[key] = {}
-                for sub_key, sub_value_map in value_map.items():
-                    target_dict[key][sub_key] = source_data.get(sub_value_map)
-            else:
-                target_dict[key] = source_data.get(value_map)
-
-    fill_data(mapped_data["Current reporting period"], data_dict, True)
-    fill_data(mapped_data["Previous reporting period"], data_dict, False)
-
-    return mapped_data
-
-
-def map_with_multiple_dict_value_data(template, data_dict, mapping_dict):
-    """Map profit and loss data"""
-    mapped_data = {}
-    for key, value_map in mapping_dict.items():
-        if isinstance(value_map, dict):
-            mapped_data[key] = {}
-            for sub_key, sub_value in value_map.items():
-                mapped_data[key][sub_key] = data_dict.get(sub_value)
-        else:
-            mapped_data[key] = data_dict.get(value_map)
-    return mapped_data
-
-def map_with_3_level_dict_value_data(template, data_dict, mapping_dict):
-    """Recursively map up to 3-level (or more) nested dicts to values from data_dict."""
-    def recursive_map(mapping):
-        if isinstance(mapping, dict):
-            result = {}
-            for k, v in mapping.items():
-                result[k] = recursive_map(v)
-            return result
-        else:
-            return data_dict.get(mapping)
-    return recursive_map(mapping_dict)
-
-
-def map_earnings_in_foreign_exchange_data(template, data_dict):
-    """Map earnings in foreign exchange data"""
-    mapped_data = {}
-    for key, value_map in earnings_in_foreign_exchange_mapping.items():
-        mapped_data[key] = data_dict.get(value_map)
-    return mapped_data
-
-def map_expenditure_in_foreign_exchange_data(template, data_dict):
-    """Map expenditure in foreign exchange data"""
-    mapped_data = {}
-    for key, value_map in expenditure_in_foreign_exchange_mapping.items():
-        mapped_data[key] = data_dict.get(value_map)
-    return mapped_data  
-
-def map_financial_parameter_profit_and_loss_data(template, data_dict):
-    """Map financial parameter profit and loss data"""
-    mapped_data = {}
-    for key, value_map in financial_parameter_profit_and_loss_mapping.items():
-        mapped_data[key] = data_dict.get(value_map)
-    return mapped_data
-# Table mapping configuration
+# Table mapping configuration; "periods" is passed to compile_mapping_plan (None for tables without periods)
 TABLE_MAPPINGS = {
     1: {
         "name": "Balance Sheet",
         "mapping": balance_sheet_mapping,
-        "function": map_balance_sheet_data
+        "periods": BALANCE_SHEET_PERIODS
     },
     2: {
         "name": "Long Term Borrowings",
         "mapping": long_term_borrowing_mapping,
-        "function": map_period_data
+        "periods": REPORTING_PERIODS
     },
     3: {
         "name": "Short Term Borrowings",
         "mapping": short_term_borrowing_mapping,
-        "function": map_period_data
+        "periods": REPORTING_PERIODS
     },
     4: {
         "name": "Long Term Loans Unsecured",
         "mapping": long_term_loan_unsecured_mapping,
-        "function": map_period_data
+        "periods": REPORTING_PERIODS
     },
     5: {
         "name": "Long Term Loans Doubtful",
         "mapping": long_term_loan_doubtful_mapping,
-        "function": map_period_data
+        "periods": REPORTING_PERIODS
     },
     6: {
         "name": "Trade Receivables",
         "mapping": trade_receivable_mapping,
-        "function": map_period_data
+        "periods": REPORTING_PERIODS
     },
     7: {
         "name": "Financial Parameters",
         "mapping": financial_parameters_mapping,
-        "function": map_with_3_level_dict_value_data
+        "periods": None
     },
     8: {
         "name": "Share Capital Raised",
         "mapping": share_capital_raised_mapping,
-        "function": map_with_3_level_dict_value_data
+        "periods": None
     },
     9: {
         "name": "Profit and Loss",
         "mapping": profit_and_loss_mapping,
-        "function": map_with_3_level_dict_value_data
+        "periods": None
     },
     10: {
         "name": "Earnings in Foreign Exchange",
         "mapping": earnings_in_foreign_exchange_mapping,
-        "function": map_with_3_level_dict_value_data
+        "periods": None
     },
     11: {
         "name": "Expenditure in Foreign Exchange",
         "mapping": expenditure_in_foreign_exchange_mapping,
-        "function": map_with_3_level_dict_value_data
+        "periods": None
     },
     12: {
         "name": "Financial Parameters Profit and Loss",
         "mapping": financial_parameter_profit_and_loss_mapping,
-        "function": map_with_3_level_dict_value_data
-    }  
+        "periods": None
+    }
 }
 
+# Leading columns of the batch tables built by build_table_frame
+FILING_COLUMN = "filing"
+PERIOD_COLUMN = "period"
+
+# Compile every mapping once into the flat plan map_table runs
+for table_config in TABLE_MAPPINGS.values():
+    table_config["plan"] = compile_mapping_plan(table_config["mapping"], table_config["periods"])
+
+# Every field path read by the table mappings or by extract_pdf_info.process_pdf; only these are extracted
+REQUIRED_FIELD_PATHS = frozenset(
+    field_path for table_config in TABLE_MAPPINGS.values() for field_path in table_config["plan"]["field_paths"]
+) | INFO_FIELD_PATHS
 
-def generate_table_result(table_number, pdf_file_path):
+
+def map_table(table_number, field_and_values):
     """
-    Generate result for a specific table number
-    
+    Map an already extracted field snapshot to a specific table
+
     Args:
-        table_number (int): The table number (1-9)
-        pdf_file_path (str): Path to the PDF file
-    
+        table_number (int): The table number (1-12)
+        field_and_values (dict): Field path -> value snapshot returned by get_form_fields
+
     Returns:
         dict: The mapped data for the specified table
     """
     if table_number not in TABLE_MAPPINGS:
         available_tables = ", ".join(map(str, TABLE_MAPPINGS.keys()))
         raise ValueError(f"Invalid table number. Available tables: {available_tables}")
-    
-    # Get form fields from PDF
-    field_and_values = get_form_fields(pdf_file_path)
-    
+
     # Get table configuration
     table_config = TABLE_MAPPINGS[table_number]
-    
-    # Generate result using the appropriate mapping function
-    if table_config["function"] == map_period_data:
-        result = table_config["function"](None, field_and_values, table_config["mapping"])
-    elif table_config["function"] in [map_with_multiple_dict_value_data, map_with_3_level_dict_value_data]:
-        result = table_config["function"](None,field_and_values, table_config["mapping"])
-    else:
-        result = table_config["function"](table_config["mapping"], field_and_values)
-    
+
+    # Fill the table from its compiled mapping plan
+    result = run_mapping_plan(table_config["plan"], field_and_values)
+
     return {
         "table_name": table_config["name"],
         "table_number": table_number,
@@ -324,6 +199,153 @@ def generate_table_result(table_number, pdf_file_path):
     }
 
 
+def generate_table_result(table_number, pdf_file_path, use_xfa=False):
+    """
+    Generate result for a specific table number
+    
+    Args:
+        table_number (int): The table number (1-12)
+        pdf_file_path (str): Path to the PDF file
+        use_xfa (bool): Read the form values from the XFA packets
+    
+    Returns:
+        dict: The mapped data for the specified table
+
+    Raises:
+        ValueError: If table_number is not in TABLE_MAPPINGS (raised by map_table)
+    """
+    # Get form fields from PDF
+    field_and_values = get_form_fields(pdf_file_path, use_xfa=use_xfa, required=REQUIRED_FIELD_PATHS)
+
+    return map_table(table_number, field_and_values)
+
+
+def table_result_key(table_number, table_name):
+    """Key used for a table in the per-PDF JSON output"""
+    return f"Table_{table_number}_{table_name.replace(' ', '_')}"
+
+
+def generate_all_tables(fields, pdf_name=None):
+    """
+    Generate every table in TABLE_MAPPINGS from one field snapshot.
+
+    The snapshot is extracted once per PDF (see get_form_fields) and shared by all
+    table mappings, so the PDF is not re-opened for each table.
+
+    Args:
+        fields (dict): Field path -> value snapshot returned by get_form_fields
+        pdf_name (str): Optional file name used in log messages
+
+    Returns:
+        dict: Table results keyed as in the No_XBRL_JSON output; a failing table is
+        stored under "Table_<n>_error" with the error message
+    """
+    all_results = {}
+    for table_number in sorted(TABLE_MAPPINGS.keys()):
+        try:
+            result = map_table(table_number, fields)
+            all_results[table_result_key(table_number, result['table_name'])] = result['data']
+            if pdf_name:
+                logging.info(f"[pdf_no_xbrl_table_mapper.py] Successfully generated Table {table_number} for {pdf_name}")
+        except Exception as e:
+            all_results[f"Table_{table_number}_error"] = str(e)
+            logging.error(f"[pdf_no_xbrl_table_mapper.py] Error generating Table {table_number} for {pdf_name or 'snapshot'}: {e}")
+    return all_results
+
+
+def line_item_column(key_path):
+    """Column of a line item in the batch tables, e.g. "EQUITY AND LIABILITIES > Current liabilities > Trade payables" """
+    return " > ".join(key_path)
+
+
+def build_table_frame(table_number, snapshots):
+    """
+    Map many field snapshots side by side into one wide table.
+
+    The table is built column by column straight from the compiled mapping plan: every line item column is
+    read from all snapshots at once, without building the nested per-filing dicts of map_table.
+
+    Args:
+        table_number (int): The table number (1-12)
+        snapshots (dict): Filing name -> field snapshot returned by get_form_fields
+
+    Returns:
+        pandas.DataFrame: One row per (filing, period) in input order with the FILING_COLUMN and PERIOD_COLUMN
+        columns (the period is None for tables without periods), then one string column per line item
+    """
+    if table_number not in TABLE_MAPPINGS:
+        available_tables = ", ".join(map(str, TABLE_MAPPINGS.keys()))
+        raise ValueError(f"Invalid table number. Available tables: {available_tables}")
+
+    plan = TABLE_MAPPINGS[table_number]["plan"]
+    filings = list(snapshots)
+    field_snapshots = list(snapshots.values())
+    periods = plan["periods"] or [None]
+
+    columns = {
+        FILING_COLUMN: [filing for filing in filings for _ in periods],
+        PERIOD_COLUMN: periods * len(filings)
+    }
+    for key_path, field_paths in plan["line_items"]:
+        values = [fields.get(field_path) for fields in field_snapshots for field_path in field_paths]
+        columns[line_item_column(key_path)] = pd.array(values, dtype="string")
+    return pd.DataFrame(columns)
+
+
+def build_table_frames(snapshots, table_numbers=None):
+    """
+    Build the wide table of every (or every requested) TABLE_MAPPINGS entry from many field snapshots.
+
+    Args:
+        snapshots (dict): Filing name -> field snapshot returned by get_form_fields
+        table_numbers (list): Optional table numbers; defaults to all tables
+
+    Returns:
+        dict: Table number -> pandas.DataFrame (see build_table_frame)
+    """
+    if table_numbers is None:
+        table_numbers = sorted(TABLE_MAPPINGS.keys())
+    return {table_number: build_table_frame(table_number, snapshots) for table_number in table_numbers}
+
+
+def open_project_snapshot_cache(project_root, use_cache=True):
+    """Open the field snapshot cache of the project, or return None when caching is disabled"""
+    return open_snapshot_cache(os.path.join(project_root, SNAPSHOT_CACHE_PATH)) if use_cache else None
+
+
+def export_table_frames(output_dir, use_xfa=False, use_cache=True):
+    """
+    Map every PDF in No_XBRL into one Parquet table per TABLE_MAPPINGS entry, written to output_dir as
+    Table_<n>_<name>.parquet. Field snapshots come from the snapshot cache unless use_cache is False.
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    no_xbrl_dir = os.path.join(project_root, "No_XBRL")
+    os.makedirs(output_dir, exist_ok=True)
+
+    pdf_files = ready_files(no_xbrl_dir, '.pdf')
+    if not pdf_files:
+        logging.warning(f"[pdf_no_xbrl_table_mapper.py] No PDF files found in {no_xbrl_dir}")
+        return
+
+    snapshots = {}
+    snapshot_cache = open_project_snapshot_cache(project_root, use_cache)
+    try:
+        for pdf_file in pdf_files:
+            pdf_path = os.path.join(no_xbrl_dir, pdf_file)
+            try:
+                snapshots[os.path.splitext(pdf_file)[0]] = read_field_snapshot(pdf_path, use_xfa, snapshot_cache)
+            except Exception as e:
+                logging.error(f"[pdf_no_xbrl_table_mapper.py] Error reading form fields from {pdf_file}: {e}")
+    finally:
+        if snapshot_cache is not None:
+            snapshot_cache.close()
+
+    for table_number, frame in build_table_frames(snapshots).items():
+        table_path = os.path.join(output_dir, table_result_key(table_number, TABLE_MAPPINGS[table_number]["name"]) + ".parquet")
+        frame.to_parquet(table_path, index=False)
+        logging.info(f"[pdf_no_xbrl_table_mapper.py] Saved {len(frame)} row(s) of Table {table_number} to {table_path}")
+
+
 def print_available_tables():
     """Print all available table numbers and names"""
     logging.info("[pdf_no_xbrl_table_mapper.py] Available Tables:")
@@ -333,51 +355,184 @@ def print_available_tables():
     logging.info("-" * 50)
 
 
-def process_all_pdfs_in_no_xbrl():
+def stage_version(use_xfa=False):
+    """Version of this stage recorded in the pipeline manifest"""
+    # The output depends on this module, the mappings, the plan compiler and the field reader
+    return source_version(__file__, mapping_config.__file__, mapping_plan.__file__, xfa_form_fields.__file__,
+                          pdf_document.__file__, extra={"xfa": use_xfa})
+
+
+def map_pdf_file(pdf_path, json_path, use_xfa=False, cache_path=None):
+    """
+    Map every table of one PDF and write its JSON. Runs in worker processes, so errors are returned, not raised,
+    and the per-file progress is logged here, as each worker starts the file.
+
+    Args:
+        pdf_path (str): Path of the No_XBRL PDF.
+        json_path (str): Path of the JSON file to write.
+        use_xfa (bool): Read the form values from the XFA packets.
+        cache_path (str): Optional field snapshot cache database (see field_snapshot_cache.py).
+
+    Returns:
+        dict: Status of the file: "pdf_file", "status" ("ok", "table_errors" or "failed"), "table_errors" (numbers
+              of the tables that could not be mapped), "error" (message when the form could not be read or the JSON
+              could not be written) and "duration" (seconds)
+    """
+    started = time.perf_counter()
+    pdf_file = os.path.basename(pdf_path)
+    status = {"pdf_file": pdf_file, "status": "ok", "table_errors": [], "error": None, "duration": 0.0}
+    logging.info(f"[pdf_no_xbrl_table_mapper.py] Processing: {pdf_file}")
+    snapshot_cache = None
+    try:
+        snapshot_cache = open_snapshot_cache(cache_path) if cache_path else None
+        try:
+            # Parse the form once and share the snapshot with every table mapping
+            fields = read_field_snapshot(pdf_path, use_xfa, snapshot_cache)
+        except Exception as e:
+            logging.error(f"[pdf_no_xbrl_table_mapper.py] Error reading form fields from {pdf_file}: {e}")
+            all_results = {f"Table_{table_number}_error": str(e) for table_number in sorted(TABLE_MAPPINGS.keys())}
+            status["status"] = "failed"
+            status["error"] = str(e)
+        else:
+            all_results = generate_all_tables(fields, pdf_file)
+            status["table_errors"] = [table_number for table_number in sorted(TABLE_MAPPINGS.keys())
+                                      if f"Table_{table_number}_error" in all_results]
+            if status["table_errors"]:
+                status["status"] = "table_errors"
+        # Save to JSON file
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(all_results, f, indent=4, ensure_ascii=False)
+    except Exception as e:
+        status["status"] = "failed"
+        status["error"] = str(e)
+    finally:
+        if snapshot_cache is not None:
+            snapshot_cache.close()
+    status["duration"] = time.perf_counter() - started
+    return status
+
+
+def log_mapping_status(manifest, version, pdf_path, json_path, status):
+    """Log the outcome of one PDF and record it in the pipeline manifest unless its form could not be read"""
+    if status["status"] == "failed":
+        logging.error(f"[pdf_no_xbrl_table_mapper.py] Failed to process {status['pdf_file']}: {status['error']}")
+        return
+    logging.info(f"[pdf_no_xbrl_table_mapper.py] Saved results to {json_path} ({status['duration']:.2f}s)\n")
+    record_done(manifest, MANIFEST_STAGE, pdf_path, version, [json_path])
+
+
+def log_batch_report(statuses, elapsed):
+    """Log the consolidated report of a batch run: outcome counts, failing files and the slowest files"""
+    counts = {outcome: sum(1 for status in statuses if status["status"] == outcome)
+              for outcome in ("ok", "table_errors", "failed")}
+    logging.info("[pdf_no_xbrl_table_mapper.py] " + "-" * 50)
+    logging.info(f"[pdf_no_xbrl_table_mapper.py] Mapped {len(statuses)} PDF(s) in {elapsed:.1f}s: {counts['ok']} ok, "
+                 f"{counts['table_errors']} with table errors, {counts['failed']} failed")
+    for status in statuses:
+        if status["status"] == "table_errors":
+            tables = ", ".join(str(table_number) for table_number in status["table_errors"])
+            logging.warning(f"[pdf_no_xbrl_table_mapper.py]   {status['pdf_file']}: errors in table(s) {tables}")
+        elif status["status"] == "failed":
+            logging.error(f"[pdf_no_xbrl_table_mapper.py]   {status['pdf_file']}: {status['error']}")
+    slowest = sorted(statuses, key=lambda status: status["duration"], reverse=True)[:REPORT_SLOWEST]
+    if slowest:
+        logging.info("[pdf_no_xbrl_table_mapper.py] Slowest: " +
+                     ", ".join(f"{status['pdf_file']} ({status['duration']:.2f}s)" for status in slowest))
+
+
+def process_all_pdfs_in_no_xbrl(use_xfa=False, force=False, use_cache=True, workers=1):
     """
     For each PDF in No_XBRL, generate all table results and save as a single JSON file in No_XBRL_JSON.
+    PDFs whose JSON is current according to the pipeline manifest are skipped unless force is set.
+    Field snapshots come from the snapshot cache unless use_cache is False, so after a mapping change the PDFs
+    are re-mapped without being parsed again. With workers > 1 the PDFs are mapped in a pool of worker
+    processes; each worker writes its own JSON files and returns the status of each file to this process,
+    which records the manifest and logs the consolidated report.
+
+    Returns:
+        list: Status dicts of the mapped PDFs (see map_pdf_file), in file order
     """
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     no_xbrl_dir = os.path.join(project_root, "No_XBRL")
     output_dir = os.path.join(project_root, "No_XBRL_JSON")
     os.makedirs(output_dir, exist_ok=True)
 
-    pdf_files = [f for f in os.listdir(no_xbrl_dir) if f.lower().endswith('.pdf')]
+    pdf_files = ready_files(no_xbrl_dir, '.pdf')
     if not pdf_files:
         logging.warning(f"[pdf_no_xbrl_table_mapper.py] No PDF files found in {no_xbrl_dir}")
-        return
-
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(no_xbrl_dir, pdf_file)
-        logging.info(f"[pdf_no_xbrl_table_mapper.py] Processing: {pdf_file}")
-        all_results = {}
-        for table_number in sorted(TABLE_MAPPINGS.keys()):
-            try:
-                result = generate_table_result(table_number, pdf_path)
-                all_results[f"Table_{table_number}_{result['table_name'].replace(' ', '_')}"] = result['data']
-                logging.info(f"[pdf_no_xbrl_table_mapper.py] Successfully generated Table {table_number} for {pdf_file}")
-            except Exception as e:
-                all_results[f"Table_{table_number}_error"] = str(e)
-                logging.error(f"[pdf_no_xbrl_table_mapper.py] Error generating Table {table_number} for {pdf_file}: {e}")
-        # Save to JSON file
-        json_filename = os.path.splitext(pdf_file)[0] + ".json"
-        json_path = os.path.join(output_dir, json_filename)
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(all_results, f, indent=4, ensure_ascii=False)
-        logging.info(f"[pdf_no_xbrl_table_mapper.py] Saved results to {json_path}\n")
+        return []
 
-
-def main():
+    manifest = open_manifest(os.path.join(project_root, MANIFEST_FILE))
+    version = stage_version(use_xfa)
+    cache_path = os.path.join(project_root, SNAPSHOT_CACHE_PATH) if use_cache else None
+    started = time.perf_counter()
+    statuses = []
+    try:
+        pending = []
+        for pdf_file in pdf_files:
+            pdf_path = os.path.join(no_xbrl_dir, pdf_file)
+            json_path = os.path.join(output_dir, os.path.splitext(pdf_file)[0] + ".json")
+            if not force and is_current(manifest, MANIFEST_STAGE, pdf_path, version):
+                logging.info(f"[pdf_no_xbrl_table_mapper.py] Skipping: {pdf_file} (results are current)")
+                continue
+            pending.append((pdf_path, json_path))
+
+        if workers > 1 and len(pending) > 1:
+            workers = min(workers, len(pending))
+            logging.info(f"[pdf_no_xbrl_table_mapper.py] Mapping {len(pending)} PDF(s) with {workers} worker processes")
+            with process_pool(workers) as executor:
+                # One PDF per task: files differ widely in size, so small tasks keep the workers evenly loaded.
+                # map() yields results in submission order, so the log reads the same as a serial run
+                results = executor.map(map_pdf_file,
+                                       [pdf_path for pdf_path, _ in pending],
+                                       [json_path for _, json_path in pending],
+                                       [use_xfa] * len(pending), [cache_path] * len(pending))
+                for (pdf_path, json_path), status in zip(pending, results):
+                    log_mapping_status(manifest, version, pdf_path, json_path, status)
+                    statuses.append(status)
+        else:
+            for pdf_path, json_path in pending:
+                status = map_pdf_file(pdf_path, json_path, use_xfa, cache_path)
+                log_mapping_status(manifest, version, pdf_path, json_path, status)
+                statuses.append(status)
+    finally:
+        manifest.close()
+    if statuses:
+        log_batch_report(statuses, time.perf_counter() - started)
+    return statuses
+
+
+def main(argv=None):
     """Main function to run the table generator"""
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Map tables from non-XBRL AOC-4 PDF forms.")
+    parser.add_argument("table_number", nargs="?", help="Table number to generate; omit to run batch mode over No_XBRL")
+    parser.add_argument("pdf_file_path", nargs="?", help="PDF file to read (defaults to a sample in No_XBRL)")
+    parser.add_argument("--xfa", action="store_true", help="Read form values from the XFA packets instead of the AcroForm tree")
+    parser.add_argument("--force", action="store_true", help="In batch mode, reprocess PDFs whose results are already current")
+    parser.add_argument("--frames", metavar="OUTPUT_DIR",
+                        help="Instead of per-PDF JSON, write one Parquet table per table type with a row per (filing, period)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="In batch mode, number of worker processes mapping PDFs in parallel (default: one per CPU)")
+    parser.add_argument("--no-snapshot-cache", action="store_true",
+                        help="In batch mode, parse every PDF instead of reading cached field snapshots")
+    args = parser.parse_args(argv)
+
+    if args.frames:
+        logging.info(f"[pdf_no_xbrl_table_mapper.py] Building the batch tables of all PDFs in No_XBRL into {args.frames}...\n")
+        export_table_frames(args.frames, use_xfa=args.xfa, use_cache=not args.no_snapshot_cache)
+        return
+    if args.table_number is None:
         logging.info("[pdf_no_xbrl_table_mapper.py] No arguments provided. Running batch mode for all PDFs in No_XBRL...\n")
-        process_all_pdfs_in_no_xbrl()
+        # run_data_pipeline calls main([]), so the default must already use every CPU
+        workers = args.workers or os.cpu_count() or 1
+        process_all_pdfs_in_no_xbrl(use_xfa=args.xfa, force=args.force, use_cache=not args.no_snapshot_cache,
+                                    workers=workers)
         return
     try:
-        table_number = int(sys.argv[1])
+        table_number = int(args.table_number)
         # Use default PDF file if not provided
-        if len(sys.argv) >= 3:
-            pdf_file_path = sys.argv[2]
+        if args.pdf_file_path:
+            pdf_file_path = args.pdf_file_path
         else:
             # Default PDF file path
             project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -389,7 +544,7 @@ def main():
             logging.error(f"[pdf_no_xbrl_table_mapper.py] Error: PDF file not found at {pdf_file_path}")
             return
         # Generate result
-        result = generate_table_result(table_number, pdf_file_path)
+        result = generate_table_result(table_number, pdf_file_path, use_xfa=args.xfa)
         # Print result
         logging.info(f"[pdf_no_xbrl_table_mapper.py] === {result['table_name']} (Table {result['table_number']}) ===")
         logging.info(json.dumps(result['data'], indent=4))
@@ -0,0 +1,180 @@
+import copy
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+from pdf_table_extractor.mapping_plan import compile_mapping_plan, run_mapping_plan
+from pdf_table_extractor.pdf_no_xbrl_table_mapper import (
+    FILING_COLUMN,
+    PERIOD_COLUMN,
+    BALANCE_SHEET_PERIODS,
+    REPORTING_PERIODS,
+    TABLE_MAPPINGS,
+    build_table_frame,
+    build_table_frames,
+    generate_all_tables,
+    map_pdf_file,
+    map_table
+)
+
+from test_pdf_document import write_pdf
+from pdf_table_extractor.resulted_dict_for_testing import (
+    balance_sheet_resulted_dictionary,
+    long_term_resulted_dictionary,
+    share_capital_raised_resulted_dictionary
+)
+
+
+def build_field_snapshot():
+    """Combine the static test dictionaries into one per-document field snapshot"""
+    fields = {}
+    fields.update(balance_sheet_resulted_dictionary)
+    fields.update(long_term_resulted_dictionary)
+    fields.update(share_capital_raised_resulted_dictionary)
+    return fields
+
+
+def test_generate_all_tables_uses_one_snapshot():
+    """Every table is generated from the same snapshot without reading a PDF"""
+    fields = build_field_snapshot()
+    all_results = generate_all_tables(fields)
+
+    assert len(all_results) == len(TABLE_MAPPINGS)
+    assert not any(key.endswith("_error") for key in all_results)
+    balance_sheet = all_results["Table_1_Balance_Sheet"]
+    assert balance_sheet["Current balance sheet"]["EQUITY AND LIABILITIES"]["Shareholder's Fund"]["Share capital"] == '2135800'
+    assert balance_sheet["Previous balance sheet"]["EQUITY AND LIABILITIES"]["Shareholder's Fund"]["Share capital"] == '1171880'
+
+
+def test_generate_all_tables_matches_map_table():
+    """generate_all_tables produces the same data as mapping each table on its own"""
+    fields = build_field_snapshot()
+    all_results = generate_all_tables(fields)
+
+    for table_number in TABLE_MAPPINGS:
+        result = map_table(table_number, fields)
+        key = f"Table_{table_number}_{result['table_name'].replace(' ', '_')}"
+        assert all_results[key] == result["data"]
+
+
+# The recursive mapping functions the tables were mapped with before the compiled plans, kept as the oracle
+def map_balance_sheet_data(mapping, resulted_dictionary):
+    """Map balance sheet data with current and previous periods"""
+    mapped_data = {
+        "Current balance sheet": copy.deepcopy(mapping),
+        "Previous balance sheet": copy.deepcopy(mapping)
+    }
+
+    def fill_values(template_dict, result_dict, is_current):
+        for key, value in template_dict.items():
+            if isinstance(value, dict):
+                fill_values(value, result_dict, is_current)
+            elif isinstance(value, tuple):
+                template_dict[key] = result_dict.get(value[0] if is_current else value[1])
+
+    fill_values(mapped_data["Current balance sheet"], resulted_dictionary, True)
+    fill_values(mapped_data["Previous balance sheet"], resulted_dictionary, False)
+    return mapped_data
+
+
+def map_period_data(mapping_dict, data_dict):
+    """Map data with current and previous periods"""
+    mapped_data = {
+        "Current reporting period": {},
+        "Previous reporting period": {}
+    }
+
+    def fill_data(target_dict, source_data, index):
+        for key, value_map in mapping_dict.items():
+            if isinstance(value_map, dict):
+                target_dict[key] = {sub_key: source_data.get(sub_value_map[index])
+                                    for sub_key, sub_value_map in value_map.items()}
+            else:
+                target_dict[key] = source_data.get(value_map[index])
+
+    fill_data(mapped_data["Current reporting period"], data_dict, 0)
+    fill_data(mapped_data["Previous reporting period"], data_dict, 1)
+    return mapped_data
+
+
+def map_nested_data(mapping_dict, data_dict):
+    """Recursively map nested dicts to values from data_dict"""
+    if isinstance(mapping_dict, dict):
+        return {key: map_nested_data(value, data_dict) for key, value in mapping_dict.items()}
+    return data_dict.get(mapping_dict)
+
+
+ORACLE_FUNCTIONS = {BALANCE_SHEET_PERIODS: map_balance_sheet_data, REPORTING_PERIODS: map_period_data,
+                    None: map_nested_data}
+
+
+def test_compiled_plans_match_mapping_functions():
+    """Every compiled plan produces exactly what the recursive mapping function produced"""
+    fields = build_field_snapshot()
+    for table_number, table_config in TABLE_MAPPINGS.items():
+        expected = ORACLE_FUNCTIONS[table_config["periods"]](table_config["mapping"], fields)
+        data = map_table(table_number, fields)["data"]
+        assert data == expected
+        assert json.dumps(data) == json.dumps(expected)
+
+
+def test_compile_mapping_plan_flattens_nested_periods():
+    mapping = {"Total": ("a", "aP"), "Loans": {"From banks": ("b", "bP")}}
+    plan = compile_mapping_plan(mapping, periods=(("Current", 0), ("Previous", 1)))
+
+    assert plan["field_paths"] == ["a", "b", "aP", "bP"]
+    assert run_mapping_plan(plan, {"a": "1", "bP": "2"}) == {
+        "Current": {"Total": "1", "Loans": {"From banks": None}},
+        "Previous": {"Total": None, "Loans": {"From banks": "2"}}
+    }
+    # Each run builds fresh dicts
+    assert run_mapping_plan(plan, {}) is not run_mapping_plan(plan, {})
+    with pytest.raises(ValueError):
+        compile_mapping_plan(mapping)
+
+
+def test_build_table_frame_has_a_row_per_filing_and_period():
+    """The wide table holds the same values as map_table, one row per (filing, period)"""
+    fields = build_field_snapshot()
+    snapshots = {"filing_a": fields, "filing_b": {}}
+    frame = build_table_frame(1, snapshots)
+
+    assert list(frame[FILING_COLUMN]) == ["filing_a", "filing_a", "filing_b", "filing_b"]
+    assert list(frame[PERIOD_COLUMN]) == ["Current balance sheet", "Previous balance sheet"] * 2
+    column = "EQUITY AND LIABILITIES > Shareholder's Fund > Share capital"
+    assert list(frame[column][:2]) == ['2135800', '1171880']
+    assert frame[column][2:].isna().all()
+
+    # Every line item of every table matches the nested result of map_table
+    for table_number, table_frame in build_table_frames(snapshots).items():
+        data = map_table(table_number, fields)["data"]
+        rows = table_frame[table_frame[FILING_COLUMN] == "filing_a"]
+        for _, row in rows.iterrows():
+            values = data[row[PERIOD_COLUMN]] if row[PERIOD_COLUMN] is not None else data
+            for column in rows.columns[2:]:
+                value = values
+                for key in column.split(" > "):
+                    value = value[key]
+                assert (None if pd.isna(row[column]) else row[column]) == value
+
+
+def test_map_pdf_file_reports_status(tmp_path, caplog):
+    """Workers log and write the JSON of each PDF and return its status instead of raising"""
+    pdf_path = write_pdf(tmp_path / "filing.pdf", pages=["AOC-4"], form=True)
+    with caplog.at_level(logging.INFO):
+        status = map_pdf_file(pdf_path, str(tmp_path / "filing.json"), cache_path=str(tmp_path / "cache.db"))
+    assert "Processing: filing.pdf" in caplog.text
+    assert (status["pdf_file"], status["status"], status["table_errors"], status["error"]) == \
+        ("filing.pdf", "ok", [], None)
+    assert status["duration"] >= 0
+    with open(tmp_path / "filing.json", encoding="utf-8") as f:
+        assert len(json.load(f)) == len(TABLE_MAPPINGS)
+
+    broken_path = tmp_path / "broken.pdf"
+    broken_path.write_bytes(b"%PDF-1.4 truncated")
+    status = map_pdf_file(str(broken_path), str(tmp_path / "broken.json"))
+    assert status["status"] == "failed" and status["error"]
+    with open(tmp_path / "broken.json", encoding="utf-8") as f:
+        assert all(key.endswith("_error") for key in json.load(f))
@@ -0,0 +1,194 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, NameObject, TextStringObject
+
+import pdf_document
+from pdf_document import PdfDocument, read_acroform_fields
+from pdf_table_extractor.xfa_form_fields import (
+    normalize_xfa_value,
+    parse_xfa_datasets,
+    parse_xfa_form_state,
+    parse_xfa_template_bindings,
+    template_field_format
+)
+from test_pdf_document import add_form, add_text_page
+
+# Sample filings whose AcroForm tree defines most fields, and one with a skeletal AcroForm tree
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "XBRL")
+FULL_ACROFORM_SAMPLE = os.path.join(SAMPLE_DIR, "11__Form_AOC-4(XBRL)-19082019_signed.pdf")
+SKELETAL_ACROFORM_SAMPLE = os.path.join(SAMPLE_DIR, "0__Form_AOC-4(XBRL)-26092024-signed.pdf")
+
+TEMPLATE = b"""<template xmlns="http://www.xfa.org/schema/xfa-template/2.8/">
+<subform name="data">
+  <subform name="FormAOC4_Dtls">
+    <subform name="Segment1_PartA">
+      <field name="CIN_C"><bind match="dataRef" ref="$record.COMPANY.CIN"/></field>
+      <field name="Total"><bind match="none"/></field>
+    </subform>
+    <subform>
+      <subform name="Row">
+        <field name="Amount"/>
+      </subform>
+      <subform name="Row">
+        <field name="Amount"/>
+      </subform>
+    </subform>
+  </subform>
+</subform>
+</template>"""
+
+DATASETS = b"""<xfa:datasets xmlns:xfa="http://www.xfa.org/schema/xfa-data/1.0/">
+<xfa:data>
+  <data>
+    <COMPANY><CIN>L29120MH1986PLC042028</CIN></COMPANY>
+    <FormAOC4_Dtls>
+      <Row><Amount>100</Amount></Row>
+      <Row><Amount>200</Amount></Row>
+    </FormAOC4_Dtls>
+  </data>
+</xfa:data>
+</xfa:datasets>"""
+
+FORM = b"""<form xmlns="http://www.xfa.org/schema/xfa-form/2.8/">
+<subform name="data">
+  <subform name="FormAOC4_Dtls">
+    <subform name="Segment1_PartA">
+      <field name="Total"><value><decimal>300</decimal></value></field>
+    </subform>
+  </subform>
+</subform>
+</form>"""
+
+
+def test_parse_xfa_datasets_indexes_repeated_siblings():
+    """Data paths carry the index of each element among same-named siblings"""
+    values = parse_xfa_datasets(DATASETS)
+    assert values["data[0].COMPANY[0].CIN[0]"] == "L29120MH1986PLC042028"
+    assert values["data[0].FormAOC4_Dtls[0].Row[1].Amount[0]"] == "200"
+
+
+def test_template_bindings_follow_data_refs_and_default_binding():
+    """Explicit refs, name matching and unnamed subforms resolve to the expected data nodes"""
+    bindings = parse_xfa_template_bindings(TEMPLATE, "data[0]")
+    assert bindings["data[0].FormAOC4_Dtls[0].Segment1_PartA[0].CIN_C[0]"] == "data[0].COMPANY[0].CIN[0]"
+    assert bindings["data[0].FormAOC4_Dtls[0].Segment1_PartA[0].Total[0]"] is None
+    assert bindings["data[0].FormAOC4_Dtls[0].Row[1].Amount[0]"] == "data[0].FormAOC4_Dtls[0].Row[1].Amount[0]"
+
+
+def test_form_state_holds_unbound_values():
+    """Values of fields bound to no data are read from the form packet"""
+    values = parse_xfa_form_state(FORM)
+    assert values == {"data[0].FormAOC4_Dtls[0].Segment1_PartA[0].Total[0]": "300"}
+
+
+FIELD_TEMPLATES = b"""<subform xmlns="http://www.xfa.org/schema/xfa-template/2.8/">
+<field name="FromDate"><ui><dateTimeEdit/><picture>date{DD/MM/YYYY}</picture></ui><value><date/></value></field>
+<field name="SystemDate"><ui><dateTimeEdit/></ui><value><date/></value></field>
+<field name="Serial"><ui><textEdit/></ui><value><text maxChars="4"/></value></field>
+<field name="Version"><ui><textEdit/></ui><value><text>8</text></value></field>
+<field name="Photo"><ui><imageEdit/></ui></field>
+<exclGroup name="Language">
+  <field name="English"><ui><checkButton/></ui><value><text>ENGL</text></value><items><text>ENGL</text></items></field>
+  <field name="Hindi"><ui><checkButton/></ui><items><text>HIND</text></items></field>
+</exclGroup>
+</subform>"""
+
+
+def test_template_field_format():
+    """Date pictures, maxChars, choices and template defaults are read from the template field"""
+    formats = {elem.get("name"): template_field_format(elem) for elem in ET.fromstring(FIELD_TEMPLATES)}
+    assert formats["FromDate"] == ("date", "DD/MM/YYYY", None, '')
+    assert formats["SystemDate"] == ("date", None, None, '')
+    assert formats["Serial"] == ("text", None, 4, '')
+    assert formats["Version"] == ("text", None, None, "8")
+    assert formats["Photo"] == ("none", None, None, '')
+    assert formats["Language"] == ("name", None, None, "ENGL")
+
+
+def test_normalize_xfa_value_matches_acroform_representation():
+    assert normalize_xfa_value("2019-03-31", "date", "DD/MM/YYYY") == "31/03/2019"
+    assert normalize_xfa_value("1992-06-10T00:00:00+05:30", "date") == "6/10/92"
+    assert normalize_xfa_value("not a date", "date") == "not a date"
+    assert normalize_xfa_value("NO", "name") == "/NO"
+    assert normalize_xfa_value("Line 1\nLine 2\r\nLine 3", "text") == "Line 1\rLine 2\rLine 3"
+    assert normalize_xfa_value("21FD82FD02001CA6", "text", max_chars=12) == "21FD82FD0200"
+    assert normalize_xfa_value("/9j/4AAQ", "none") == ''
+    assert normalize_xfa_value('', "name") == ''
+
+
+def write_xfa_pdf(path):
+    """A PDF whose AcroForm dictionary carries the TEMPLATE, DATASETS and FORM packets next to the add_form fields"""
+    writer = PdfWriter()
+    add_text_page(writer, "AOC-4")
+    add_form(writer)
+    packets = []
+    for name, data in (("template", TEMPLATE), ("datasets", DATASETS), ("form", FORM)):
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        packets += [TextStringObject(name), writer._add_object(stream)]
+    writer._root_object["/AcroForm"][NameObject("/XFA")] = ArrayObject(packets)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_xfa_mode_never_walks_the_whole_acroform_tree(tmp_path, monkeypatch):
+    """XFA values are read from the packets; the AcroForm tree is only walked for required paths XFA lacks"""
+    walks = []
+
+    def recording_read_acroform_fields(reader, required=None):
+        walks.append(required)
+        return read_acroform_fields(reader, required)
+
+    monkeypatch.setattr(pdf_document, "read_acroform_fields", recording_read_acroform_fields)
+    pdf_path = write_xfa_pdf(tmp_path / "xfa.pdf")
+    cin_path = "data[0].FormAOC4_Dtls[0].Segment1_PartA[0].CIN_C[0]"
+    with PdfDocument(pdf_path) as document:
+        fields = document.form_fields(use_xfa=True)
+        assert fields[cin_path] == "L29120MH1986PLC042028"
+        assert fields["data[0].FormAOC4_Dtls[0].Segment1_PartA[0].Total[0]"] == "300"
+        assert walks == []
+
+        # The AcroForm-only path is read with a walk limited to it
+        required = frozenset([cin_path, "data[0].CIN_C[0]"])
+        assert document.form_fields(use_xfa=True, required=required) == {
+            cin_path: "L29120MH1986PLC042028", "data[0].CIN_C[0]": "L35921TN1992PLC022845"}
+        assert walks == [frozenset(["data[0].CIN_C[0]"])]
+
+
+@pytest.mark.skipif(not os.path.exists(FULL_ACROFORM_SAMPLE), reason="sample filing not available")
+def test_xfa_snapshot_agrees_with_acroform_snapshot():
+    """On a real filing the XFA values equal the AcroForm values of the same paths and add XFA-only fields"""
+    with PdfDocument(FULL_ACROFORM_SAMPLE) as document:
+        acroform_fields = document.form_fields()
+        xfa_fields = document.form_fields(use_xfa=True)
+        sign_path = next(path for path in acroform_fields if path.endswith(".Sign1[0]"))
+        required = frozenset([sign_path, "data[0]"])
+        required_fields = document.form_fields(use_xfa=True, required=required)
+    assert "data[0].FormAOC4XBRL_Dtls[0].page1[0].BalanceSheetSBN[0].Table20[0].Row1[0].Cell2[0]" in xfa_fields
+
+    # STPCHECK is filled by a script after the AcroForm widget was written
+    differing = {path.rsplit('.', 1)[-1] for path, value in acroform_fields.items()
+                 if path in xfa_fields and xfa_fields[path] != value}
+    assert differing == {"STPCHECK[0]"}
+    # Intermediate nodes and signatures are not XFA values; required ones come from the AcroForm tree
+    assert sign_path not in xfa_fields and "data[0]" not in xfa_fields
+    assert required_fields == {path: acroform_fields[path] for path in required}
+
+
+@pytest.mark.skipif(not os.path.exists(SKELETAL_ACROFORM_SAMPLE), reason="sample filing not available")
+def test_xfa_snapshot_fills_skeletal_acroform():
+    """Filings whose AcroForm tree lacks the fields get their values from XFA in the AcroForm representation"""
+    with PdfDocument(SKELETAL_ACROFORM_SAMPLE) as document:
+        acroform_fields = document.form_fields()
+        xfa_fields = document.form_fields(use_xfa=True)
+    assert all(xfa_fields[path] == value for path, value in acroform_fields.items() if path in xfa_fields)
+    prefix = "data[0].FormAOC4XBRL_Dtls[0].page1[0]."
+    assert xfa_fields[prefix + "subform2[0].FinancialFromDate[0]"] == "01/04/2023"
+    assert xfa_fields[prefix + "subform5[0].RadioButtonList[0]"] == "/NO"
+    assert xfa_fields[prefix + "subform1[0].FormLanguage[0]"] == "/ENGL"
+    assert xfa_fields[prefix + "page3[0].subform5[0].HD_CheckValidity[0]"] == "STRIM_TRUE"
+    assert "\n" not in xfa_fields[prefix + "subform2[0].CompanyAdd_C[0]"]
@@ -0,0 +1,372 @@
+"""
+xfa_form_fields.py
+
+Reads the form field values of XFA based PDF forms (such as the MCA AOC-4 forms) straight from the XFA packets
+instead of walking the AcroForm field tree object by object.
+
+An XFA form keeps its field values in a handful of XML streams referenced from /AcroForm /XFA:
+
+1. ``template`` describes the field hierarchy and how each field binds to the data.
+2. ``datasets`` holds the submitted data values.
+3. ``form`` holds the state of fields that are not bound to data (calculated or script-filled fields).
+
+The field names produced here follow the XFA scripting object model, e.g.
+``data[0].FormAOC4_Dtls[0].BalanceSheet1_PartB[0].Table6[0].Row1[0].ShareCap[0]``, which is the naming used by
+the AcroForm fields of these PDFs and therefore by mapping_config.py. The two field sets are not the same though:
+the AcroForm tree also names its intermediate nodes (``Attach[0]``), the XFA template has fields without a widget
+(the ``BalanceSheetSBN`` ``Table20`` cells), and some filings only carry a handful of AcroForm fields at all.
+
+The raw XFA values are normalized to the representation of the AcroForm values: line breaks become ``\\r``,
+ISO dates are formatted with the field's date picture (``M/D/YY`` without one), choices of radio groups and
+check buttons become name objects (``/YES``), text is cut to the field's maxChars, images and signatures are left
+out, and fields left empty take the default value of the template. The XFA snapshot is therefore read without
+walking the AcroForm tree; PdfDocument.form_fields only walks it for required paths the template does not define.
+"""
+
+import datetime
+import io
+import re
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+XFA_DATA_NAMESPACE = "http://www.xfa.org/schema/xfa-data/1.0/"
+
+# Template/form elements that take part in field naming
+CONTAINER_TAGS = {"subform", "subformSet", "area", "exclGroup", "field"}
+# Containers holding a single value
+VALUE_TAGS = {"field", "exclGroup"}
+# Field UIs whose AcroForm value is a name object, e.g. /YES
+NAME_VALUE_UIS = {"checkButton"}
+# Field UIs whose value the AcroForm does not keep as a string (images, signature dictionaries)
+NO_VALUE_UIS = {"imageEdit", "signature"}
+
+# XFA date picture symbols -> strftime-like formatting of a date
+DATE_PICTURE_SYMBOLS = re.compile(r"YYYY|YY|MM|M|DD|D")
+DEFAULT_DATE_PICTURE = "M/D/YY"
+ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})(?:T[\d:.]+(?:[+-]\d{2}:\d{2}|Z)?)?$")
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def get_xfa_packets(reader, packet_names=("template", "datasets", "form")):
+    """
+    Locate the requested XFA packets of a PDF without touching the AcroForm field objects.
+
+    Args:
+        reader: An open PdfReader (PyPDF2 or pypdf).
+        packet_names: Names of the packets to return.
+
+    Returns:
+        dict: Packet name -> raw XML bytes, or None if the PDF has no packetised XFA form.
+    """
+    catalog = reader.trailer["/Root"]
+    if "/AcroForm" not in catalog:
+        return None
+    xfa = catalog["/AcroForm"].get_object().get("/XFA")
+    if xfa is None:
+        return None
+    xfa = xfa.get_object()
+    if not isinstance(xfa, list):
+        # A single XDP stream is not split into packets; leave it to the AcroForm walk
+        return None
+    packets = {}
+    for name, packet in zip(xfa[0::2], xfa[1::2]):
+        if name in packet_names:
+            packets[str(name)] = packet.get_object().get_data()
+    return packets
+
+
+def parse_xfa_datasets(xml_data):
+    """
+    Stream-parse an XFA datasets packet into data path -> value pairs.
+
+    Every element name carries its index among same-named siblings, so the record element and its
+    children come out as ``data[0].Group[0].Value[0]``. Only leaf elements produce values.
+
+    Args:
+        xml_data: Datasets XML as bytes.
+
+    Returns:
+        OrderedDict: Data path -> value in document order.
+    """
+    values = OrderedDict()
+    data_tag = f"{{{XFA_DATA_NAMESPACE}}}data"
+    # Each stack entry is [path, sibling name counters, has child elements]
+    stack = []
+    for event, elem in ET.iterparse(io.BytesIO(xml_data), events=("start", "end")):
+        if not stack:
+            if event == "start" and elem.tag == data_tag:
+                stack.append(["", {}, False])
+            continue
+        if event == "start":
+            parent = stack[-1]
+            name = _local_name(elem.tag)
+            index = parent[1].get(name, 0)
+            parent[1][name] = index + 1
+            parent[2] = True
+            path = f"{parent[0]}.{name}[{index}]" if parent[0] else f"{name}[{index}]"
+            stack.append([path, {}, False])
+        else:
+            path, _, has_children = stack.pop()
+            if not stack:
+                # End of the xfa:data node, nothing after it is form data
+                break
+            if not has_children:
+                values[path] = elem.text if elem.text is not None else ''
+            elem.clear()
+    return values
+
+
+def _iter_named_children(elem):
+    """Yield the naming containers below elem, looking through unnamed containers"""
+    for child in elem:
+        tag = _local_name(child.tag)
+        if tag not in CONTAINER_TAGS:
+            continue
+        if child.get("name"):
+            yield child
+        elif tag not in VALUE_TAGS:
+            yield from _iter_named_children(child)
+
+
+def _child_path(parent_path, name, counters):
+    index = counters.get(name, 0)
+    counters[name] = index + 1
+    return f"{parent_path}.{name}[{index}]" if parent_path else f"{name}[{index}]"
+
+
+def _resolve_data_ref(ref, scope, record):
+    """Turn a bind ref such as ``$record.Group.Value`` or ``$.Value`` into a data path"""
+    ref = ref.strip()
+    if ref.startswith("$record"):
+        base, rest = record, ref[len("$record"):]
+    elif ref.startswith("$data"):
+        base, rest = "", ref[len("$data"):]
+    elif ref.startswith("$"):
+        base, rest = scope, ref[1:]
+    else:
+        base, rest = scope, ref
+    path = base
+    for part in rest.split('.'):
+        if not part:
+            continue
+        if part.endswith(']') and '[' in part:
+            name, index = part[:-1].split('[', 1)
+            index = index if index.isdigit() else "0"
+        else:
+            name, index = part, "0"
+        path = f"{path}.{name}[{index}]" if path else f"{name}[{index}]"
+    return path
+
+
+def _walk_template(root, record):
+    """Yield (field path, template element, data path or None) for every value container of a template"""
+    top = next((child for child in root if _local_name(child.tag) == "subform"), None)
+    if top is None or not top.get("name"):
+        return
+
+    def walk(container, path, scope, data_counters):
+        counters = {}
+        for child in _iter_named_children(container):
+            tag = _local_name(child.tag)
+            name = child.get("name")
+            child_path = _child_path(path, name, counters)
+            bind = next((b for b in child if _local_name(b.tag) == "bind"), None)
+            match = bind.get("match", "once") if bind is not None else "once"
+            if match == "dataRef" and bind.get("ref"):
+                data_path = _resolve_data_ref(bind.get("ref"), scope, record)
+            elif match == "none":
+                data_path = None
+            else:
+                # Default binding: same-named data node below the current data scope
+                scope_counters = data_counters.setdefault(scope, {})
+                data_path = _child_path(scope, name, scope_counters)
+            if tag in VALUE_TAGS:
+                yield child_path, child, data_path
+            else:
+                yield from walk(child, child_path, data_path if data_path is not None else scope, data_counters)
+
+    yield from walk(top, f"{top.get('name')}[0]", record, {})
+
+
+def parse_xfa_template_bindings(xml_data, record):
+    """
+    Walk an XFA template and work out where each field takes its value from.
+
+    Args:
+        xml_data: Template XML as bytes.
+        record: Data path of the data record, e.g. ``data[0]``.
+
+    Returns:
+        OrderedDict: Field path -> data path, or None for fields that are not bound to data.
+    """
+    root = ET.fromstring(xml_data)
+    return OrderedDict((path, data_path) for path, _, data_path in _walk_template(root, record))
+
+
+def _child_elements(elem, tag):
+    return [child for child in elem if _local_name(child.tag) == tag]
+
+
+def _value_text(elem):
+    """Text of the content of the <value> element below elem, or '' if it has none"""
+    for value in _child_elements(elem, "value"):
+        content = next(iter(value), None)
+        if content is not None and content.text:
+            return content.text
+    return ''
+
+
+def _value_content(elem):
+    """Content element of the <value> element below elem, e.g. <date/> or <text maxChars="12"/>"""
+    for value in _child_elements(elem, "value"):
+        content = next(iter(value), None)
+        if content is not None:
+            return content
+    return None
+
+
+def template_field_format(elem):
+    """
+    Work out how the AcroForm represents the value of a template field and its default value.
+
+    Args:
+        elem: A template field or exclGroup element.
+
+    Returns:
+        tuple: (kind, date picture or None, maxChars or None, default value) where kind is "name", "date",
+        "text" or "none"
+    """
+    if _local_name(elem.tag) == "exclGroup":
+        # The group takes the value of its selected choice; a choice holding a value is selected by default
+        default = next((_value_text(choice) for choice in _child_elements(elem, "field") if _value_text(choice)), '')
+        return "name", None, None, default
+    default = _value_text(elem)
+    ui = next(iter(_child_elements(elem, "ui")), None)
+    ui_kinds = {_local_name(child.tag) for child in ui} if ui is not None else set()
+    if ui_kinds & NAME_VALUE_UIS:
+        return "name", None, None, default
+    if ui_kinds & NO_VALUE_UIS:
+        return "none", None, None, ''
+    content = _value_content(elem)
+    picture = None
+    for container in _child_elements(elem, "format") + ([ui] if ui is not None else []):
+        for candidate in _child_elements(container, "picture"):
+            if candidate.text and candidate.text.strip().startswith("date{"):
+                picture = candidate.text.strip()[len("date{"):-1]
+                break
+        if picture:
+            break
+    if picture or "dateTimeEdit" in ui_kinds or (content is not None and _local_name(content.tag) == "date"):
+        return "date", picture, None, default
+    max_chars = content.get("maxChars") if content is not None else None
+    return "text", None, int(max_chars) if max_chars and max_chars.isdigit() else None, default
+
+
+def format_date_picture(date, picture):
+    """Format a date with an XFA date picture such as DD/MM/YYYY"""
+    symbols = {
+        "YYYY": f"{date.year:04d}", "YY": f"{date.year % 100:02d}",
+        "MM": f"{date.month:02d}", "M": str(date.month),
+        "DD": f"{date.day:02d}", "D": str(date.day),
+    }
+    return DATE_PICTURE_SYMBOLS.sub(lambda match: symbols[match.group(0)], picture)
+
+
+def normalize_xfa_value(value, kind, picture=None, max_chars=None):
+    """
+    Convert a raw XFA value to the representation of the AcroForm value.
+
+    Args:
+        value (str): Raw value from the datasets, form or template packet.
+        kind (str): "name", "date", "text" or "none", see template_field_format.
+        picture (str): Date picture of a date field, e.g. DD/MM/YYYY.
+        max_chars (int): Maximum length of a text field.
+
+    Returns:
+        str: The normalized value ('' stays '')
+    """
+    if not value or kind == "none":
+        return ''
+    if kind == "name":
+        return value if value.startswith('/') else f"/{value}"
+    if kind == "date":
+        match = ISO_DATE.match(value.strip())
+        if match:
+            try:
+                date = datetime.date(*(int(part) for part in match.groups()))
+            except ValueError:
+                return value
+            return format_date_picture(date, picture or DEFAULT_DATE_PICTURE)
+    value = value.replace("\r\n", "\r").replace("\n", "\r")
+    return value[:max_chars] if max_chars else value
+
+
+def parse_xfa_form_state(xml_data):
+    """
+    Read the values the XFA form packet keeps for fields that are not bound to data.
+
+    Args:
+        xml_data: Form packet XML as bytes.
+
+    Returns:
+        dict: Field path -> value for every field that carries a value.
+    """
+    root = ET.fromstring(xml_data)
+    values = {}
+
+    def walk(container, path):
+        counters = {}
+        for child in _iter_named_children(container):
+            child_path = _child_path(path, child.get("name"), counters)
+            if _local_name(child.tag) in VALUE_TAGS:
+                value = next((v for v in child if _local_name(v.tag) == "value"), None)
+                if value is not None:
+                    content = next(iter(value), None)
+                    if content is not None and content.text is not None:
+                        values[child_path] = content.text
+            else:
+                walk(child, child_path)
+
+    walk(root, "")
+    return values
+
+
+def get_xfa_form_fields(reader):
+    """
+    Build the field path -> value snapshot of an XFA form.
+
+    A field takes its data value, else its form packet state, else the default value of the template, normalized
+    with normalize_xfa_value, so the values agree with those of the AcroForm fields of the same paths. Image and
+    signature fields are left out.
+
+    Args:
+        reader: An open PdfReader (PyPDF2 or pypdf).
+
+    Returns:
+        OrderedDict: Field path -> value in template order, or None if the PDF has no usable XFA form.
+    """
+    packets = get_xfa_packets(reader)
+    if not packets or "template" not in packets or "datasets" not in packets:
+        return None
+    data_values = parse_xfa_datasets(packets["datasets"])
+    record = next(iter(data_values), "").split('.', 1)[0]
+    if not record:
+        return None
+    template_fields = list(_walk_template(ET.fromstring(packets["template"]), record))
+    if not template_fields:
+        return None
+    form_values = parse_xfa_form_state(packets["form"]) if packets.get("form") else {}
+
+    fields = OrderedDict()
+    for field_path, elem, data_path in template_fields:
+        kind, picture, max_chars, default = template_field_format(elem)
+        if kind == "none":
+            # Images and signatures have no string value in the packets; they are read from the AcroForm tree
+            continue
+        value = data_values.get(data_path, '') if data_path is not None else ''
+        value = value or form_values.get(field_path, '') or default
+        fields[field_path] = normalize_xfa_value(value, kind, picture, max_chars)
+    return fields
@@ -0,0 +1,138 @@
+"""
+pipeline_manifest.py
+
+Persistent manifest of the work done by the pipeline stages, so reruns only process new or changed inputs.
+
+For every (stage, input file) the manifest stores the input's size, modification time and SHA-256, the
+version of the code/mappings that processed it and the output files it produced. An input is current when
+it is unchanged, was processed by the same version and all of its outputs still exist; stages skip current
+inputs. A file that was only touched (new mtime, same bytes) is recognised by its hash and stays current.
+
+The manifest is a SQLite database (pipeline_manifest.db in the project root).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from pdf_hash_index import sha256_file
+
+# File name of the manifest database
+MANIFEST_FILE = "pipeline_manifest.db"
+
+
+def source_version(*paths, extra=None):
+    """
+    Derive a version string from the source files that determine a stage's output.
+
+    Args:
+        *paths: Source files (modules, mapping configurations) of the stage.
+        extra: Optional settings that change the output (e.g. a schema option).
+
+    Returns:
+        str: Short hex digest that changes whenever one of the sources or the settings change
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    if extra is not None:
+        digest.update(repr(extra).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def open_manifest(db_path=MANIFEST_FILE):
+    """
+    Open (and create if needed) the manifest database.
+
+    Returns:
+        sqlite3.Connection
+    """
+    conn = sqlite3.connect(db_path, timeout=60)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS stage_inputs ("
+        "stage TEXT NOT NULL, input_path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+        "sha256 TEXT NOT NULL, version TEXT NOT NULL, outputs TEXT NOT NULL, updated REAL NOT NULL, "
+        "PRIMARY KEY (stage, input_path))"
+    )
+    conn.commit()
+    return conn
+
+
+def is_current(conn, stage, input_path, version):
+    """
+    Check whether input_path was already processed by stage with the given version.
+
+    Args:
+        conn: Manifest connection.
+        stage (str): Stage name.
+        input_path (str): Input file.
+        version (str): Current code/mapping version of the stage.
+
+    Returns:
+        bool: True if the input is unchanged, the version matches and every recorded output exists
+    """
+    input_path = os.path.abspath(input_path)
+    row = conn.execute(
+        "SELECT size, mtime_ns, sha256, version, outputs FROM stage_inputs WHERE stage = ? AND input_path = ?",
+        (stage, input_path)
+    ).fetchone()
+    if row is None:
+        return False
+    size, mtime_ns, sha256, recorded_version, outputs = row
+    if recorded_version != version:
+        return False
+    try:
+        stat = os.stat(input_path)
+    except OSError:
+        return False
+    if stat.st_size != size:
+        return False
+    if not all(os.path.exists(output) for output in json.loads(outputs)):
+        return False
+    if stat.st_mtime_ns != mtime_ns:
+        # Touched or rewritten: only the content decides
+        if sha256_file(input_path) != sha256:
+            return False
+        conn.execute(
+            "UPDATE stage_inputs SET mtime_ns = ? WHERE stage = ? AND input_path = ?",
+            (stat.st_mtime_ns, stage, input_path)
+        )
+        conn.commit()
+    return True
+
+
+def record_done(conn, stage, input_path, version, output_paths):
+    """
+    Record that stage processed input_path with the given version and produced output_paths.
+
+    Args:
+        conn: Manifest connection.
+        stage (str): Stage name.
+        input_path (str): Input file.
+        version (str): Code/mapping version of the stage.
+        output_paths (list): Files written for this input.
+    """
+    input_path = os.path.abspath(input_path)
+    stat = os.stat(input_path)
+    outputs = json.dumps([os.path.abspath(path) for path in output_paths])
+    conn.execute(
+        "INSERT OR REPLACE INTO stage_inputs "
+        "(stage, input_path, size, mtime_ns, sha256, version, outputs, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (stage, input_path, stat.st_size, stat.st_mtime_ns, sha256_file(input_path), version, outputs, time.time())
+    )
+    conn.commit()
+
+
+def recorded_outputs(conn, stage, input_path):
+    """
+    Returns:
+        list: Output paths recorded for input_path by stage (empty if the input was never recorded)
+    """
+    row = conn.execute(
+        "SELECT outputs FROM stage_inputs WHERE stage = ? AND input_path = ?",
+        (stage, os.path.abspath(input_path))
+    ).fetchone()
+    return json.loads(row[0]) if row else []
@@ -0,0 +1,33 @@
+"""
+process_pool.py
+
+Process pools for the pipeline stages.
+
+run_data_pipeline.py runs independent stages concurrently in threads of one interpreter, and a stage may start
+a ProcessPoolExecutor while another stage thread holds a lock (the logging handlers, a sqlite connection, a pypdf
+reader). A child forked at that moment inherits the held lock with no thread left to release it, and deadlocks
+the first time it takes it. The pools are therefore started through a fork server (or spawned where there is no
+fork server): every worker starts from a clean single-threaded interpreter and imports the stage module again.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pool_context():
+    """Multiprocessing context of the stage pools: forkserver where available, otherwise spawn"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def process_pool(max_workers):
+    """
+    Create a process pool that is safe to start from any thread.
+
+    Args:
+        max_workers (int): Number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context())
@@ -3,27 +3,38 @@ Data Pipeline Script for PDF/XML/XBRL Processing
 
 This script orchestrates the following steps:
 
-1. Extract XBRL attachments from PDFs.
-2. Identify and separate XBRL and non-XBRL files.
-3. Once all files are available in No_XBRL/ and XBRL_XML/, process them:
-   a. Map tables from non-XBRL PDFs.
-   b. Convert XBRL XML files to JSON.
-   c. Convert XBRL JSON files to tables.
+1. Identify and separate XBRL and non-XBRL files.
+2. XBRL branch: extract XBRL attachments from PDFs, convert the XBRL XML files to JSON, then to tables.
+3. No-XBRL branch: once No_XBRL/ has been declared ready, map tables from the non-XBRL PDFs.
+
+The steps are declared with their dependencies in PIPELINE_STAGES and run as a dependency graph: each step
+starts as soon as the steps it depends on have finished, so the XBRL and No-XBRL branches run in parallel.
+At the end the duration of every step and the critical path (the longest chain of dependent steps) are logged.
 
 - Logs all actions with timestamps and clear error highlighting.
 - Continues execution on errors, but errors are highly visible in logs.
 - Designed to be run from the project root with system Python.
+- Stages run by importing each stage module and calling its main() in this interpreter, so libraries are
+  imported once and caches stay warm across stages. Independent stages run concurrently in threads of this
+  process (--jobs 1 runs them one after another); the stages parallelise their own work with process pools,
+  which are started through a fork server (process_pool.py) so no pool worker inherits a lock held by another stage.
+  --subprocess runs every stage in its own interpreter instead.
 
 Usage:
-    python run_data_pipeline.py
+    python run_data_pipeline.py [--subprocess] [--jobs N] [--ready-timeout SECONDS] [--streaming]
 """
+import argparse
+import importlib
 import subprocess
 import logging
 import os
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 
+from stage_readiness import wait_for_ready
+
 # --- Logging Setup ---
 LOG_FILE = 'pipeline.log'
 logging.basicConfig(
@@ -38,56 +49,245 @@ logging.basicConfig(
 BOLD_RED = '\033[1;31m'
 RESET = '\033[0m'
 
+# Pipeline stages: every module exposes main(argv=None).
+# A stage starts once all stages in depends_on have finished; wait_for names a directory whose completion
+# sentinel (see stage_readiness.py) must declare at least one file before the stage can run.
+# Independent branches (XBRL and No-XBRL) run concurrently.
+PIPELINE_STAGES = [
+    {"name": "separate_files", "module": "get_xbrl_and_non_xbrl_files",
+     "description": "Identify and separate XBRL and non-XBRL files", "depends_on": []},
+    {"name": "extract_attachments", "module": "extract_xbrl_attachments",
+     "description": "Extract XBRL attachments from PDFs", "depends_on": ["separate_files"]},
+    {"name": "map_no_xbrl_tables", "module": "pdf_table_extractor.pdf_no_xbrl_table_mapper",
+     "description": "Map tables from non-XBRL PDFs", "depends_on": ["separate_files"], "wait_for": "No_XBRL"},
+    {"name": "xbrl_xml_to_json", "module": "xbrl_xml_extractor.xbrl_xml_to_json_batch",
+     "description": "Convert XBRL XML files to JSON", "depends_on": ["extract_attachments"], "wait_for": "XBRL_XML"},
+    {"name": "xbrl_json_to_table", "module": "xbrl_xml_extractor.xbrl_json_to_table_batch",
+     "description": "Convert XBRL JSON files to tables", "depends_on": ["xbrl_xml_to_json"]},
+]
+
+# Streaming replacement for the three XBRL stages (see xbrl_streaming_pipeline.py)
+STREAMING_XBRL_STAGE = {
+    "name": "xbrl_streaming", "module": "xbrl_streaming_pipeline",
+    "description": "Stream XBRL PDFs through attachment extraction, JSON conversion and tables",
+    "depends_on": ["separate_files"], "wait_for": "XBRL"}
+XBRL_BRANCH_STAGES = ("extract_attachments", "xbrl_xml_to_json", "xbrl_json_to_table")
+
+# Stage outcomes
+STAGE_OK = "ok"
+STAGE_FAILED = "failed"
+STAGE_SKIPPED = "skipped"
+
 
 def log_error(msg):
     logging.error(f"{BOLD_RED}{msg}{RESET}")
 
-def run_script(script_path, description):
-    logging.info(f"Starting: {description} ({script_path})")
+def run_script(module, description):
+    """Run a stage module in a fresh interpreter (python -m module). Returns True on success."""
+    logging.info(f"Starting: {description} ({module})")
     try:
-        result = subprocess.run([sys.executable, script_path], check=True, capture_output=True, text=True)
+        result = subprocess.run([sys.executable, "-m", module], check=True, capture_output=True, text=True)
         logging.info(f"Completed: {description}\nOutput:\n{result.stdout}")
+        return True
     except subprocess.CalledProcessError as e:
         log_error(f"FAILED: {description}\nError Output:\n{e.stderr}")
     except Exception as e:
         log_error(f"Exception during {description}: {e}")
+    return False
 
-def wait_for_files(directory, min_files=1, timeout=300, poll_interval=5):
-    """Wait until at least min_files are present in directory, or timeout (seconds) is reached."""
-    logging.info(f"Waiting for at least {min_files} file(s) in {directory} (timeout: {timeout}s)...")
-    waited = 0
-    while waited < timeout:
-        try:
-            files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
-            if len(files) >= min_files:
-                logging.info(f"Found {len(files)} file(s) in {directory}.")
-                return True
-        except Exception as e:
-            log_error(f"Error checking files in {directory}: {e}")
-        time.sleep(poll_interval)
-        waited += poll_interval
-    log_error(f"Timeout: Not enough files in {directory} after {timeout} seconds.")
+def run_stage_in_process(module, description):
+    """Import a stage module and call its main() in this interpreter. Returns True on success."""
+    logging.info(f"Starting: {description} ({module})")
+    start = time.perf_counter()
+    try:
+        stage_module = importlib.import_module(module)
+        stage_module.main([])
+        logging.info(f"Completed: {description} in {time.perf_counter() - start:.1f}s")
+        return True
+    except SystemExit as e:
+        if not e.code:
+            logging.info(f"Completed: {description} in {time.perf_counter() - start:.1f}s")
+            return True
+        log_error(f"FAILED: {description}\nExit code: {e.code}")
+    except Exception as e:
+        log_error(f"Exception during {description}: {e}")
     return False
 
-def main():
-    # Stage 1: Extraction (run sequentially, as per new order)
-    run_script('get_xbrl_and_non_xbrl_files.py', 'Identify and separate XBRL and non-XBRL files')
-    run_script('extract_xbrl_attachments.py', 'Extract XBRL attachments from PDFs')
+def run_stage(stage, use_subprocess=False):
+    """Run one pipeline stage; errors are logged and never stop the pipeline. Returns True on success."""
+    if use_subprocess:
+        return run_script(stage["module"], stage["description"])
+    return run_stage_in_process(stage["module"], stage["description"])
+
+def execute_stage(stage, use_subprocess=False, ready_timeout=0):
+    """
+    Check that the stage's input directory (if any) has been declared ready and run the stage.
+
+    Returns:
+        tuple: (outcome, start time, end time) with outcome STAGE_OK, STAGE_FAILED or STAGE_SKIPPED
+    """
+    start = time.time()
+    if stage.get("wait_for"):
+        declared = wait_for_ready(stage["wait_for"], timeout=ready_timeout)
+        if not declared:
+            reason = "was not declared ready" if declared is None else "has no files declared ready"
+            log_error(f"{stage['wait_for']} {reason}. Skipping: {stage['description']}")
+            return STAGE_SKIPPED, start, time.time()
+        logging.info(f"{stage['wait_for']}: {len(declared)} file(s) declared ready")
+    outcome = STAGE_OK if run_stage(stage, use_subprocess) else STAGE_FAILED
+    return outcome, start, time.time()
+
+def pipeline_stages(streaming=False):
+    """The stage graph to run; in streaming mode the XBRL branch is a single streaming stage"""
+    if not streaming:
+        return PIPELINE_STAGES
+    stages = [stage for stage in PIPELINE_STAGES if stage["name"] not in XBRL_BRANCH_STAGES]
+    return stages + [STREAMING_XBRL_STAGE]
+
+def topological_order(stages):
+    """
+    Order stages so that every stage comes after its dependencies.
+
+    Raises:
+        ValueError: If a dependency is unknown or the dependencies contain a cycle.
+    """
+    by_name = {stage["name"]: stage for stage in stages}
+    order = []
+    state = {}  # name -> "visiting" or "done"
+
+    def visit(name, chain):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(chain + [name])}")
+        if name not in by_name:
+            raise ValueError(f"Unknown stage '{name}' required by '{chain[-1]}'")
+        state[name] = "visiting"
+        for dependency in by_name[name]["depends_on"]:
+            visit(dependency, chain + [name])
+        state[name] = "done"
+        order.append(by_name[name])
+
+    for stage in stages:
+        visit(stage["name"], [])
+    return order
+
+def critical_path(stages, timings):
+    """
+    Find the chain of dependent stages with the largest total duration.
+
+    Args:
+        stages (list): Stage definitions.
+        timings (dict): Stage name -> (start, end) of the stages that ran.
+
+    Returns:
+        tuple: (list of stage names along the path, total duration in seconds)
+    """
+    longest = {}  # name -> (duration of the longest chain ending at the stage, previous stage)
+    for stage in topological_order(stages):
+        name = stage["name"]
+        if name not in timings:
+            continue
+        start, end = timings[name]
+        previous = max((dependency for dependency in stage["depends_on"] if dependency in longest),
+                       key=lambda dependency: longest[dependency][0], default=None)
+        base = longest[previous][0] if previous is not None else 0.0
+        longest[name] = (base + (end - start), previous)
+    if not longest:
+        return [], 0.0
+    name = max(longest, key=lambda stage_name: longest[stage_name][0])
+    total = longest[name][0]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = longest[name][1]
+    return path[::-1], total
+
+def run_pipeline(stages, jobs=2, use_subprocess=False, ready_timeout=0):
+    """
+    Run the stages as a dependency graph, starting every stage as soon as its dependencies have finished.
+
+    Failed stages are logged and their dependents still run (as in a sequential run); stages that are skipped
+    because their input directory was not declared ready also skip their dependents.
+
+    Args:
+        stages (list): Stage definitions (see PIPELINE_STAGES).
+        jobs (int): Maximum number of stages running at the same time.
+        use_subprocess (bool): Run each stage in its own interpreter.
+        ready_timeout (float): Seconds a stage waits for its input directory to be declared ready by an
+            external producer; 0 only checks the sentinel published by the upstream stage.
+
+    Returns:
+        dict: Stage name -> (outcome, start, end)
+    """
+    order = topological_order(stages)
+    results = {}
+
+    if jobs <= 1:
+        for stage in order:
+            if any(results[dependency][0] == STAGE_SKIPPED for dependency in stage["depends_on"]):
+                logging.info(f"Skipping: {stage['description']} (a required stage was skipped)")
+                now = time.time()
+                results[stage["name"]] = (STAGE_SKIPPED, now, now)
+                continue
+            results[stage["name"]] = execute_stage(stage, use_subprocess, ready_timeout)
+        return results
+
+    # One thread per running stage: in-process stages share this interpreter's imports and caches,
+    # subprocess stages only wait on their interpreter
+    pending = list(order)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for stage in list(pending):
+                if not all(dependency in results for dependency in stage["depends_on"]):
+                    continue
+                pending.remove(stage)
+                if any(results[dependency][0] == STAGE_SKIPPED for dependency in stage["depends_on"]):
+                    logging.info(f"Skipping: {stage['description']} (a required stage was skipped)")
+                    now = time.time()
+                    results[stage["name"]] = (STAGE_SKIPPED, now, now)
+                    continue
+                running[executor.submit(execute_stage, stage, use_subprocess, ready_timeout)] = stage
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage["name"]] = future.result()
+                except Exception as e:
+                    log_error(f"Exception during {stage['description']}: {e}")
+                    now = time.time()
+                    results[stage["name"]] = (STAGE_FAILED, now, now)
+    return results
 
-    # Stage 2: Wait for required files
-    no_xbrl_ready = wait_for_files('No_XBRL', min_files=1)
-    xbrl_xml_ready = wait_for_files('XBRL_XML', min_files=1)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the PDF/XML/XBRL data pipeline.")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Run every stage in its own Python interpreter instead of in this process")
+    parser.add_argument("--jobs", type=int, default=2,
+                        help="Maximum number of independent stages run at the same time (default: 2, 1 = sequential)")
+    parser.add_argument("--ready-timeout", type=float, default=0,
+                        help="Seconds to watch an input directory for an external producer to declare it ready (default: 0)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Stream each XBRL file through attachments, JSON and tables instead of finishing each step first")
+    args = parser.parse_args(argv)
 
-    if not (no_xbrl_ready and xbrl_xml_ready):
-        log_error("Required files not found in No_XBRL or XBRL_XML. Skipping further processing.")
-        return
+    pipeline_start = time.time()
+    stages = pipeline_stages(args.streaming)
+    results = run_pipeline(stages, jobs=args.jobs, use_subprocess=args.subprocess,
+                           ready_timeout=args.ready_timeout)
+    wall_time = time.time() - pipeline_start
 
-    # Stage 3: Processing (run sequentially)
-    run_script(os.path.join('pdf_table_extractor', 'pdf_no_xbrl_table_mapper.py'), 'Map tables from non-XBRL PDFs')
-    run_script(os.path.join('xbrl_xml_extractor', 'xbrl_xml_to_json_batch.py'), 'Convert XBRL XML files to JSON')
-    run_script(os.path.join('xbrl_xml_extractor', 'xbrl_json_to_table_batch.py'), 'Convert XBRL JSON files to tables')
+    timings = {name: (start, end) for name, (outcome, start, end) in results.items() if outcome != STAGE_SKIPPED}
+    path, path_time = critical_path(stages, timings)
+    for name, (outcome, start, end) in results.items():
+        logging.info(f"Stage {name}: {outcome} in {end - start:.1f}s")
+    if path:
+        logging.info(f"Critical path: {' -> '.join(path)} ({path_time:.1f}s of {wall_time:.1f}s wall time)")
 
     logging.info("Pipeline execution completed.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
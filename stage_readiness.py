@@ -0,0 +1,211 @@
+"""
+stage_readiness.py
+
+Completion sentinels for the directories that connect the pipeline stages.
+
+When a stage has finished writing a directory (e.g. get_xbrl_and_non_xbrl_files.py filling XBRL/ and No_XBRL/),
+it publishes a sentinel file listing exactly the files that are complete. Downstream stages read the sentinel
+and process that declared set instead of whatever happens to be in the directory, so they never pick up a
+half-written or half-populated directory. A stage clears the sentinel of its output directory when it starts,
+so a stale sentinel from an earlier run is never mistaken for the current one.
+
+For files dropped by external processes, wait_for_ready() blocks until the sentinel appears, using inotify on
+Linux and falling back to polling elsewhere.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import tempfile
+import time
+
+# Name of the sentinel file; it has no .json suffix so stages scanning for *.json files never pick it up
+READY_FILE = ".stage_ready"
+
+# inotify event masks (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# Polling interval used when inotify is not available
+POLL_INTERVAL = 0.5
+
+
+def publish_ready(directory, files, producer):
+    """
+    Declare the files of directory that are complete. The sentinel is written atomically.
+
+    Args:
+        directory (str): Directory the files live in.
+        files (list): File names (relative to directory) that downstream stages may process.
+        producer (str): Name of the stage publishing the set.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"producer": producer, "published": time.time(), "files": sorted(files)}
+    fd, temp_path = tempfile.mkstemp(prefix=".stage_ready.", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, os.path.join(directory, READY_FILE))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def publish_directory(directory, producer, suffixes=None, exclude=()):
+    """
+    Publish every regular file currently in directory (optionally only those ending in suffixes) as ready.
+
+    Args:
+        directory (str): Directory to publish.
+        producer (str): Name of the stage publishing the set.
+        suffixes (tuple): Optional file suffixes to declare (case-insensitive).
+        exclude (set): File names to leave out, e.g. duplicates downstream stages should not process.
+
+    Returns:
+        list: The declared file names
+    """
+    files = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.startswith('.') or name in exclude or not os.path.isfile(os.path.join(directory, name)):
+                continue
+            if suffixes and not name.lower().endswith(tuple(suffixes)):
+                continue
+            files.append(name)
+    publish_ready(directory, files, producer)
+    return sorted(files)
+
+
+def clear_ready(directory):
+    """Withdraw the sentinel of directory, e.g. when a stage starts rewriting it"""
+    try:
+        os.remove(os.path.join(directory, READY_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def read_ready(directory):
+    """
+    Returns:
+        list: File names declared ready in directory, or None if no sentinel has been published
+    """
+    try:
+        with open(os.path.join(directory, READY_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)["files"]
+    except FileNotFoundError:
+        return None
+
+
+def ready_files(directory, suffix, include_undeclared=False):
+    """
+    List the files of directory a stage should process: the declared set if the directory has a sentinel,
+    otherwise (standalone runs) every file with the given suffix.
+
+    Files with the suffix that are present but were not declared (added after the producer finished, or left
+    out on purpose such as duplicates) are skipped with a warning, unless include_undeclared is set.
+
+    Args:
+        directory (str): Input directory.
+        suffix (str): File suffix, e.g. '.pdf' (case-insensitive).
+        include_undeclared (bool): Also return the matching files that were not declared.
+
+    Returns:
+        list: File names
+    """
+    present = [f for f in os.listdir(directory) if f.lower().endswith(suffix)]
+    declared = read_ready(directory)
+    if declared is None:
+        return present
+    missing = [f for f in declared if not os.path.exists(os.path.join(directory, f))]
+    if missing:
+        logging.warning(f"{len(missing)} file(s) declared ready in {directory} no longer exist")
+    files = [f for f in declared if f.lower().endswith(suffix) and f not in missing]
+    declared_set = set(declared)
+    undeclared = [f for f in present if f not in declared_set]
+    if undeclared and include_undeclared:
+        files.extend(sorted(undeclared))
+    elif undeclared:
+        logging.warning(f"{len(undeclared)} {suffix} file(s) in {directory} were not declared ready and are skipped")
+    return files
+
+
+def _inotify_watch(directory):
+    """Return an inotify file descriptor watching directory for new files, or None if inotify is unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _drain_events(fd):
+    """Read and return the names of the pending inotify events"""
+    names = []
+    try:
+        data = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return names
+    offset = 0
+    while offset + 16 <= len(data):
+        _, _, _, name_length = struct.unpack_from("iIII", data, offset)
+        names.append(data[offset + 16:offset + 16 + name_length].rstrip(b'\0').decode(errors="replace"))
+        offset += 16 + name_length
+    return names
+
+
+def wait_for_ready(directory, timeout=0):
+    """
+    Wait until directory has a published sentinel.
+
+    Returns immediately if the sentinel already exists (the normal case inside the pipeline, where the
+    producing stage has finished). Otherwise waits up to timeout seconds for an external producer, woken by
+    inotify when available.
+
+    Args:
+        directory (str): Directory to watch.
+        timeout (float): Seconds to wait; 0 checks once.
+
+    Returns:
+        list: Declared file names, or None if no sentinel appeared in time
+    """
+    declared = read_ready(directory)
+    if declared is not None or timeout <= 0:
+        return declared
+
+    logging.info(f"Waiting for {directory} to be declared ready (timeout: {timeout}s)...")
+    deadline = time.monotonic() + timeout
+    fd = _inotify_watch(directory) if os.path.isdir(directory) else None
+    try:
+        while True:
+            # Check after arming the watch, so a sentinel published in between is not missed
+            declared = read_ready(directory)
+            if declared is not None:
+                return declared
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if fd is None:
+                time.sleep(min(POLL_INTERVAL, remaining))
+                if os.path.isdir(directory):
+                    fd = _inotify_watch(directory)
+                continue
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if readable:
+                _drain_events(fd)
+    finally:
+        if fd is not None:
+            os.close(fd)
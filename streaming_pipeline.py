@@ -0,0 +1,138 @@
+"""
+streaming_pipeline.py
+
+Runs a chain of per-file steps as a streaming pipeline: every step has its own workers, and consecutive steps
+are connected by bounded queues. An item flows into the next step as soon as it is produced instead of
+waiting for the whole batch, and a full queue blocks the producing step (backpressure), so a fast step can
+never run far ahead of a slow one.
+
+A step is a dict:
+    {"name": "xml_to_json", "func": convert, "workers": 2, "unique": True}
+
+func(item) returns a list of items for the next step (empty to drop the item). With "unique", an item that
+reaches the step a second time (e.g. the same XML extracted from two copies of a filing) is dropped.
+Exceptions are logged and the item is dropped; the pipeline keeps running. Other BaseExceptions (e.g. SystemExit)
+stop the pipeline: the queues are drained, every worker finishes and the exception is re-raised. With an executor
+(e.g. a ProcessPoolExecutor) the step functions run in its worker processes, so CPU-bound steps run in parallel;
+the step workers only hand items over.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+# Items waiting between two steps
+DEFAULT_QUEUE_SIZE = 8
+
+# Marks the end of a queue
+_STOP = object()
+
+
+def run_streaming_pipeline(items, steps, queue_size=DEFAULT_QUEUE_SIZE, executor=None):
+    """
+    Push items through the steps.
+
+    Args:
+        items: Iterable of input items for the first step.
+        steps (list): Step definitions (name, func, workers).
+        queue_size (int): Capacity of the queue in front of every step.
+        executor: Optional concurrent.futures executor running the step functions.
+
+    Returns:
+        dict: "results" (outputs of the last step in completion order), "outputs" (step name -> outputs of the
+              step, e.g. to declare the intermediate files ready), "errors" ((step name, item, message) tuples),
+              "first_result" (seconds until the first output of the last step, or None) and "elapsed" (total
+              seconds)
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in steps]
+    lock = threading.Lock()
+    remaining_workers = [max(1, step.get("workers", 1)) for step in steps]
+    seen = [set() if step.get("unique") else None for step in steps]
+    results = []
+    step_outputs = {step["name"]: [] for step in steps}
+    errors = []
+    start = time.perf_counter()
+    first_result = []
+    # BaseExceptions (not Exceptions) raised by the steps; the first is re-raised after the workers finish
+    fatal = []
+
+    def emit(index, outputs):
+        with lock:
+            step_outputs[steps[index]["name"]].extend(outputs)
+        if index + 1 < len(steps):
+            for output in outputs:
+                if seen[index + 1] is not None:
+                    with lock:
+                        if output in seen[index + 1]:
+                            continue
+                        seen[index + 1].add(output)
+                queues[index + 1].put(output)
+            return
+        with lock:
+            if outputs and not first_result:
+                first_result.append(time.perf_counter() - start)
+            results.extend(outputs)
+
+    def worker(index):
+        step = steps[index]
+        try:
+            while True:
+                item = queues[index].get()
+                if item is _STOP:
+                    break
+                if fatal:
+                    # A step raised a fatal error: drain the queue so no step blocks on a full one
+                    continue
+                try:
+                    if executor is not None:
+                        outputs = executor.submit(step["func"], item).result()
+                    else:
+                        outputs = step["func"](item)
+                    emit(index, outputs or [])
+                except Exception as e:
+                    logging.error(f"[{step['name']}] Failed on {item}: {e}")
+                    with lock:
+                        errors.append((step["name"], item, str(e)))
+                    continue
+                except BaseException as e:
+                    # e.g. SystemExit raised by a step: stop the pipeline and re-raise it once it has drained
+                    logging.error(f"[{step['name']}] Stopped on {item}: {e!r}")
+                    with lock:
+                        errors.append((step["name"], item, repr(e)))
+                        fatal.append(e)
+        finally:
+            with lock:
+                remaining_workers[index] -= 1
+                last = remaining_workers[index] == 0
+            # The last worker of a step closes the next queue once every item has been handed over, also when
+            # the worker itself fails, so the later steps and the final join never wait forever
+            if last and index + 1 < len(steps):
+                for _ in range(remaining_workers[index + 1]):
+                    queues[index + 1].put(_STOP)
+
+    threads = []
+    for index, step in enumerate(steps):
+        for number in range(remaining_workers[index]):
+            thread = threading.Thread(target=worker, args=(index,), name=f"{step['name']}-{number}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    for item in items:
+        if fatal:
+            break
+        queues[0].put(item)
+    for _ in range(remaining_workers[0]):
+        queues[0].put(_STOP)
+    for thread in threads:
+        thread.join()
+    if fatal:
+        raise fatal[0]
+
+    return {
+        "results": results,
+        "outputs": step_outputs,
+        "errors": errors,
+        "first_result": first_result[0] if first_result else None,
+        "elapsed": time.perf_counter() - start
+    }
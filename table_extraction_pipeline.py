@@ -0,0 +1,274 @@
+"""
+table_extraction_pipeline.py
+
+Batch table extraction over every PDF in No_XBRL: signature removal, OCR and Camelot table extraction
+(see extract_tables_from_pdf.py), run as a streaming pipeline:
+
+    No_XBRL/*.pdf --remove_signatures--> unsigned PDF --ocr--> OCR'd PDF --extract_tables--> Extracted_Tables/<name>/
+
+The steps run in their own workers connected by bounded queues (see streaming_pipeline.py), so one filing is
+being OCR'd while the tables of the previous one are extracted and the signatures of the next one removed.
+
+The intermediate PDFs are cached by content: the output of a step is stored in Table_Extraction_Cache/<step>/
+under the SHA-256 of the step's input and the version of the step, so an unsigned or OCR'd PDF is never computed
+twice for the same bytes, whatever the filing is called and however often it is re-ingested. The version covers
+extract_tables_from_pdf.py and, for OCR, the ocrmypdf options and version, so a changed step never hits a stale
+entry. Cache entries are written under a temporary name and renamed when complete, so an interrupted run never
+leaves a partial entry behind. Each step directory is bounded in size: when it grows beyond its limit, the least
+recently used entries (including those of old step versions) are removed. Filings whose tables are current in the
+pipeline manifest are skipped entirely.
+
+Usage:
+    python table_extraction_pipeline.py [--workers N] [--ocr-workers N] [--queue-size N] [--force]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+from functools import lru_cache, partial
+
+import extract_tables_from_pdf
+import table_page_detector
+from extract_tables_from_pdf import (
+    OCRMYPDF_ARGS,
+    extract_tables_with_camelot,
+    ocrmypdf_version,
+    remove_pdf_signatures,
+    run_ocrmypdf
+)
+from pdf_hash_index import sha256_file
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, source_version
+from process_pool import process_pool
+from stage_readiness import ready_files
+from streaming_pipeline import DEFAULT_QUEUE_SIZE, run_streaming_pipeline
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+INPUT_DIR = "No_XBRL"
+CACHE_DIR = "Table_Extraction_Cache"
+UNSIGNED_CACHE_DIR = os.path.join(CACHE_DIR, "unsigned")
+OCR_CACHE_DIR = os.path.join(CACHE_DIR, "ocr")
+TABLE_DIR = "Extracted_Tables"
+
+# Name of the table step in the pipeline manifest
+MANIFEST_STAGE = "table_extraction_pipeline"
+
+# Default bound of the cached outputs of each step
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Intermediates written next to the filings by single-file runs of extract_tables_from_pdf.py
+INTERMEDIATE_SUFFIXES = ("_unsigned.pdf", "_ocr.pdf")
+
+# Suffix of the cache entries being written
+TEMP_SUFFIX = ".tmp.pdf"
+
+
+@lru_cache(maxsize=None)
+def unsign_step_version():
+    """Version of the signature removal step; cached unsigned PDFs of another version are never used"""
+    return source_version(extract_tables_from_pdf.__file__)
+
+
+@lru_cache(maxsize=None)
+def ocr_step_version():
+    """Version of the OCR step; cached OCR'd PDFs of another version are never used"""
+    return source_version(extract_tables_from_pdf.__file__,
+                          extra={"args": OCRMYPDF_ARGS, "ocrmypdf": ocrmypdf_version()})
+
+
+def stage_version():
+    """Version of the table step recorded in the pipeline manifest; it changes with the OCR step too"""
+    return source_version(__file__, extract_tables_from_pdf.__file__, table_page_detector.__file__,
+                          extra={"ocr": ocr_step_version()})
+
+
+def evict_step_outputs(cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES, keep=None):
+    """
+    Remove the least recently used outputs of a step until its cache directory fits in max_bytes.
+
+    Args:
+        cache_dir (str): Cache directory of the step.
+        max_bytes (int): Bound of the cached outputs.
+        keep (str): Path of an entry that is never removed, e.g. the one just stored.
+
+    Returns:
+        int: Number of entries removed
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        # Entries still being written by other workers are left alone
+        if name.endswith(TEMP_SUFFIX) or path == keep:
+            continue
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Removed by a concurrent worker
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    if keep is not None and os.path.exists(keep):
+        total += os.path.getsize(keep)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def cached_step_output(cache_dir, input_path, produce, version, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """
+    Return the output of a step for the content of input_path, computing it only on a cache miss.
+
+    Args:
+        cache_dir (str): Cache directory of the step.
+        input_path (str): Input PDF of the step.
+        produce: Function (input path, output path) -> bool writing the output, e.g. run_ocrmypdf.
+        version (str): Version of the step, part of the cache key.
+        max_bytes (int): Bound of the cache directory, enforced after each new entry (see evict_step_outputs).
+
+    Returns:
+        str: Path of the cached output
+
+    Raises:
+        RuntimeError: If produce fails
+    """
+    output_path = os.path.join(cache_dir, f"{sha256_file(input_path)}_{version}.pdf")
+    try:
+        # A hit marks the entry as recently used
+        os.utime(output_path)
+    except FileNotFoundError:
+        pass
+    else:
+        logging.info(f"Using cached {os.path.basename(cache_dir)} PDF for {os.path.basename(input_path)}")
+        return output_path
+    # Unique per call, so concurrent workers (threads or processes) on the same content never share a file
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=TEMP_SUFFIX)
+    os.close(fd)
+    try:
+        if not produce(input_path, temp_path):
+            raise RuntimeError(f"{produce.__name__} failed for {input_path}")
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    evict_step_outputs(cache_dir, max_bytes, keep=output_path)
+    return output_path
+
+
+def unsign_step(item):
+    """Remove the signatures of one filing and pass the unsigned PDF on"""
+    name, pdf_path = item
+    logging.info(f"Processing PDF: {name}")
+    return [(name, cached_step_output(UNSIGNED_CACHE_DIR, pdf_path, remove_pdf_signatures,
+                                      unsign_step_version()))]
+
+
+def ocr_step(item):
+    """OCR one unsigned PDF and pass the OCR'd PDF on"""
+    name, unsigned_path = item
+    return [(name, cached_step_output(OCR_CACHE_DIR, unsigned_path, run_ocrmypdf, ocr_step_version()))]
+
+
+def table_step(item, source_paths):
+    """Extract the tables of one OCR'd PDF into Extracted_Tables/<name> and record the filing as done"""
+    name, ocr_path = item
+    output_dir = os.path.join(TABLE_DIR, os.path.splitext(name)[0])
+    os.makedirs(output_dir, exist_ok=True)
+    table_count = extract_tables_with_camelot(ocr_path, output_dir=output_dir)
+    if table_count is None:
+        raise RuntimeError("table extraction failed")
+    manifest = open_manifest(MANIFEST_FILE)
+    try:
+        record_done(manifest, MANIFEST_STAGE, source_paths[name], stage_version(), [output_dir])
+    finally:
+        manifest.close()
+    logging.info(f"Extracted {table_count} table(s) from {name}")
+    return [output_dir]
+
+
+def pending_filings(force=False):
+    """
+    List the filings of No_XBRL whose tables are not current in the pipeline manifest.
+
+    Returns:
+        list: (file name, path) tuples
+    """
+    version = stage_version()
+    manifest = open_manifest(MANIFEST_FILE)
+    try:
+        pending = []
+        for pdf_file in sorted(ready_files(INPUT_DIR, '.pdf')):
+            if pdf_file.lower().endswith(INTERMEDIATE_SUFFIXES):
+                continue
+            pdf_path = os.path.join(INPUT_DIR, pdf_file)
+            if not force and is_current(manifest, MANIFEST_STAGE, pdf_path, version):
+                logging.info(f"Skipping {pdf_file}: tables are current")
+                continue
+            pending.append((pdf_file, pdf_path))
+    finally:
+        manifest.close()
+    return pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove signatures, OCR and extract the tables of every PDF in No_XBRL.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Workers of the signature and table steps; with more than 1 the steps run in a process pool (default: 1)")
+    parser.add_argument("--ocr-workers", type=int, default=None,
+                        help="Files OCR'd at the same time (default: same as --workers)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Files waiting between two steps before the earlier step blocks (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--force", action="store_true",
+                        help="Extract the tables of every filing, even those that are current in the pipeline manifest")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(INPUT_DIR):
+        logging.error(f"Input directory '{INPUT_DIR}' does not exist.")
+        return
+    for directory in (UNSIGNED_CACHE_DIR, OCR_CACHE_DIR, TABLE_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+    items = pending_filings(args.force)
+    logging.info(f"Extracting the tables of {len(items)} PDF file(s) from '{INPUT_DIR}'")
+    if not items:
+        return
+
+    ocr_workers = args.ocr_workers or args.workers
+    steps = [
+        {"name": "remove_signatures", "func": unsign_step, "workers": args.workers},
+        # OCR dominates the run time; its workers mostly wait on ocrmypdf subprocesses
+        {"name": "ocr", "func": ocr_step, "workers": ocr_workers},
+        {"name": "extract_tables", "func": partial(table_step, source_paths=dict(items)), "workers": args.workers},
+    ]
+    # One pool process per step worker, so a busy step never starves the others. The workers are started on demand
+    # from the step threads, so they must not be forked (see process_pool.py)
+    executor = process_pool(2 * args.workers + ocr_workers) if args.workers > 1 else None
+    try:
+        summary = run_streaming_pipeline(items, steps, queue_size=args.queue_size, executor=executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if summary["first_result"] is not None:
+        logging.info(f"First tables written after {summary['first_result']:.1f}s")
+    logging.info(f"Processed {len(summary['results'])} PDF file(s) in {summary['elapsed']:.1f}s "
+                 f"with {len(summary['errors'])} error(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+table_page_detector.py
+
+Cheap pre-pass deciding which pages of a PDF are worth sending to Camelot.
+
+Camelot's lattice/stream analysis costs seconds per page, while most pages of an AOC-4 filing are form pages
+without tables. A page is selected when any of these signals is present:
+
+1. Ruling lines: the page's content stream draws at least MIN_RULING_SEGMENTS straight segments or rectangles,
+   as the grids of native (non-scanned) tables do,
+2. Keyword anchors: the text layer names a financial statement or a table header (TABLE_KEYWORDS),
+3. Numeric density: the text layer holds at least MIN_AMOUNTS amount-like numbers, as the columns of a statement
+   do; this is what selects the tables of scanned filings, whose text layer comes from OCR and whose rulings are
+   part of the page image.
+
+The content stream is only scanned with a regular expression, and the text layer is only extracted for pages
+without ruling lines.
+
+The module also converts between page lists and Camelot pages strings, and splits a page list into the chunks
+that extract_tables_from_pdf.py hands to parallel Camelot workers.
+
+Usage:
+    pages = detect_table_pages(pdf_path)
+    camelot.read_pdf(pdf_path, pages=format_page_ranges(pages))
+"""
+
+import logging
+import re
+
+from pdf_document import PdfDocument
+
+# Straight segments ("x y l") and rectangles ("x y w h re") drawn in a content stream
+RULING_PATTERN = re.compile(rb'(?:-?[\d.]+\s+){2}l\b|(?:-?[\d.]+\s+){4}re\b')
+MIN_RULING_SEGMENTS = 8
+
+# Headings and column headers of the statements filed with AOC-4
+TABLE_KEYWORDS = re.compile(
+    r'balance\s*sheet|profit\s*(?:and|&)\s*loss|cash\s*flow|particulars|note\s*no|as\s*at\s*31|'
+    r'share\s*capital|borrowings|trade\s*receivables|reserves\s*and\s*surplus',
+    re.IGNORECASE
+)
+
+# Amounts such as 1,23,456 or 12,345.67 or 1234.50
+AMOUNT_PATTERN = re.compile(r'\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+\.\d{2}\b')
+MIN_AMOUNTS = 10
+
+
+def count_ruling_segments(page):
+    """
+    Count the straight segments and rectangles drawn directly in a page's content stream.
+
+    Args:
+        page: A pypdf page.
+
+    Returns:
+        int: Number of ruling segments (0 if the page has no readable content stream)
+    """
+    try:
+        contents = page.get_contents()
+        data = contents.get_data() if contents is not None else b''
+    except Exception as e:
+        logging.warning(f"Could not read the content stream of a page: {e}")
+        return 0
+    return len(RULING_PATTERN.findall(data))
+
+
+def is_table_text(text):
+    """Check whether a page's text layer looks like a table: a keyword anchor or enough amounts"""
+    if not text:
+        return False
+    if TABLE_KEYWORDS.search(text):
+        return True
+    return len(AMOUNT_PATTERN.findall(text)) >= MIN_AMOUNTS
+
+
+def detect_table_pages(pdf_path):
+    """
+    Select the pages of a PDF that likely hold tables.
+
+    Pages whose content cannot be read are selected, so a detection problem never hides a table from Camelot.
+
+    Args:
+        pdf_path (str): Path of the PDF.
+
+    Returns:
+        list: 1-based numbers of the selected pages, in page order
+    """
+    selected = []
+    with PdfDocument(pdf_path) as document:
+        for page_number, page in enumerate(document.reader.pages, 1):
+            if count_ruling_segments(page) >= MIN_RULING_SEGMENTS:
+                selected.append(page_number)
+                continue
+            try:
+                text = page.extract_text()
+            except Exception as e:
+                logging.warning(f"Error extracting text from page {page_number} of {pdf_path}: {e}")
+                selected.append(page_number)
+                continue
+            if is_table_text(text):
+                selected.append(page_number)
+    return selected
+
+
+def format_page_ranges(pages):
+    """
+    Format page numbers as a Camelot pages string, e.g. [1, 2, 3, 7, 9, 10] -> "1-3,7,9-10".
+
+    Returns:
+        str: Comma-separated pages and ranges
+    """
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def parse_page_ranges(pages, page_count):
+    """
+    Expand a Camelot pages string into page numbers, e.g. "1-3,7" -> [1, 2, 3, 7].
+
+    Args:
+        pages (str): "all", or comma-separated pages and ranges; "end" stands for the last page.
+        page_count (int): Number of pages of the PDF; pages beyond it are dropped.
+
+    Returns:
+        list: Sorted, unique 1-based page numbers
+    """
+    if pages == "all":
+        return list(range(1, page_count + 1))
+    numbers = set()
+    for part in pages.split(","):
+        start, _, end = part.strip().partition("-")
+        start = page_count if start == "end" else int(start)
+        end = start if not end else page_count if end == "end" else int(end)
+        numbers.update(range(start, end + 1))
+    return [page for page in sorted(numbers) if 1 <= page <= page_count]
+
+
+def split_page_chunks(pages, chunk_count):
+    """
+    Split page numbers into at most chunk_count runs of consecutive list entries with sizes differing by at most
+    one, keeping page order, so the tables of the chunks concatenate in the order of a single run.
+
+    Returns:
+        list: Lists of page numbers
+    """
+    chunk_count = max(1, min(chunk_count, len(pages)))
+    size, extra = divmod(len(pages), chunk_count)
+    chunks = []
+    start = 0
+    for index in range(chunk_count):
+        end = start + size + (1 if index < extra else 0)
+        chunks.append(pages[start:end])
+        start = end
+    return [chunk for chunk in chunks if chunk]
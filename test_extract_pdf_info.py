@@ -0,0 +1,46 @@
+from extract_pdf_info import extract_financial_year, process_pdf, scan_pages_for_info
+from test_pdf_document import write_pdf
+
+CIN = "L35921TN1992PLC022845"
+
+
+def test_financial_year_pattern_preference():
+    assert extract_financial_year("FY 2021-22 and Financial Year 2020-21") == "Financial Year: 2020-21"
+    assert extract_financial_year("for the year ended 31st March 2022") == "Year ended: 31st March 2022"
+    assert extract_financial_year("no period here") is None
+
+
+def test_scan_stops_once_both_values_are_found():
+    read = []
+
+    def pages():
+        for text in ["Cover page", f"CIN {CIN}", "Financial Year 2021-22", "FY 2020-21", "Annexure"]:
+            read.append(text)
+            yield text
+
+    assert scan_pages_for_info(pages()) == (CIN, "Financial Year: 2021-22")
+    assert len(read) == 3
+
+    # Values already known from the form fields are not searched for
+    read.clear()
+    assert scan_pages_for_info(pages(), financial_year="01/04/2021 to 31/03/2022") == \
+        (CIN, "01/04/2021 to 31/03/2022")
+    assert len(read) == 2
+
+
+def test_scan_finds_values_split_across_pages():
+    assert scan_pages_for_info(["CIN L35921TN1992", "PLC022845 for the Financial Year", " 2021-22"]) == \
+        (CIN, "Financial Year: 2021-22")
+    assert scan_pages_for_info(["Nothing", "to see"]) == (None, None)
+
+
+def test_process_pdf_falls_back_to_page_text(tmp_path):
+    pdf_path = write_pdf(tmp_path / "filing.pdf", pages=[f"CIN {CIN}", "Financial Year 2021-22", "Notes"])
+    cin, financial_year, form_fields = process_pdf(pdf_path)
+    assert (cin, financial_year, form_fields) == (CIN, "Financial Year: 2021-22", {})
+
+
+def test_process_pdf_reads_all_form_fields_by_default(tmp_path):
+    pdf_path = write_pdf(tmp_path / "form.pdf", pages=["Financial Year 2021-22"], form=True)
+    assert process_pdf(pdf_path)[2] == {"data[0].CIN_C[0]": CIN, "data[0]": ""}
+    assert process_pdf(pdf_path, required_fields=frozenset(["data[0].CIN_C[0]"]))[2] == {"data[0].CIN_C[0]": CIN}
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from extract_xbrl_attachments import OUTPUT_DIR, XBRL_DIR, extract_attachments, main
+from pdf_hash_index import unique_by_content
+from stage_readiness import publish_directory, read_ready
+from test_pdf_document import write_pdf
+
+XBRL_XML = b'<?xml version="1.0"?><xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance"/>' * 1000
+
+
+def test_concurrent_extraction_of_the_same_attachment(tmp_path):
+    """Two PDFs carrying the same attachment can be extracted at once without leaving a partial file"""
+    pdf_paths = [write_pdf(tmp_path / f"filing_{index}.pdf", pages=["AOC-4 XBRL"], attachments={"Std.xml": XBRL_XML})
+                 for index in range(2)]
+    output_dir = tmp_path / "XBRL_XML"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(extract_attachments, pdf_paths, [str(output_dir)] * 2))
+
+    [[extracted_path], [other_path]] = results
+    assert extracted_path == other_path
+    assert os.listdir(output_dir) == [os.path.basename(extracted_path)]
+    assert (output_dir / os.path.basename(extracted_path)).read_bytes() == XBRL_XML
+    # Readable like a file written with open(), not only by the owner as mkstemp leaves it
+    umask = os.umask(0o022)
+    os.umask(umask)
+    assert os.stat(extracted_path).st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_unique_by_content_keeps_the_first_copy(tmp_path):
+    for name, data in (("a.pdf", b"%PDF-1"), ("a_1.pdf", b"%PDF-1"), ("b.pdf", b"%PDF-2")):
+        (tmp_path / name).write_bytes(data)
+    paths = [str(tmp_path / name) for name in ("a.pdf", "a_1.pdf", "b.pdf")]
+
+    unique, duplicates = unique_by_content(paths)
+
+    assert unique == [paths[0], paths[2]]
+    assert duplicates == [(paths[1], paths[0])]
+
+
+def test_main_declares_only_this_runs_attachments(tmp_path, monkeypatch):
+    """Attachments left over from earlier runs are not declared ready, those of current PDFs are"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(XBRL_DIR)
+    os.makedirs(OUTPUT_DIR)
+    write_pdf(os.path.join(XBRL_DIR, "filing.pdf"), pages=["AOC-4 XBRL"], attachments={"Std.xml": XBRL_XML})
+    with open(os.path.join(XBRL_DIR, "broken.pdf"), "wb") as f:
+        f.write(b"not a pdf")
+    publish_directory(XBRL_DIR, "test")
+    with open(os.path.join(OUTPUT_DIR, "stale.xml"), "wb") as f:
+        f.write(XBRL_XML)
+
+    main([])
+    [declared] = read_ready(OUTPUT_DIR)
+    assert declared != "stale.xml" and os.path.exists(os.path.join(OUTPUT_DIR, declared))
+
+    # The attachments of a PDF that is current are declared again
+    main([])
+    assert read_ready(OUTPUT_DIR) == [declared]
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+
+from pypdf.generic import DictionaryObject, NameObject, NumberObject
+
+import field_snapshot_cache
+from field_snapshot_cache import (
+    cached_form_fields,
+    decode_snapshot,
+    encode_snapshot,
+    load_snapshot,
+    open_snapshot_cache,
+    store_snapshot
+)
+from pdf_document import PdfDocument
+from test_pdf_document import write_pdf
+
+CIN_PATH = "data[0].CIN_C[0]"
+CIN = "L35921TN1992PLC022845"
+
+
+def test_snapshot_round_trip_keeps_order():
+    fields = OrderedDict([("b", "2"), ("a", ""), ("c", "Rs. ₹ 1,00")])
+    decoded = decode_snapshot(encode_snapshot(fields))
+    assert list(decoded.items()) == list(fields.items())
+
+
+def forbid_parsing(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the PDF was parsed again")
+
+    monkeypatch.setattr(field_snapshot_cache, "PdfDocument", fail)
+
+
+def test_cached_snapshot_is_served_without_parsing(tmp_path, monkeypatch):
+    pdf_path = write_pdf(tmp_path / "form.pdf", pages=["AOC-4"], form=True)
+    conn = open_snapshot_cache(str(tmp_path / "cache.db"))
+    try:
+        walks = []
+        original = PdfDocument.form_fields
+        monkeypatch.setattr(PdfDocument, "form_fields",
+                            lambda self, use_xfa=False, required=None: walks.append(required) or
+                            original(self, use_xfa, required))
+        # A miss only extracts the required paths
+        fields = cached_form_fields(conn, pdf_path, required=frozenset([CIN_PATH]))
+        assert fields == {CIN_PATH: CIN} and type(fields[CIN_PATH]) is str
+        assert walks == [frozenset([CIN_PATH])]
+        # Another set of paths is extracted again
+        assert cached_form_fields(conn, pdf_path, required=frozenset(["data[0]"])) == {"data[0]": ""}
+        assert len(walks) == 2
+        assert list(cached_form_fields(conn, pdf_path).items()) == [(CIN_PATH, CIN), ("data[0]", "")]
+
+        forbid_parsing(monkeypatch)
+        assert cached_form_fields(conn, pdf_path, required=frozenset([CIN_PATH])) == {CIN_PATH: CIN}
+        # The full snapshot serves any set of paths
+        assert cached_form_fields(conn, pdf_path, required=frozenset(["data[0]", "other[0]"])) == {"data[0]": ""}
+    finally:
+        conn.close()
+
+
+def test_hits_and_misses_return_string_values(tmp_path, monkeypatch):
+    pdf_path = write_pdf(tmp_path / "form.pdf", pages=["AOC-4"], form=True)
+    signature = DictionaryObject({NameObject("/Type"): NameObject("/Sig")})
+
+    class SignedDocument(PdfDocument):
+        def form_fields(self, use_xfa=False, required=None):
+            return OrderedDict([(CIN_PATH, CIN), ("Sign1[0]", signature), ("Count[0]", NumberObject(3))])
+
+    monkeypatch.setattr(field_snapshot_cache, "PdfDocument", SignedDocument)
+    conn = open_snapshot_cache(str(tmp_path / "cache.db"))
+    try:
+        missed = cached_form_fields(conn, pdf_path)
+        forbid_parsing(monkeypatch)
+        hit = cached_form_fields(conn, pdf_path)
+    finally:
+        conn.close()
+    assert missed == hit == OrderedDict([(CIN_PATH, CIN), ("Sign1[0]", str(signature)), ("Count[0]", "3")])
+    assert all(type(value) is str for value in list(missed.values()) + list(hit.values()))
+
+
+def test_changed_extractor_misses(tmp_path, monkeypatch):
+    pdf_path = write_pdf(tmp_path / "form.pdf", pages=["AOC-4"], form=True)
+    conn = open_snapshot_cache(str(tmp_path / "cache.db"))
+    try:
+        cached_form_fields(conn, pdf_path)
+        monkeypatch.setattr(field_snapshot_cache, "extractor_version", lambda use_xfa=False: "other")
+        calls = []
+        original = field_snapshot_cache.PdfDocument
+        monkeypatch.setattr(field_snapshot_cache, "PdfDocument", lambda path: calls.append(path) or original(path))
+        assert cached_form_fields(conn, pdf_path)[CIN_PATH] == CIN
+        assert calls == [pdf_path]
+        assert conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def test_least_recently_used_snapshots_are_evicted(tmp_path):
+    conn = open_snapshot_cache(str(tmp_path / "cache.db"))
+    try:
+        snapshot = OrderedDict((f"field{i}", f"value {i}") for i in range(50))
+        size = len(encode_snapshot(snapshot))
+        store_snapshot(conn, "a", "v1", snapshot, max_bytes=2 * size)
+        store_snapshot(conn, "b", "v1", snapshot, max_bytes=2 * size)
+        # Reading "a" makes "b" the least recently used snapshot
+        assert load_snapshot(conn, "a", "v1") == snapshot
+        store_snapshot(conn, "c", "v1", snapshot, max_bytes=2 * size)
+        assert load_snapshot(conn, "b", "v1") is None
+        assert load_snapshot(conn, "a", "v1") == snapshot
+        assert load_snapshot(conn, "c", "v1") == snapshot
+    finally:
+        conn.close()
@@ -0,0 +1,110 @@
+import os
+import shutil
+
+from filing_index import (
+    KIND_NO_XBRL,
+    KIND_XBRL,
+    lookup_filings,
+    open_filing_index,
+    update_filing_index,
+    xbrl_instance_info,
+    year_end_of
+)
+from test_pdf_document import write_pdf
+
+CIN = "L35921TN1992PLC022845"
+XBRL_CIN = "L29120MH1986PLC042028"
+
+
+def xbrl_instance(cin, periods):
+    """A minimal XBRL instance with one duration context per (start, end) period and a fact"""
+    contexts = "".join(
+        f'<xbrli:context id="D{index}"><xbrli:entity>'
+        f'<xbrli:identifier scheme="http://www.mca.gov.in/CIN">{cin}</xbrli:identifier></xbrli:entity>'
+        f'<xbrli:period><xbrli:startDate>{start}</xbrli:startDate><xbrli:endDate>{end}</xbrli:endDate>'
+        f'</xbrli:period></xbrli:context>'
+        for index, (start, end) in enumerate(periods)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:in-gaap="http://example.com/in-gaap">'
+        f'{contexts}<in-gaap:Revenue contextRef="D0">100</in-gaap:Revenue></xbrli:xbrl>'
+    ).encode("utf-8")
+
+
+def make_filings(tmp_path):
+    no_xbrl_dir = tmp_path / "No_XBRL"
+    xbrl_dir = tmp_path / "XBRL"
+    no_xbrl_dir.mkdir()
+    xbrl_dir.mkdir()
+    write_pdf(no_xbrl_dir / "filing.pdf", pages=[f"CIN {CIN}", "Financial Year 2021-22"])
+    write_pdf(xbrl_dir / "xbrl.pdf", pages=["AOC-4 XBRL"], attachments={
+        "Std.xml": xbrl_instance(XBRL_CIN, [("2022-04-01", "2023-03-31"), ("2023-04-01", "2024-03-31")]),
+        "Notice.pdf": b"%PDF-1.4"
+    })
+    return {KIND_NO_XBRL: str(no_xbrl_dir), KIND_XBRL: str(xbrl_dir)}
+
+
+def test_year_end_of():
+    assert year_end_of("Financial Year: 2021-22") == 2022
+    assert year_end_of("FY: 1999-2000") == 2000
+    assert year_end_of("Year ended: 31st March 2022") == 2022
+    assert year_end_of("01/04/2021 to 31/03/2022", "2022-03-31") == 2022
+    assert year_end_of(None) is None
+
+
+def test_xbrl_instance_info_uses_the_last_duration_context():
+    data = xbrl_instance(XBRL_CIN, [("2023-04-01", "2024-03-31"), ("2024-01-01", "2024-03-31"),
+                                    ("2022-04-01", "2023-03-31")])
+    assert xbrl_instance_info(data) == (XBRL_CIN, "2023-04-01", "2024-03-31")
+
+
+def test_index_lookup_and_incremental_update(tmp_path):
+    directories = make_filings(tmp_path)
+    conn = open_filing_index(str(tmp_path / "index.db"))
+    try:
+        assert update_filing_index(conn, directories)["indexed"] == 2
+
+        [filing] = lookup_filings(conn, cin=CIN.lower())
+        assert (filing["kind"], filing["financial_year"], filing["year_end"], filing["document"]) == \
+            (KIND_NO_XBRL, "Financial Year: 2021-22", 2022, "")
+        assert filing["path"] == os.path.abspath(tmp_path / "No_XBRL" / "filing.pdf")
+
+        [filing] = lookup_filings(conn, year_end=2024)
+        assert (filing["kind"], filing["cin"], filing["document"], filing["period_start"], filing["period_end"]) == \
+            (KIND_XBRL, XBRL_CIN, "Std.xml", "2023-04-01", "2024-03-31")
+        assert lookup_filings(conn, cin=XBRL_CIN, year_end=2023) == []
+
+        # Unchanged files are skipped, copies are indexed from the filings of the same content
+        shutil.copy(tmp_path / "No_XBRL" / "filing.pdf", tmp_path / "No_XBRL" / "copy.pdf")
+        counts = update_filing_index(conn, directories)
+        assert (counts["indexed"], counts["copied"], counts["unchanged"]) == (0, 1, 2)
+        assert len(lookup_filings(conn, cin=CIN)) == 2
+
+        # Removed files are dropped
+        os.remove(tmp_path / "No_XBRL" / "filing.pdf")
+        assert update_filing_index(conn, directories)["removed"] == 1
+        [filing] = lookup_filings(conn, cin=CIN)
+        assert filing["path"].endswith("copy.pdf")
+    finally:
+        conn.close()
+
+
+def test_unreadable_pdfs_are_retried(tmp_path):
+    """A PDF that fails to parse is counted as failed and not recorded, so the next update reads it again"""
+    no_xbrl_dir = tmp_path / "No_XBRL"
+    no_xbrl_dir.mkdir()
+    (no_xbrl_dir / "corrupt.pdf").write_bytes(b"%PDF-1.4 truncated")
+    directories = {KIND_NO_XBRL: str(no_xbrl_dir)}
+    conn = open_filing_index(str(tmp_path / "index.db"))
+    try:
+        assert update_filing_index(conn, directories)["failed"] == 1
+        assert lookup_filings(conn) == []
+        assert update_filing_index(conn, directories)["failed"] == 1
+
+        write_pdf(no_xbrl_dir / "corrupt.pdf", pages=[f"CIN {CIN}", "Financial Year 2021-22"])
+        assert update_filing_index(conn, directories)["indexed"] == 1
+        [filing] = lookup_filings(conn)
+        assert filing["cin"] == CIN
+    finally:
+        conn.close()
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import zipfile
+
+import pytest
+
+from pdf_hash_index import HASH_INDEX_PATH, get_aliases, open_hash_index, sha256_file
+
+import get_xbrl_and_non_xbrl_files
+from get_xbrl_and_non_xbrl_files import check_pdf_xbrl, main
+from stage_readiness import read_ready
+
+
+def list_pdfs(directory):
+    return sorted(name for name in os.listdir(directory) if name.lower().endswith(".pdf"))
+
+
+def build_zip(zip_path, members):
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        for name, data in members.items():
+            zip_ref.writestr(name, data)
+
+
+def test_check_pdf_xbrl_routes_pdf_members(tmp_path, monkeypatch):
+    """PDF members are copied by name without extracting the archive; other members are skipped"""
+    monkeypatch.chdir(tmp_path)
+    zip_path = tmp_path / "filings.zip"
+    build_zip(zip_path, {
+        "batch/Form_AOC-4(XBRL)-signed.pdf": b"%PDF-xbrl",
+        "batch/Form_AOC-4-signed.PDF": b"%PDF-plain",
+        "batch/readme.txt": b"not a pdf",
+    })
+
+    check_pdf_xbrl(str(zip_path))
+
+    assert list_pdfs("XBRL") == ["Form_AOC-4(XBRL)-signed.pdf"]
+    assert list_pdfs("No_XBRL") == ["Form_AOC-4-signed.PDF"]
+    assert (tmp_path / "XBRL" / "Form_AOC-4(XBRL)-signed.pdf").read_bytes() == b"%PDF-xbrl"
+    assert not (tmp_path / "temp_extract").exists()
+
+
+def test_main_declares_the_routed_pdfs_ready(tmp_path, monkeypatch):
+    """Downstream stages get a sentinel listing exactly the stored PDFs"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Input_data")
+    build_zip(tmp_path / "Input_data" / "drop.zip", {"Form_AOC-4(XBRL).pdf": b"%PDF-x", "Form_AOC-4.pdf": b"%PDF-n"})
+
+    main([])
+
+    assert read_ready("XBRL") == ["Form_AOC-4(XBRL).pdf"]
+    assert read_ready("No_XBRL") == ["Form_AOC-4.pdf"]
+
+
+def test_crashed_ingestion_declares_nothing_ready(tmp_path, monkeypatch):
+    """A run that raises leaves the sentinels withdrawn instead of declaring a half-written directory"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Input_data")
+    build_zip(tmp_path / "Input_data" / "drop.zip", {"Form_AOC-4.pdf": b"%PDF-n"})
+    main([])
+    assert read_ready("No_XBRL") == ["Form_AOC-4.pdf"]
+
+    def crash(args):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(get_xbrl_and_non_xbrl_files, "ingest_zip_files", crash)
+    with pytest.raises(RuntimeError):
+        main(["--force"])
+    assert read_ready("No_XBRL") is None
+    assert read_ready("XBRL") is None
+
+
+def test_parallel_ingestion_resolves_name_collisions(tmp_path, monkeypatch):
+    """Archives processed by concurrent workers never overwrite each other's PDFs"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Input_data")
+    for index in range(4):
+        build_zip(tmp_path / "Input_data" / f"drop_{index}.zip", {"Form_AOC-4(XBRL).pdf": f"%PDF-{index}".encode()})
+
+    main(["--workers", "2"])
+
+    stored = list_pdfs("XBRL")
+    assert stored == ["Form_AOC-4(XBRL).pdf", "Form_AOC-4(XBRL)_1.pdf", "Form_AOC-4(XBRL)_2.pdf", "Form_AOC-4(XBRL)_3.pdf"]
+    contents = sorted((tmp_path / "XBRL" / name).read_bytes() for name in stored)
+    assert contents == [f"%PDF-{index}".encode() for index in range(4)]
+
+
+def test_identical_pdfs_are_stored_once(tmp_path, monkeypatch):
+    """Re-ingested filings are recorded as aliases instead of being stored as _1 copies"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Input_data")
+    build_zip(tmp_path / "Input_data" / "monday.zip", {"Form_AOC-4.pdf": b"%PDF-same"})
+    build_zip(tmp_path / "Input_data" / "tuesday.zip", {"Form_AOC-4.pdf": b"%PDF-same", "Form_MGT-7.pdf": b"%PDF-same"})
+
+    main([])
+    main(["--force"])
+
+    assert list_pdfs("No_XBRL") == ["Form_AOC-4.pdf"]
+    # Stored with the umask-derived mode of a plain copy, not the 0o600 of the temporary file
+    umask = os.umask(0o022)
+    os.umask(umask)
+    assert os.stat(os.path.join("No_XBRL", "Form_AOC-4.pdf")).st_mode & 0o777 == 0o666 & ~umask
+    conn = open_hash_index(HASH_INDEX_PATH)
+    try:
+        aliases = get_aliases(conn, sha256_file(os.path.join("No_XBRL", "Form_AOC-4.pdf")))
+    finally:
+        conn.close()
+    assert len(aliases) == 5
+    assert ("Form_MGT-7.pdf", "tuesday", None) in aliases
+
+
+def test_existing_copies_are_not_declared_ready(tmp_path, monkeypatch):
+    """Copies stored by runs before the index existed are recorded as aliases and left out of the ready set"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Input_data")
+    os.makedirs("No_XBRL")
+    (tmp_path / "No_XBRL" / "Form_AOC-4.pdf").write_bytes(b"%PDF-same")
+    (tmp_path / "No_XBRL" / "Form_AOC-4_1.pdf").write_bytes(b"%PDF-same")
+    build_zip(tmp_path / "Input_data" / "drop.zip", {"Form_MGT-7.pdf": b"%PDF-other"})
+
+    main([])
+
+    assert list_pdfs("No_XBRL") == ["Form_AOC-4.pdf", "Form_AOC-4_1.pdf", "Form_MGT-7.pdf"]
+    assert read_ready("No_XBRL") == ["Form_AOC-4.pdf", "Form_MGT-7.pdf"]
+    conn = open_hash_index(HASH_INDEX_PATH)
+    try:
+        aliases = get_aliases(conn, sha256_file(os.path.join("No_XBRL", "Form_AOC-4.pdf")))
+    finally:
+        conn.close()
+    assert aliases == [("Form_AOC-4_1.pdf", None, os.path.join("No_XBRL", "Form_AOC-4_1.pdf"))]
+
+
+def test_single_source_alias_column_is_split(tmp_path):
+    """Indexes written with one source column for archive names and paths are migrated on open"""
+    db_path = str(tmp_path / HASH_INDEX_PATH)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE aliases (sha256 TEXT NOT NULL, name TEXT NOT NULL, source TEXT, seen REAL NOT NULL)")
+    conn.executemany("INSERT INTO aliases VALUES (?, ?, ?, ?)", [
+        ("a", "Form_AOC-4.pdf", "tuesday", 1.0),
+        ("a", "Form_AOC-4_1.pdf", os.path.join("No_XBRL", "Form_AOC-4_1.pdf"), 2.0),
+    ])
+    conn.commit()
+    conn.close()
+
+    conn = open_hash_index(db_path)
+    try:
+        assert get_aliases(conn, "a") == [
+            ("Form_AOC-4.pdf", "tuesday", None),
+            ("Form_AOC-4_1.pdf", None, os.path.join("No_XBRL", "Form_AOC-4_1.pdf")),
+        ]
+    finally:
+        conn.close()
+    # Opening a migrated index again leaves it as it is
+    open_hash_index(db_path).close()
+
+
+def test_unchanged_archives_are_skipped(tmp_path, monkeypatch):
+    """A rerun only processes archives that are new or changed since the last run"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Input_data")
+    build_zip(tmp_path / "Input_data" / "monday.zip", {"Form_AOC-4.pdf": b"%PDF-monday"})
+    main([])
+    os.remove(os.path.join("No_XBRL", "Form_AOC-4.pdf"))
+    build_zip(tmp_path / "Input_data" / "tuesday.zip", {"Form_MGT-7.pdf": b"%PDF-tuesday"})
+
+    main([])
+
+    # monday.zip is reprocessed because its output is gone, tuesday.zip because it is new
+    assert list_pdfs("No_XBRL") == ["Form_AOC-4.pdf", "Form_MGT-7.pdf"]
+    os.remove(os.path.join("No_XBRL", "Form_MGT-7.pdf"))
+    os.utime(tmp_path / "Input_data" / "monday.zip")
+    main([])
+    # Touching monday.zip does not make it stale; tuesday.zip lost its output
+    assert list_pdfs("No_XBRL") == ["Form_AOC-4.pdf", "Form_MGT-7.pdf"]
@@ -0,0 +1,120 @@
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+    TextStringObject
+)
+
+from pdf_document import PdfDocument
+
+
+def add_text_page(writer, text):
+    """Append a page showing text in Helvetica"""
+    page = writer.add_blank_page(width=612, height=792)
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+    })
+    content = DecodedStreamObject()
+    content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1"))
+    page[NameObject("/Contents")] = writer._add_object(content)
+
+
+def add_form(writer, broken_subform=False):
+    """
+    Add an AcroForm with a subform holding a CIN field, named like the AOC-4 fields. With broken_subform a
+    second top-level subform has a kid that is not a field dictionary, so any walk entering it fails.
+    """
+    parent = DictionaryObject({NameObject("/T"): TextStringObject("data[0]")})
+    parent_ref = writer._add_object(parent)
+    field = DictionaryObject({
+        NameObject("/FT"): NameObject("/Tx"),
+        NameObject("/Parent"): parent_ref,
+        NameObject("/T"): TextStringObject("CIN_C[0]"),
+        NameObject("/TM"): TextStringObject("data[0].CIN_C[0]"),
+        NameObject("/V"): TextStringObject("L35921TN1992PLC022845")
+    })
+    parent[NameObject("/Kids")] = ArrayObject([writer._add_object(field)])
+    fields = [parent_ref]
+    if broken_subform:
+        fields.append(writer._add_object(DictionaryObject({
+            NameObject("/T"): TextStringObject("other[0]"),
+            NameObject("/Kids"): ArrayObject([writer._add_object(NumberObject(0))])
+        })))
+    writer._root_object[NameObject("/AcroForm")] = DictionaryObject({
+        NameObject("/Fields"): ArrayObject(fields)
+    })
+
+
+def write_pdf(path, pages=(), form=False, attachments=None, broken_subform=False):
+    writer = PdfWriter()
+    for text in pages:
+        add_text_page(writer, text)
+    if form:
+        add_form(writer, broken_subform)
+    for name, data in (attachments or {}).items():
+        writer.add_attachment(name, data)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_form_fields_follow_acroform_naming(tmp_path):
+    """Leaf fields are keyed by mapping name and come before their parents, as in the mapper snapshots"""
+    pdf_path = write_pdf(tmp_path / "form.pdf", pages=["AOC-4"], form=True)
+    with PdfDocument(pdf_path) as document:
+        fields = document.form_fields()
+        assert list(fields.items()) == [("data[0].CIN_C[0]", "L35921TN1992PLC022845"), ("data[0]", "")]
+        # Cached for the session, also for XFA requests on a PDF without XFA packets
+        assert document.form_fields() is fields
+        assert document.form_fields(use_xfa=True) is fields
+
+    with PdfDocument(write_pdf(tmp_path / "plain.pdf", pages=["no form"])) as document:
+        assert document.form_fields() == {}
+
+
+def test_required_fields_skip_unrelated_subtrees(tmp_path):
+    """Only subtrees leading to a required path are entered; missing paths are left out"""
+    pdf_path = write_pdf(tmp_path / "form.pdf", pages=["AOC-4"], form=True, broken_subform=True)
+    with PdfDocument(pdf_path) as document:
+        with pytest.raises(Exception):
+            document.form_fields()
+        required = frozenset(["data[0].CIN_C[0]", "data[0].FromDate[0]"])
+        assert document.form_fields(required=required) == {"data[0].CIN_C[0]": "L35921TN1992PLC022845"}
+
+    # Narrower requests are served from a full snapshot read earlier in the session
+    with PdfDocument(write_pdf(tmp_path / "valid.pdf", pages=["AOC-4"], form=True)) as document:
+        document.form_fields()
+        assert document.form_fields(required=frozenset(["data[0]"])) == {"data[0]": ""}
+
+
+def test_page_text_extracts_each_page_once(tmp_path):
+    pdf_path = write_pdf(tmp_path / "text.pdf", pages=["First page", "Second page", "Third page"])
+    with PdfDocument(pdf_path) as document:
+        calls = []
+        for page in document.reader.pages:
+            extract_text = page.extract_text
+            page.extract_text = lambda extract_text=extract_text: calls.append(1) or extract_text()
+
+        first = document.page_text(max_pages=1)
+        assert "First page" in first and "Second" not in first
+        text = document.page_text(max_pages=5)
+        assert ["First page" in text, "Second page" in text, "Third page" in text] == [True, True, True]
+        assert document.page_text(max_pages=1) == first
+        assert len(calls) == 3
+
+
+def test_attachments_are_read_once_and_outlive_the_file(tmp_path):
+    pdf_path = write_pdf(tmp_path / "filing.pdf", pages=["XBRL"], attachments={"filing.xml": b"<xbrl/>"})
+    with PdfDocument(pdf_path) as document:
+        attachments = document.attachments
+    assert attachments == {"filing.xml": [b"<xbrl/>"]}
+    assert document.attachments is attachments
@@ -0,0 +1,40 @@
+import os
+
+from pipeline_manifest import is_current, open_manifest, record_done, source_version
+
+
+def test_is_current_tracks_inputs_outputs_and_version(tmp_path):
+    """An input stays current until its content, its outputs or the stage version change"""
+    conn = open_manifest(str(tmp_path / "manifest.db"))
+    input_path = tmp_path / "filing.xml"
+    input_path.write_bytes(b"<xbrl/>")
+    output_path = tmp_path / "filing.json"
+    output_path.write_text("[]")
+
+    assert not is_current(conn, "stage", str(input_path), "v1")
+    record_done(conn, "stage", str(input_path), "v1", [str(output_path)])
+    assert is_current(conn, "stage", str(input_path), "v1")
+    assert not is_current(conn, "stage", str(input_path), "v2")
+    assert not is_current(conn, "other_stage", str(input_path), "v1")
+
+    # Touching the file keeps it current, changing its bytes does not
+    stat = os.stat(input_path)
+    os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert is_current(conn, "stage", str(input_path), "v1")
+    input_path.write_bytes(b"<xbrl></xbrl>")
+    assert not is_current(conn, "stage", str(input_path), "v1")
+
+    record_done(conn, "stage", str(input_path), "v1", [str(output_path)])
+    output_path.unlink()
+    assert not is_current(conn, "stage", str(input_path), "v1")
+    conn.close()
+
+
+def test_source_version_changes_with_sources_and_settings(tmp_path):
+    source = tmp_path / "stage.py"
+    source.write_text("A = 1\n")
+    version = source_version(str(source), extra={"schema": "embedded"})
+    assert version == source_version(str(source), extra={"schema": "embedded"})
+    assert version != source_version(str(source), extra={"schema": "normalized"})
+    source.write_text("A = 2\n")
+    assert version != source_version(str(source), extra={"schema": "embedded"})
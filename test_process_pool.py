@@ -0,0 +1,35 @@
+import threading
+
+from process_pool import pool_context, process_pool
+
+LOCK = threading.Lock()
+
+
+def take_lock():
+    """Worker function: whether the worker can take LOCK"""
+    acquired = LOCK.acquire(timeout=2)
+    if acquired:
+        LOCK.release()
+    return acquired
+
+
+def test_pool_workers_do_not_inherit_held_locks():
+    """A pool started while another thread holds a lock gets workers in which the lock is free"""
+    assert pool_context().get_start_method() != "fork"
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with LOCK:
+            holding.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait()
+    try:
+        with process_pool(1) as executor:
+            assert executor.submit(take_lock).result(timeout=60)
+    finally:
+        release.set()
+        thread.join()
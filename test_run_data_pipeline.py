@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+from run_data_pipeline import PIPELINE_STAGES, STAGE_OK, critical_path, run_pipeline, topological_order
+
+
+def stage(name, depends_on):
+    return {"name": name, "module": name, "description": name, "depends_on": depends_on}
+
+
+def test_topological_order_respects_dependencies():
+    order = [stage["name"] for stage in topological_order(PIPELINE_STAGES)]
+    for pipeline_stage in PIPELINE_STAGES:
+        for dependency in pipeline_stage["depends_on"]:
+            assert order.index(dependency) < order.index(pipeline_stage["name"])
+
+
+def test_topological_order_rejects_cycles_and_unknown_stages():
+    with pytest.raises(ValueError):
+        topological_order([stage("a", ["b"]), stage("b", ["a"])])
+    with pytest.raises(ValueError):
+        topological_order([stage("a", ["missing"])])
+
+
+def test_critical_path_follows_longest_branch():
+    stages = [stage("split", []), stage("xbrl", ["split"]), stage("tables", ["xbrl"]), stage("no_xbrl", ["split"])]
+    timings = {"split": (0, 1), "xbrl": (1, 3), "tables": (3, 4), "no_xbrl": (1, 5)}
+    assert critical_path(stages, timings) == (["split", "no_xbrl"], 5)
+
+
+def test_in_process_stages_share_this_interpreter(tmp_path, monkeypatch):
+    """Concurrent in-process stages run in threads of the pipeline process, importing each module once"""
+    (tmp_path / "pid_stage.py").write_text(
+        "import os\nCALLS = []\n\ndef main(argv=None):\n    CALLS.append(os.getpid())\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    stages = [dict(stage(name, []), module="pid_stage") for name in ("a", "b")]
+
+    results = run_pipeline(stages, jobs=2)
+
+    assert {name: outcome for name, (outcome, _, _) in results.items()} == {"a": STAGE_OK, "b": STAGE_OK}
+    assert sys.modules["pid_stage"].CALLS == [os.getpid(), os.getpid()]
+    monkeypatch.delitem(sys.modules, "pid_stage")
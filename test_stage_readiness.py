@@ -0,0 +1,56 @@
+import os
+import threading
+import time
+
+from stage_readiness import (
+    READY_FILE,
+    clear_ready,
+    publish_directory,
+    read_ready,
+    ready_files,
+    wait_for_ready
+)
+
+
+def test_ready_files_returns_exactly_the_declared_set(tmp_path):
+    """Files that appear after the sentinel was published are not picked up"""
+    (tmp_path / "a.xml").write_text("<a/>")
+    assert ready_files(str(tmp_path), ".xml") == ["a.xml"]
+
+    assert publish_directory(str(tmp_path), "producer", suffixes=(".xml",)) == ["a.xml"]
+    (tmp_path / "b.xml").write_text("<b/>")
+    assert ready_files(str(tmp_path), ".xml") == ["a.xml"]
+    assert READY_FILE in os.listdir(tmp_path)
+
+    clear_ready(str(tmp_path))
+    assert read_ready(str(tmp_path)) is None
+    assert sorted(ready_files(str(tmp_path), ".xml")) == ["a.xml", "b.xml"]
+
+
+def test_undeclared_files_are_reported_or_included(tmp_path, caplog):
+    """Matching files missing from the sentinel are skipped with a warning, or returned on request"""
+    (tmp_path / "a.xml").write_text("<a/>")
+    publish_directory(str(tmp_path), "producer")
+    (tmp_path / "late.xml").write_text("<late/>")
+
+    assert ready_files(str(tmp_path), ".xml") == ["a.xml"]
+    assert "1 .xml file(s)" in caplog.text and "not declared ready" in caplog.text
+    assert ready_files(str(tmp_path), ".xml", include_undeclared=True) == ["a.xml", "late.xml"]
+
+
+def test_wait_for_ready_wakes_up_on_publish(tmp_path):
+    """An external producer publishing the sentinel wakes the waiting stage well before the timeout"""
+    (tmp_path / "filing.pdf").write_bytes(b"%PDF")
+    publisher = threading.Timer(0.2, publish_directory, args=(str(tmp_path), "external"))
+    publisher.start()
+    start = time.monotonic()
+    try:
+        assert wait_for_ready(str(tmp_path), timeout=10) == ["filing.pdf"]
+    finally:
+        publisher.cancel()
+    assert time.monotonic() - start < 5
+
+
+def test_wait_for_ready_times_out(tmp_path):
+    assert wait_for_ready(str(tmp_path)) is None
+    assert wait_for_ready(str(tmp_path), timeout=0.2) is None
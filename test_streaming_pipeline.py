@@ -0,0 +1,77 @@
+import threading
+import time
+
+from streaming_pipeline import run_streaming_pipeline
+
+
+def test_items_flow_through_all_steps():
+    steps = [
+        {"name": "split", "func": lambda n: [n, n + 100]},
+        {"name": "double", "func": lambda n: [n * 2], "workers": 3},
+    ]
+    summary = run_streaming_pipeline(range(5), steps, queue_size=2)
+    assert sorted(summary["results"]) == sorted([n * 2 for n in range(5)] + [(n + 100) * 2 for n in range(5)])
+    assert summary["errors"] == []
+    assert summary["first_result"] is not None
+
+
+def test_failures_are_captured_and_duplicates_dropped():
+    def check(n):
+        if n == 3:
+            raise ValueError("bad input")
+        return [n % 2]
+
+    steps = [{"name": "check", "func": check}, {"name": "collect", "func": lambda n: [n], "unique": True}]
+    summary = run_streaming_pipeline(range(6), steps)
+    assert sorted(summary["results"]) == [0, 1]
+    assert summary["errors"] == [("check", 3, "bad input")]
+
+
+def test_bounded_queue_applies_backpressure():
+    """A slow consumer keeps the producer at most queue_size items ahead"""
+    produced = []
+    consumed = []
+    lead = []
+    lock = threading.Lock()
+
+    def produce(n):
+        with lock:
+            produced.append(n)
+            lead.append(len(produced) - len(consumed))
+        return [n]
+
+    def consume(n):
+        time.sleep(0.01)
+        with lock:
+            consumed.append(n)
+        return [n]
+
+    steps = [{"name": "produce", "func": produce}, {"name": "consume", "func": consume}]
+    summary = run_streaming_pipeline(range(30), steps, queue_size=2)
+    assert len(summary["results"]) == 30
+    # queue_size items waiting, one being consumed, one being produced
+    assert max(lead) <= 2 + 2
+
+
+def test_base_exceptions_stop_the_pipeline_without_hanging():
+    """A step raising SystemExit still closes the later queues; the exception is re-raised once all finished"""
+    def stop(n):
+        if n == 2:
+            raise SystemExit(3)
+        return [n]
+
+    steps = [{"name": "pass", "func": lambda n: [n]}, {"name": "stop", "func": stop},
+             {"name": "collect", "func": lambda n: [n]}]
+    outcome = []
+
+    def run():
+        try:
+            run_streaming_pipeline(range(50), steps, queue_size=1)
+        except SystemExit as e:
+            outcome.append(e.code)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert outcome == [3]
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from pipeline_manifest import MANIFEST_FILE, open_manifest, record_done
+from stage_readiness import publish_directory
+from table_extraction_pipeline import (
+    INPUT_DIR,
+    MANIFEST_STAGE,
+    cached_step_output,
+    evict_step_outputs,
+    pending_filings,
+    stage_version
+)
+
+
+def copy_step(input_path, output_path):
+    """A step writing its input, reversed, to the output"""
+    with open(input_path, "rb") as f_in, open(output_path, "wb") as f_out:
+        f_out.write(f_in.read()[::-1])
+    return True
+
+
+def test_cached_step_output_computes_once_per_content_and_version(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    calls = []
+
+    def produce(input_path, output_path):
+        calls.append(input_path)
+        return copy_step(input_path, output_path)
+
+    first = tmp_path / "first.pdf"
+    first.write_bytes(b"%PDF-same")
+    output_path = cached_step_output(str(cache_dir), str(first), produce, "v1")
+    with open(output_path, "rb") as f:
+        assert f.read() == b"emas-FDP%"
+
+    # Same content under another name: served from the cache
+    second = tmp_path / "second.pdf"
+    second.write_bytes(b"%PDF-same")
+    assert cached_step_output(str(cache_dir), str(second), produce, "v1") == output_path
+    assert len(calls) == 1
+
+    # Another step version misses the cache
+    assert cached_step_output(str(cache_dir), str(second), produce, "v2") != output_path
+    assert len(calls) == 2
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_cached_step_output_leaves_nothing_behind_on_failure(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    pdf_path = tmp_path / "filing.pdf"
+    pdf_path.write_bytes(b"%PDF-broken")
+
+    def failing_step(input_path, output_path):
+        with open(output_path, "wb") as f:
+            f.write(b"partial")
+        return False
+
+    with pytest.raises(RuntimeError, match="failing_step failed"):
+        cached_step_output(str(cache_dir), str(pdf_path), failing_step, "v1")
+    assert os.listdir(cache_dir) == []
+
+
+def test_step_cache_evicts_the_least_recently_used_outputs(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    paths = []
+    for index, content in enumerate((b"%PDF-old", b"%PDF-hit", b"%PDF-new")):
+        pdf_path = tmp_path / f"{index}.pdf"
+        pdf_path.write_bytes(content)
+        paths.append(cached_step_output(str(cache_dir), str(pdf_path), copy_step, "v1"))
+        os.utime(paths[-1], (index, index))
+    # Hit on the second entry: it becomes the most recently used
+    assert cached_step_output(str(cache_dir), str(tmp_path / "1.pdf"), copy_step, "v1") == paths[1]
+    (cache_dir / "in_progress.tmp.pdf").write_bytes(b"x" * 100)
+
+    assert evict_step_outputs(str(cache_dir), max_bytes=16) == 1
+    assert sorted(os.listdir(cache_dir)) == sorted([os.path.basename(paths[1]), os.path.basename(paths[2]),
+                                                    "in_progress.tmp.pdf"])
+
+    # A new entry is kept even when it alone exceeds the bound
+    big = tmp_path / "big.pdf"
+    big.write_bytes(b"%PDF-" + b"x" * 100)
+    output_path = cached_step_output(str(cache_dir), str(big), copy_step, "v1", max_bytes=16)
+    assert sorted(os.listdir(cache_dir)) == sorted([os.path.basename(output_path), "in_progress.tmp.pdf"])
+
+
+def test_pending_filings_skips_current_intermediate_and_undeclared_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(INPUT_DIR)
+    for name in ("a.pdf", "b.pdf", "a_unsigned.pdf", "a_ocr.pdf"):
+        with open(os.path.join(INPUT_DIR, name), "wb") as f:
+            f.write(b"%PDF-" + name.encode())
+    publish_directory(INPUT_DIR, "test")
+    # Not declared ready by the producer
+    with open(os.path.join(INPUT_DIR, "c.pdf"), "wb") as f:
+        f.write(b"%PDF-late")
+
+    output_dir = tmp_path / "Extracted_Tables" / "a"
+    output_dir.mkdir(parents=True)
+    manifest = open_manifest(MANIFEST_FILE)
+    try:
+        record_done(manifest, MANIFEST_STAGE, os.path.join(INPUT_DIR, "a.pdf"), stage_version(), [str(output_dir)])
+    finally:
+        manifest.close()
+
+    assert pending_filings() == [("b.pdf", os.path.join(INPUT_DIR, "b.pdf"))]
+    assert [name for name, _ in pending_filings(force=True)] == ["a.pdf", "b.pdf"]
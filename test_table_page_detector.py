@@ -0,0 +1,63 @@
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+from table_page_detector import (
+    detect_table_pages,
+    format_page_ranges,
+    is_table_text,
+    parse_page_ranges,
+    split_page_chunks
+)
+from test_pdf_document import add_text_page
+
+
+def add_ruled_page(writer, rows=5):
+    """Append a page drawing a table grid without any text"""
+    page = writer.add_blank_page(width=612, height=792)
+    lines = [f"72 {700 - 20 * row} m 540 {700 - 20 * row} l S" for row in range(rows + 1)]
+    lines += [f"{72 + 156 * column} 700 m {72 + 156 * column} {700 - 20 * rows} l S" for column in range(4)]
+    content = DecodedStreamObject()
+    content.set_data("\n".join(lines).encode("latin-1"))
+    page[NameObject("/Contents")] = writer._add_object(content)
+
+
+def test_is_table_text():
+    assert is_table_text("Statement of Profit and Loss for the year")
+    assert is_table_text(" ".join(["1,23,456.00"] * 10))
+    assert not is_table_text(" ".join(["1,23,456.00"] * 3))
+    assert not is_table_text("Form AOC-4 Form for filing financial statement")
+    assert not is_table_text("")
+
+
+def test_detect_table_pages(tmp_path):
+    writer = PdfWriter()
+    add_text_page(writer, "Form AOC-4")
+    add_text_page(writer, "Balance Sheet as at 31st March 2022")
+    add_ruled_page(writer)
+    add_text_page(writer, "Declaration of the director")
+    add_text_page(writer, " ".join(["12,345.67"] * 12))
+    pdf_path = tmp_path / "filing.pdf"
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+    assert detect_table_pages(str(pdf_path)) == [2, 3, 5]
+
+
+def test_format_page_ranges():
+    assert format_page_ranges([9, 1, 2, 3, 7, 10, 2]) == "1-3,7,9-10"
+    assert format_page_ranges([4]) == "4"
+    assert format_page_ranges([]) == ""
+
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("all", 4) == [1, 2, 3, 4]
+    assert parse_page_ranges("1-3,7,9-end", 10) == [1, 2, 3, 7, 9, 10]
+    assert parse_page_ranges("5,2-3,3,40", 6) == [2, 3, 5]
+    assert parse_page_ranges(format_page_ranges([2, 3, 8]), 10) == [2, 3, 8]
+
+
+def test_split_page_chunks_keeps_page_order():
+    pages = [1, 2, 3, 5, 8, 9, 10]
+    chunks = split_page_chunks(pages, 3)
+    assert chunks == [[1, 2, 3], [5, 8], [9, 10]]
+    assert split_page_chunks(pages, 20) == [[page] for page in pages]
+    assert split_page_chunks([], 4) == []
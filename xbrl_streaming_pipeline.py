@@ -0,0 +1,160 @@
+"""
+xbrl_streaming_pipeline.py
+
+Streaming mode of the XBRL branch of the pipeline.
+
+Instead of extracting every attachment, then converting every XML file, then tabulating every JSON file,
+each file flows through the three steps as soon as it is available:
+
+    XBRL/*.pdf --extract_attachments--> XBRL_XML/*.xml --parse_xbrl_to_json--> XBRL_XML_JSON/*.json
+               --table builder--> XBRL_XML_JSON_TABLE/*.csv
+
+The steps run in their own workers connected by bounded queues (see streaming_pipeline.py), so the first
+tables are written while later PDFs are still being read, and a slow step throttles the steps before it.
+Outputs, pipeline manifest entries and completion sentinels are the same as those of the batch scripts.
+
+Usage:
+    python xbrl_streaming_pipeline.py [--workers N] [--queue-size N] [--schema normalized] [--force]
+"""
+
+import argparse
+import logging
+import os
+from functools import partial
+
+import extract_xbrl_attachments
+from extract_xbrl_attachments import XBRL_DIR, extract_attachments
+from pdf_hash_index import unique_by_content
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, recorded_outputs
+from process_pool import process_pool
+from stage_readiness import clear_ready, publish_ready, ready_files
+from streaming_pipeline import DEFAULT_QUEUE_SIZE, run_streaming_pipeline
+from xbrl_xml_extractor import xbrl_json_to_table_batch, xbrl_xml_to_json_batch
+from xbrl_xml_extractor.xbrl_json_to_table_batch import convert_json_file
+from xbrl_xml_extractor.xbrl_xml_to_json_batch import SCHEMA_EMBEDDED, SCHEMAS, convert_xml_file
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+XML_DIR = extract_xbrl_attachments.OUTPUT_DIR
+JSON_DIR = "XBRL_XML_JSON"
+TABLE_DIR = "XBRL_XML_JSON_TABLE"
+
+
+def extract_step(pdf_path, force=False):
+    """Extract the attachments of one XBRL PDF and pass its XML files on"""
+    stage = extract_xbrl_attachments.MANIFEST_STAGE
+    version = extract_xbrl_attachments.stage_version()
+    manifest = open_manifest(MANIFEST_FILE)
+    try:
+        if not force and is_current(manifest, stage, pdf_path, version):
+            output_paths = recorded_outputs(manifest, stage, pdf_path)
+        else:
+            logging.info(f"Processing PDF: {os.path.basename(pdf_path)}")
+            output_paths = extract_attachments(pdf_path, XML_DIR)
+            if output_paths is None:
+                raise RuntimeError("attachments could not be read")
+            record_done(manifest, stage, pdf_path, version, output_paths)
+    finally:
+        manifest.close()
+    # Absolute paths, so the same XML coming from two PDFs is recognised downstream
+    return [os.path.abspath(path) for path in output_paths if path.lower().endswith('.xml')]
+
+
+def json_step(xml_path, schema=SCHEMA_EMBEDDED, force=False):
+    """Convert one XBRL XML file to JSON and pass the JSON file on"""
+    stage = xbrl_xml_to_json_batch.MANIFEST_STAGE
+    version = xbrl_xml_to_json_batch.stage_version(schema)
+    json_path = os.path.join(JSON_DIR, os.path.splitext(os.path.basename(xml_path))[0] + ".json")
+    manifest = open_manifest(MANIFEST_FILE)
+    try:
+        if force or not is_current(manifest, stage, xml_path, version):
+            error = convert_xml_file(xml_path, json_path, schema=schema)
+            if error is not None:
+                raise RuntimeError(error)
+            logging.info(f"Saved JSON to {json_path}")
+            record_done(manifest, stage, xml_path, version, [json_path])
+    finally:
+        manifest.close()
+    return [json_path]
+
+
+def table_step(json_path, force=False):
+    """Build the CSV tables of one XBRL JSON file"""
+    stage = xbrl_json_to_table_batch.MANIFEST_STAGE
+    version = xbrl_json_to_table_batch.stage_version()
+    base_name = os.path.splitext(os.path.basename(json_path))[0]
+    csv_path = os.path.join(TABLE_DIR, base_name + '.csv')
+    filtered_csv_path = os.path.join(TABLE_DIR, base_name + '_filtered.csv')
+    manifest = open_manifest(MANIFEST_FILE)
+    try:
+        if force or not is_current(manifest, stage, json_path, version):
+            convert_json_file(json_path, csv_path, filtered_csv_path)
+            record_done(manifest, stage, json_path, version, [csv_path, filtered_csv_path])
+    finally:
+        manifest.close()
+    return [csv_path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream the XBRL PDFs through attachment extraction, JSON conversion and tabulation.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Workers per step; with more than 1 the steps run in a process pool of this size (default: 1)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Files waiting between two steps before the earlier step blocks (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--schema", choices=SCHEMAS, default=SCHEMA_EMBEDDED,
+                        help="JSON schema of the intermediate files (see xbrl_xml_to_json_batch.py)")
+    parser.add_argument("--force", action="store_true",
+                        help="Process every file, even those whose outputs are current in the pipeline manifest")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(XBRL_DIR):
+        logging.error(f"XBRL directory '{XBRL_DIR}' does not exist.")
+        return
+    for directory in (XML_DIR, JSON_DIR, TABLE_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+    pdf_paths = [os.path.join(XBRL_DIR, pdf_file) for pdf_file in sorted(ready_files(XBRL_DIR, '.pdf'))]
+    # Byte-identical PDFs carry the same attachments; extracting them once also keeps two workers from
+    # writing the same XBRL_XML file at the same time
+    pdf_paths, duplicates = unique_by_content(pdf_paths)
+    for duplicate, kept in duplicates:
+        logging.info(f"Skipping PDF: {os.path.basename(duplicate)} (same content as {os.path.basename(kept)})")
+    logging.info(f"Streaming {len(pdf_paths)} PDF file(s) from '{XBRL_DIR}'")
+
+    steps = [
+        {"name": "extract_attachments", "func": partial(extract_step, force=args.force), "workers": args.workers},
+        {"name": "xml_to_json", "func": partial(json_step, schema=args.schema, force=args.force),
+         "workers": args.workers, "unique": True},
+        {"name": "json_to_table", "func": partial(table_step, force=args.force), "workers": args.workers},
+    ]
+
+    # Withdraw the completion sentinels of the intermediate directories while they are being written
+    clear_ready(XML_DIR)
+    clear_ready(JSON_DIR)
+    executor = process_pool(args.workers) if args.workers > 1 else None
+    try:
+        summary = run_streaming_pipeline(pdf_paths, steps, queue_size=args.queue_size, executor=executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    # Only reached when the pipeline did not raise, so a crashed run never declares its directories ready; only
+    # the files this run produced or found current are declared, never leftovers of inputs that failed
+    for directory, step, stage in ((XML_DIR, "extract_attachments", extract_xbrl_attachments.MANIFEST_STAGE),
+                                   (JSON_DIR, "xml_to_json", xbrl_xml_to_json_batch.MANIFEST_STAGE)):
+        publish_ready(directory, sorted({os.path.basename(path) for path in summary["outputs"][step]}), stage)
+
+    if summary["first_result"] is not None:
+        logging.info(f"First table written after {summary['first_result']:.1f}s")
+    logging.info(f"Wrote {len(summary['results'])} table(s) in {summary['elapsed']:.1f}s "
+                 f"with {len(summary['errors'])} error(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import io
+import json
+
+from xbrl_xml_extractor.xbrl_json_to_table_batch import extract_rows
+from xbrl_xml_extractor.xbrl_xml_to_json_batch import (
+    SCHEMA_EMBEDDED,
+    SCHEMA_NORMALIZED,
+    convert_xml_file,
+    convert_xml_folder,
+    iterparse_xbrl,
+    parse_xbrl_to_json
+)
+
+# The first fact refers to a context that is only declared at the end of the document
+XBRL_XML = """<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance"
+    xmlns:xbrldi="http://xbrl.org/2006/xbrldi"
+    xmlns:in-ca="http://www.icai.org/xbrl/taxonomy/2017-03-31/in-ca"
+    xmlns:ind-as="http://www.icai.org/xbrl/taxonomy/2017-03-31/ind-as">
+<ind-as:Revenue contextRef="D2024" unitRef="INR" decimals="-5">1500000</ind-as:Revenue>
+<xbrli:context id="I2024">
+  <xbrli:entity><xbrli:identifier scheme="http://www.mca.gov.in/CIN">L29120MH1986PLC042028</xbrli:identifier></xbrli:entity>
+  <xbrli:period><xbrli:instant>2024-03-31</xbrli:instant></xbrli:period>
+  <xbrli:scenario><xbrldi:explicitMember dimension="in-ca:ComponentsOfEquityAxis">in-ca:EquityShareCapitalMember</xbrldi:explicitMember></xbrli:scenario>
+</xbrli:context>
+<ind-as:Equity contextRef="I2024" unitRef="INR" decimals="-5">2500000</ind-as:Equity>
+<xbrli:context id="D2024">
+  <xbrli:entity><xbrli:identifier scheme="http://www.mca.gov.in/CIN">L29120MH1986PLC042028</xbrli:identifier></xbrli:entity>
+  <xbrli:period><xbrli:startDate>2023-04-01</xbrli:startDate><xbrli:endDate>2024-03-31</xbrli:endDate></xbrli:period>
+</xbrli:context>
+</xbrli:xbrl>"""
+
+
+def test_iterparse_matches_tree_parse():
+    """The streaming parser produces the same facts as the in-memory parser"""
+    contexts, data_elements = iterparse_xbrl(io.BytesIO(XBRL_XML.encode("utf-8")))
+    assert set(contexts) == {"I2024", "D2024"}
+    assert json.dumps(data_elements, indent=4) == parse_xbrl_to_json(XBRL_XML)
+
+
+def test_iterparse_resolves_forward_context_references():
+    """A fact seen before its context is linked in the second pass"""
+    _, data_elements = iterparse_xbrl(io.BytesIO(XBRL_XML.encode("utf-8")))
+    revenue = data_elements[0]
+    assert revenue["elementName"] == "Revenue"
+    assert revenue["namespacePrefix"] == "ind-as"
+    assert revenue["contextDetails"]["period"] == {
+        "type": "duration",
+        "startDate": "2023-04-01",
+        "endDate": "2024-03-31"
+    }
+    equity = data_elements[1]
+    assert equity["contextDetails"]["scenario"][0]["value"] == "EquityShareCapitalMember"
+
+
+def test_normalized_schema_stores_each_context_once():
+    """Normalized facts reference the top-level contexts table instead of embedding it"""
+    text = parse_xbrl_to_json(XBRL_XML, schema=SCHEMA_NORMALIZED)
+    normalized = json.loads(text)
+    assert text == json.dumps(normalized, separators=(",", ":"))
+    assert set(normalized["contexts"]) == {"I2024", "D2024"}
+    assert [fact["contextRef"] for fact in normalized["facts"]] == ["D2024", "I2024"]
+    assert not any("contextDetails" in fact for fact in normalized["facts"])
+
+
+def test_table_rows_match_for_both_schemas():
+    """Joining normalized contexts back yields the same table rows as the embedded schema"""
+    embedded_rows = extract_rows(json.loads(parse_xbrl_to_json(XBRL_XML)))
+    normalized_rows = extract_rows(json.loads(parse_xbrl_to_json(XBRL_XML, schema=SCHEMA_NORMALIZED)))
+    assert normalized_rows == embedded_rows
+    assert embedded_rows[1]["startDate/instant"] == "2024-03-31"
+    assert embedded_rows[1]["scenario_value"] == "EquityShareCapitalMember"
+
+
+def test_convert_xml_file_captures_errors(tmp_path):
+    """The worker entry point writes the JSON on success and returns the error instead of raising"""
+    xml_path = tmp_path / "filing.xml"
+    xml_path.write_text(XBRL_XML, encoding="utf-8")
+    json_path = tmp_path / "filing.json"
+    assert convert_xml_file(str(xml_path), str(json_path)) is None
+    assert json_path.read_text(encoding="utf-8") == parse_xbrl_to_json(XBRL_XML)
+
+    error = convert_xml_file(str(tmp_path / "missing.xml"), str(tmp_path / "missing.json"))
+    assert error is not None and "missing.xml" in error
+
+
+def test_convert_xml_folder_lists_only_this_runs_outputs(tmp_path):
+    """JSON left over from an XML that fails now is not listed, so it is never declared ready"""
+    xml_dir = tmp_path / "XBRL_XML"
+    json_dir = tmp_path / "XBRL_XML_JSON"
+    xml_dir.mkdir()
+    json_dir.mkdir()
+    (xml_dir / "good.xml").write_text(XBRL_XML, encoding="utf-8")
+    # Unreadable, so its conversion fails
+    (xml_dir / "bad.xml").mkdir()
+    (json_dir / "bad.json").write_text("{}", encoding="utf-8")
+    args = argparse.Namespace(force=False, schema=SCHEMA_EMBEDDED, no_streaming=False, workers=1)
+
+    assert convert_xml_folder(args, str(tmp_path), str(xml_dir), str(json_dir)) == ["good.json"]
+    # Current JSON is still listed when it is skipped
+    assert convert_xml_folder(args, str(tmp_path), str(xml_dir), str(json_dir)) == ["good.json"]
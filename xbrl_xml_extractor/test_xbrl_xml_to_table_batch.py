@@ -0,0 +1,29 @@
+import io
+import json
+
+import pandas as pd
+
+from xbrl_xml_extractor.test_xbrl_xml_to_json_batch import XBRL_XML
+from xbrl_xml_extractor.xbrl_json_to_table_batch import TABLE_COLUMNS, extract_rows
+from xbrl_xml_extractor.xbrl_xml_to_json_batch import iterparse_xbrl, parse_xbrl_to_json
+from xbrl_xml_extractor.xbrl_xml_to_table_batch import build_fact_table, convert_xml_file_to_parquet
+
+
+def test_fact_table_matches_json_rows():
+    """The Arrow table holds the same rows as the JSON -> table conversion"""
+    contexts, data_elements = iterparse_xbrl(io.BytesIO(XBRL_XML.encode("utf-8")), embed_contexts=False)
+    table = build_fact_table(contexts, data_elements)
+    assert table.column_names == TABLE_COLUMNS
+    assert table.to_pylist() == extract_rows(json.loads(parse_xbrl_to_json(XBRL_XML)))
+
+
+def test_convert_xml_file_to_parquet(tmp_path):
+    """Full and filtered Parquet files are written"""
+    xml_path = tmp_path / "filing.xml"
+    xml_path.write_text(XBRL_XML, encoding="utf-8")
+    convert_xml_file_to_parquet(str(xml_path), str(tmp_path / "filing.parquet"), str(tmp_path / "filing_filtered.parquet"))
+
+    full = pd.read_parquet(tmp_path / "filing.parquet")
+    filtered = pd.read_parquet(tmp_path / "filing_filtered.parquet")
+    assert list(full["ElementName"]) == ["Revenue", "Equity"]
+    assert list(filtered["ElementName"]) == ["Equity"]
@@ -7,13 +7,29 @@ This script
     - and saves it as CSV files in the XBRL_XML_JSON_TABLE directory. 
 It also creates filtered CSVs for specific element names. 
 The script logs its progress and errors for easier debugging and traceability.
+
+Both JSON schemas written by xbrl_xml_to_json_batch.py are accepted: the embedded schema (a list of facts,
+each carrying its contextDetails) and the normalized schema (a top-level "contexts" table plus "facts" that
+reference a context by contextRef). For normalized files each context is flattened once and joined back to
+its facts, so both schemas produce identical CSVs.
 """
 
+import argparse
 import pandas as pd
 import json
 import os
+import sys
 import logging
 
+# The shared pipeline modules live in the project root; make them importable when the script is run directly
+# (python xbrl_xml_extractor/<script>.py) and not with python -m from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, source_version
+from stage_readiness import ready_files
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,7 +42,9 @@ logging.basicConfig(
 # Set up input and output directories
 json_folder = os.path.join(os.path.dirname(__file__), '..', 'XBRL_XML_JSON')
 csv_folder = os.path.join(os.path.dirname(__file__), '..', 'XBRL_XML_JSON_TABLE')
-os.makedirs(csv_folder, exist_ok=True)
+
+# Name of this stage in the pipeline manifest
+MANIFEST_STAGE = "xbrl_json_to_table"
 
 # List of element names to filter
 filter_elements = [
@@ -69,83 +87,174 @@ filter_elements = [
     "Assets"
 ]
 
-json_files = [f for f in os.listdir(json_folder) if f.lower().endswith('.json')]
-if not json_files:
-    logging.info(f"No JSON files found in {json_folder}")
-else:
-    logging.info(f"Found {len(json_files)} JSON file(s) in {json_folder}")
-
-for json_file in json_files:
-    json_path = os.path.join(json_folder, json_file)
-    csv_file = os.path.splitext(json_file)[0] + '.csv'
-    csv_path = os.path.join(csv_folder, csv_file)
-    filtered_csv_path = os.path.join(csv_folder, os.path.splitext(json_file)[0] + '_filtered.csv')
-    logging.info(f"Processing {json_file} ...")
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
+# Columns of the generated CSV files
+TABLE_COLUMNS = [
+    "ElementName",
+    "Value",
+    "unitref",
+    "decimals",
+    "period_type",
+    "startDate/instant",
+    "endDate",
+    "contextRef",
+    "scenario_type",
+    "scenario_dimension",
+    "scenario_value"
+]
 
-        # Prepare a list to hold the extracted data for the DataFrame
-        extracted_data = []
 
-        # Iterate through each item in the JSON data
-        for item in json_data:
-            element_name = item.get("elementName")
-            value = item.get("value")
-            unit_ref = item.get("unitRef")
-            decimals = item.get("decimals")
+def flatten_context(context_details):
+    """
+    Flatten the period and first scenario of a context into their table columns.
+
+    Args:
+        context_details (dict): Context as written by xbrl_xml_to_json_batch.py (may be None).
+
+    Returns:
+        dict: period_type, startDate/instant, endDate, scenario_type, scenario_dimension and scenario_value
+    """
+    context_details = context_details or {}
+    period_details = context_details.get("period", {})
+
+    period_type = period_details.get("type")
+    start_date = period_details.get("startDate")
+    instant_date = period_details.get("instant") # This is for 'instant' type periods
+    end_date = period_details.get("endDate")
+
+    # Combine startDate and instant into a single column, prioritizing instant if period type is 'instant'
+    start_or_instant_date = instant_date if period_type == "instant" else start_date
+
+    # Scenario extraction (first scenario if present)
+    scenario_list = context_details.get("scenario", [])
+    if scenario_list and isinstance(scenario_list, list):
+        scenario = scenario_list[0]
+        scenario_type = scenario.get("type", "")
+        scenario_dimension = scenario.get("dimension", "")
+        scenario_value = scenario.get("value", "")
+    else:
+        scenario_type = ""
+        scenario_dimension = ""
+        scenario_value = ""
+
+    return {
+        "period_type": period_type,
+        "startDate/instant": start_or_instant_date,
+        "endDate": end_date,
+        "scenario_type": scenario_type,
+        "scenario_dimension": scenario_dimension,
+        "scenario_value": scenario_value
+    }
+
+
+def build_row(item, context_columns):
+    """Create the table row of one fact from the fact and its flattened context"""
+    return {
+        "ElementName": item.get("elementName"),
+        "Value": item.get("value"),
+        "unitref": item.get("unitRef"),
+        "decimals": item.get("decimals"),
+        "period_type": context_columns["period_type"],
+        "startDate/instant": context_columns["startDate/instant"],
+        "endDate": context_columns["endDate"],
+        "contextRef": item.get("contextRef"),
+        "scenario_type": context_columns["scenario_type"],
+        "scenario_dimension": context_columns["scenario_dimension"],
+        "scenario_value": context_columns["scenario_value"]
+    }
+
+
+def extract_rows(json_data):
+    """
+    Convert the JSON of one XBRL instance into table rows.
+
+    Args:
+        json_data: Parsed JSON in the embedded (list of facts) or normalized (contexts + facts) schema.
+
+    Returns:
+        list: One dict per fact with the TABLE_COLUMNS keys
+    """
+    # Normalized schema: flatten every context once and join it back to its facts by contextRef
+    if isinstance(json_data, dict) and "facts" in json_data:
+        contexts = json_data.get("contexts", {})
+        flattened_contexts = {}
+        extracted_data = []
+        for item in json_data["facts"]:
             context_ref = item.get("contextRef")
+            context_columns = flattened_contexts.get(context_ref)
+            if context_columns is None:
+                context_columns = flatten_context(contexts.get(context_ref))
+                flattened_contexts[context_ref] = context_columns
+            extracted_data.append(build_row(item, context_columns))
+        return extracted_data
+
+    # Embedded schema: every fact carries its contextDetails
+    return [build_row(item, flatten_context(item.get("contextDetails", {}))) for item in json_data]
+
+
+def stage_version():
+    """Version of this stage recorded in the pipeline manifest"""
+    return source_version(__file__)
+
+
+def convert_json_file(json_path, csv_path, filtered_csv_path):
+    """
+    Write the CSV and the filtered CSV for one XBRL JSON file.
+
+    Args:
+        json_path (str): Path of the JSON file.
+        csv_path (str): Path of the full CSV.
+        filtered_csv_path (str): Path of the CSV limited to filter_elements.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+
+    # Create the Pandas DataFrame from the extracted data
+    df = pd.DataFrame(extract_rows(json_data), columns=TABLE_COLUMNS)
 
-            # Accessing nested contextDetails and period information
-            context_details = item.get("contextDetails", {})
-            period_details = context_details.get("period", {})
-
-            period_type = period_details.get("type")
-            start_date = period_details.get("startDate")
-            instant_date = period_details.get("instant") # This is for 'instant' type periods
-            end_date = period_details.get("endDate")
-
-            # Combine startDate and instant into a single column, prioritizing instant if period type is 'instant'
-            start_or_instant_date = instant_date if period_type == "instant" else start_date
-
-            # Scenario extraction (first scenario if present)
-            scenario_list = context_details.get("scenario", [])
-            if scenario_list and isinstance(scenario_list, list):
-                scenario = scenario_list[0]
-                scenario_type = scenario.get("type", "")
-                scenario_dimension = scenario.get("dimension", "")
-                scenario_value = scenario.get("value", "")
+    # Save the DataFrame as CSV
+    df.to_csv(csv_path, index=False)
+    logging.info(f"Saved CSV to {csv_path}")
+
+    # Filter DataFrame and save filtered CSV
+    filtered_df = df[df['ElementName'].isin(filter_elements)]
+    filtered_df.to_csv(filtered_csv_path, index=False)
+    logging.info(f"Saved filtered CSV to {filtered_csv_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert XBRL JSON files in XBRL_XML_JSON to CSV tables.")
+    parser.add_argument("--force", action="store_true",
+                        help="Convert every file, even those whose CSVs are current in the pipeline manifest")
+    args = parser.parse_args(argv)
+
+    os.makedirs(csv_folder, exist_ok=True)
+    json_files = ready_files(json_folder, '.json')
+    if not json_files:
+        logging.info(f"No JSON files found in {json_folder}")
+    else:
+        logging.info(f"Found {len(json_files)} JSON file(s) in {json_folder}")
+
+    manifest = open_manifest(os.path.join(os.path.dirname(__file__), '..', MANIFEST_FILE))
+    version = stage_version()
+    try:
+        for json_file in json_files:
+            json_path = os.path.join(json_folder, json_file)
+            csv_file = os.path.splitext(json_file)[0] + '.csv'
+            csv_path = os.path.join(csv_folder, csv_file)
+            filtered_csv_path = os.path.join(csv_folder, os.path.splitext(json_file)[0] + '_filtered.csv')
+            if not args.force and is_current(manifest, MANIFEST_STAGE, json_path, version):
+                logging.info(f"Skipping {json_file}: CSV is current")
+                continue
+            logging.info(f"Processing {json_file} ...")
+            try:
+                convert_json_file(json_path, csv_path, filtered_csv_path)
+            except Exception as e:
+                logging.error(f"Failed to process {json_file}: {e}")
             else:
-                scenario_type = ""
-                scenario_dimension = ""
-                scenario_value = ""
-
-            # Create a dictionary for the current row with desired columns
-            row_data = {
-                "ElementName": element_name,
-                "Value": value,
-                "unitref": unit_ref,
-                "decimals": decimals,
-                "period_type": period_type,
-                "startDate/instant": start_or_instant_date,
-                "endDate": end_date,
-                "contextRef": context_ref,
-                "scenario_type": scenario_type,
-                "scenario_dimension": scenario_dimension,
-                "scenario_value": scenario_value
-            }
-            extracted_data.append(row_data)
-
-        # Create the Pandas DataFrame from the extracted data
-        df = pd.DataFrame(extracted_data)
-
-        # Save the DataFrame as CSV
-        df.to_csv(csv_path, index=False)
-        logging.info(f"Saved CSV to {csv_path}")
-
-        # Filter DataFrame and save filtered CSV
-        filtered_df = df[df['ElementName'].isin(filter_elements)]
-        filtered_df.to_csv(filtered_csv_path, index=False)
-        logging.info(f"Saved filtered CSV to {filtered_csv_path}")
-    except Exception as e:
-        logging.error(f"Failed to process {json_file}: {e}")
+                record_done(manifest, MANIFEST_STAGE, json_path, version, [csv_path, filtered_csv_path])
+    finally:
+        manifest.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,12 @@ This script
     - batch-processes all XBRL XML files in the XBRL_XML directory, 
     - parses them, 
     - and converts their contents into structured JSON files in the XBRL_XML_JSON directory. 
-It uses ElementTree for XML parsing and handles XBRL-specific namespaces and context linking. 
+It uses ElementTree for XML parsing (incremental iterparse by default, so large instances are not held in memory
+as a full tree) and handles XBRL-specific namespaces and context linking. 
 The script logs its progress and errors for easier debugging and traceability.
 """
 
+import argparse
 import os
 import sys
 import xml.etree.ElementTree as ET
@@ -16,6 +18,16 @@ import json
 import re
 import logging
 
+# The shared pipeline modules live in the project root; make them importable when the script is run directly
+# (python xbrl_xml_extractor/<script>.py) and not with python -m from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, source_version
+from process_pool import process_pool
+from stage_readiness import clear_ready, publish_ready, ready_files
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -52,133 +64,355 @@ namespaces = {
 }
 
 
-def parse_xbrl_to_json(xml_string):
-    try:
-        root = ET.fromstring(xml_string)
-    except ET.ParseError as e:
-        return json.dumps({"error": f"Failed to parse XML: {e}"}, indent=4)
+# Namespace URI -> prefix lookup (the first prefix listed for a URI wins)
+namespace_prefixes = {}
+for _prefix, _uri in namespaces.items():
+    namespace_prefixes.setdefault(_uri, _prefix)
 
-    contexts = {}
-    data_elements = []
+CONTEXT_TAG = f"{{{namespaces['xbrli']}}}context"
 
-    # 1. Parse Contexts
-    for context_elem in root.findall('xbrli:context', namespaces):
-        context_id = context_elem.get('id')
-        context_info = {
-            "id": context_id,
-            "entity": {},
-            "period": {},
-            "scenario": []
+# Output schemas: "embedded" repeats the full context in every fact (a JSON list of facts),
+# "normalized" writes each context once in a top-level "contexts" table and facts only carry contextRef,
+# as compact JSON without indentation.
+SCHEMA_EMBEDDED = "embedded"
+SCHEMA_NORMALIZED = "normalized"
+SCHEMAS = (SCHEMA_EMBEDDED, SCHEMA_NORMALIZED)
+
+# Name of this stage in the pipeline manifest
+MANIFEST_STAGE = "xbrl_xml_to_json"
+
+
+def parse_context(context_elem):
+    """Convert an xbrli:context element into its JSON representation."""
+    context_id = context_elem.get('id')
+    context_info = {
+        "id": context_id,
+        "entity": {},
+        "period": {},
+        "scenario": []
+    }
+
+    identifier_elem = context_elem.find('xbrli:entity/xbrli:identifier', namespaces)
+    if identifier_elem is not None:
+        context_info["entity"] = {
+            "scheme": identifier_elem.get('scheme'),
+            "value": identifier_elem.text.strip() if identifier_elem.text else ""
         }
 
-        identifier_elem = context_elem.find('xbrli:entity/xbrli:identifier', namespaces)
-        if identifier_elem is not None:
-            context_info["entity"] = {
-                "scheme": identifier_elem.get('scheme'),
-                "value": identifier_elem.text.strip() if identifier_elem.text else ""
+    period_elem = context_elem.find('xbrli:period', namespaces)
+    if period_elem is not None:
+        start_date_elem = period_elem.find('xbrli:startDate', namespaces)
+        end_date_elem = period_elem.find('xbrli:endDate', namespaces)
+        instant_elem = period_elem.find('xbrli:instant', namespaces)
+
+        if start_date_elem is not None and end_date_elem is not None:
+            context_info["period"] = {
+                "type": "duration",
+                "startDate": start_date_elem.text.strip() if start_date_elem.text else "",
+                "endDate": end_date_elem.text.strip() if end_date_elem.text else ""
+            }
+        elif instant_elem is not None:
+            context_info["period"] = {
+                "type": "instant",
+                "instant": instant_elem.text.strip() if instant_elem.text else ""
             }
 
-        period_elem = context_elem.find('xbrli:period', namespaces)
-        if period_elem is not None:
-            start_date_elem = period_elem.find('xbrli:startDate', namespaces)
-            end_date_elem = period_elem.find('xbrli:endDate', namespaces)
-            instant_elem = period_elem.find('xbrli:instant', namespaces)
-
-            if start_date_elem is not None and end_date_elem is not None:
-                context_info["period"] = {
-                    "type": "duration",
-                    "startDate": start_date_elem.text.strip() if start_date_elem.text else "",
-                    "endDate": end_date_elem.text.strip() if end_date_elem.text else ""
-                }
-            elif instant_elem is not None:
-                context_info["period"] = {
-                    "type": "instant",
-                    "instant": instant_elem.text.strip() if instant_elem.text else ""
-                }
-
-        scenario_elem = context_elem.find('xbrli:scenario', namespaces)
-        if scenario_elem is not None:
-            for typed_member_elem in scenario_elem.findall('xbrldi:typedMember', namespaces):
-                dimension_full = typed_member_elem.get('dimension')
-                dimension = str(ET.QName(dimension_full)) if dimension_full else None
-                domain_elem = next(iter(typed_member_elem), None)
-                if domain_elem is not None:
-                    domain_value_full = domain_elem.text.strip() if domain_elem.text else ""
-                    domain_value = domain_value_full.split(':')[-1] if ':' in domain_value_full else domain_value_full
-                    context_info["scenario"].append({
-                        "type": "typedMember",
-                        "dimension": dimension,
-                        "value": domain_value
-                    })
-            for explicit_member_elem in scenario_elem.findall('xbrldi:explicitMember', namespaces):
-                dimension_full = explicit_member_elem.get('dimension')
-                dimension = str(ET.QName(dimension_full)) if dimension_full else None
-                member_value_full_text = explicit_member_elem.text.strip() if explicit_member_elem.text else ""
-                member_value = member_value_full_text.split(':')[-1] if ':' in member_value_full_text else member_value_full_text
+    scenario_elem = context_elem.find('xbrli:scenario', namespaces)
+    if scenario_elem is not None:
+        for typed_member_elem in scenario_elem.findall('xbrldi:typedMember', namespaces):
+            dimension_full = typed_member_elem.get('dimension')
+            dimension = str(ET.QName(dimension_full)) if dimension_full else None
+            domain_elem = next(iter(typed_member_elem), None)
+            if domain_elem is not None:
+                domain_value_full = domain_elem.text.strip() if domain_elem.text else ""
+                domain_value = domain_value_full.split(':')[-1] if ':' in domain_value_full else domain_value_full
                 context_info["scenario"].append({
-                    "type": "explicitMember",
+                    "type": "typedMember",
                     "dimension": dimension,
-                    "value": member_value
+                    "value": domain_value
                 })
-        contexts[context_id] = context_info
+        for explicit_member_elem in scenario_elem.findall('xbrldi:explicitMember', namespaces):
+            dimension_full = explicit_member_elem.get('dimension')
+            dimension = str(ET.QName(dimension_full)) if dimension_full else None
+            member_value_full_text = explicit_member_elem.text.strip() if explicit_member_elem.text else ""
+            member_value = member_value_full_text.split(':')[-1] if ':' in member_value_full_text else member_value_full_text
+            context_info["scenario"].append({
+                "type": "explicitMember",
+                "dimension": dimension,
+                "value": member_value
+            })
+    return context_info
+
+
+def build_data_entry(elem, context_ref):
+    """Convert a fact element (any element carrying a contextRef) into its JSON representation, without context details."""
+    tag_name_full = elem.tag
+    [uri, element] = tag_name_full[1:].split('}')  if tag_name_full.startswith('{') and '}' in tag_name_full else [tag_name_full, tag_name_full]
+    element_name = str(ET.QName(element))
+    namespace_uri = str(ET.QName(uri))
+    namespace_prefix = namespace_prefixes.get(namespace_uri, "")
+    value_raw = elem.text if elem.text else ""
+    value = re.sub(r'<[^>]+>', '', value_raw).strip()
+    return {
+        "elementName": element_name,
+        "namespacePrefix": namespace_prefix,
+        "namespaceURI": namespace_uri,
+        "value": value,
+        "contextRef": context_ref,
+        "unitRef": elem.get('unitRef'),
+        "decimals": elem.get('decimals')
+    }
+
+
+def serialize_xbrl(contexts, data_elements, schema=SCHEMA_EMBEDDED):
+    """
+    Serialize parsed contexts and facts to JSON text.
+
+    Args:
+        contexts (dict): Contexts by id.
+        data_elements (list): Facts in document order. With the embedded schema they must carry contextDetails.
+        schema (str): SCHEMA_EMBEDDED or SCHEMA_NORMALIZED.
+
+    The embedded schema keeps the indented layout of the existing JSON files; the normalized schema is written
+    compactly, as its files are meant to be read by xbrl_json_to_table_batch.py rather than by eye.
+
+    Returns:
+        str: JSON text
+    """
+    if schema == SCHEMA_NORMALIZED:
+        return json.dumps({"schema": SCHEMA_NORMALIZED, "contexts": contexts, "facts": data_elements},
+                          separators=(",", ":"))
+    return json.dumps(data_elements, indent=4)
+
+
+def parse_xbrl_tree(xml_string, embed_contexts=True):
+    """
+    Parse an XBRL instance held in memory.
+
+    Args:
+        xml_string (str): The XBRL XML.
+        embed_contexts (bool): Add the full context to every fact as contextDetails.
+
+    Returns:
+        tuple: (contexts by id, list of fact entries in document order)
+    """
+    root = ET.fromstring(xml_string)
+
+    contexts = {}
+    data_elements = []
+
+    # 1. Parse Contexts
+    for context_elem in root.findall('xbrli:context', namespaces):
+        context_info = parse_context(context_elem)
+        contexts[context_info["id"]] = context_info
 
     # 2. Parse Data Elements (Facts) and link to Contexts
     for elem in root.iter():
         context_ref = elem.get('contextRef')
         if context_ref:
-            tag_name_full = elem.tag
-            [uri, element] = tag_name_full[1:].split('}')  if tag_name_full.startswith('{') and '}' in tag_name_full else [tag_name_full, tag_name_full]
-            element_name = str(ET.QName(element))
-            namespace_uri = str(ET.QName(uri))
-            namespace_prefix = ""
-            for prefix, uri in namespaces.items():
-                if uri == namespace_uri:
-                    namespace_prefix = prefix
-                    break
-            value_raw = elem.text if elem.text else ""
-            value = re.sub(r'<[^>]+>', '', value_raw).strip()
-            unit_ref = elem.get('unitRef')
-            decimals = elem.get('decimals')
-            data_entry = {
-                "elementName": element_name,
-                "namespacePrefix": namespace_prefix,
-                "namespaceURI": namespace_uri,
-                "value": value,
-                "contextRef": context_ref,
-                "unitRef": unit_ref,
-                "decimals": decimals,
-                "contextDetails": contexts.get(context_ref)
-            }
+            data_entry = build_data_entry(elem, context_ref)
+            if embed_contexts:
+                data_entry["contextDetails"] = contexts.get(context_ref)
             data_elements.append(data_entry)
-    return json.dumps(data_elements, indent=4)
+    return contexts, data_elements
 
 
-def main():
+def parse_xbrl_to_json(xml_string, schema=SCHEMA_EMBEDDED):
+    try:
+        contexts, data_elements = parse_xbrl_tree(xml_string, embed_contexts=schema == SCHEMA_EMBEDDED)
+    except ET.ParseError as e:
+        return json.dumps({"error": f"Failed to parse XML: {e}"}, indent=4)
+    return serialize_xbrl(contexts, data_elements, schema)
+
+
+def iterparse_xbrl(source, embed_contexts=True):
+    """
+    Parse an XBRL instance with iterparse, keeping memory bounded by the largest top-level element.
+
+    Contexts and facts are converted as soon as their end tag is read and the finished elements are
+    cleared from the tree. Facts that refer to a context appearing later in the document are linked
+    in a second pass over just those facts once the whole document has been read.
+
+    Args:
+        source: Path or binary file object of the XBRL XML.
+        embed_contexts (bool): Add the full context to every fact as contextDetails.
+
+    Returns:
+        tuple: (contexts by id, list of fact entries in document order)
+    """
+    contexts = {}
+    data_elements = []
+    unresolved = []
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        if depth == 2 and elem.tag == CONTEXT_TAG:
+            context_info = parse_context(elem)
+            contexts[context_info["id"]] = context_info
+        else:
+            context_ref = elem.get('contextRef')
+            if context_ref:
+                data_entry = build_data_entry(elem, context_ref)
+                if embed_contexts:
+                    context_details = contexts.get(context_ref)
+                    data_entry["contextDetails"] = context_details
+                    if context_details is None:
+                        unresolved.append(data_entry)
+                data_elements.append(data_entry)
+        if depth == 2:
+            # Top-level element finished: drop it (and anything below it) from the tree
+            root.clear()
+        depth -= 1
+
+    # Second pass: facts whose context was declared after them
+    for data_entry in unresolved:
+        data_entry["contextDetails"] = contexts.get(data_entry["contextRef"])
+    return contexts, data_elements
+
+
+def parse_xbrl_file_to_json(xml_path, streaming=True, schema=SCHEMA_EMBEDDED):
+    """
+    Convert an XBRL XML file to the JSON produced by parse_xbrl_to_json.
+
+    Args:
+        xml_path (str): Path to the XBRL XML file.
+        streaming (bool): Parse incrementally with iterparse instead of building the full tree.
+        schema (str): SCHEMA_EMBEDDED or SCHEMA_NORMALIZED.
+
+    Returns:
+        str: JSON text
+    """
+    if not streaming:
+        with open(xml_path, 'r', encoding='utf-8') as f:
+            return parse_xbrl_to_json(f.read(), schema)
+    try:
+        contexts, data_elements = iterparse_xbrl(xml_path, embed_contexts=schema == SCHEMA_EMBEDDED)
+    except ET.ParseError as e:
+        return json.dumps({"error": f"Failed to parse XML: {e}"}, indent=4)
+    return serialize_xbrl(contexts, data_elements, schema)
+
+
+def stage_version(schema=SCHEMA_EMBEDDED):
+    """Version of this stage recorded in the pipeline manifest"""
+    return source_version(__file__, extra={"schema": schema})
+
+
+def convert_xml_file(xml_path, json_path, streaming=True, schema=SCHEMA_EMBEDDED):
+    """
+    Convert one XBRL XML file and write its JSON. Runs in worker processes, so errors are returned, not raised.
+
+    Args:
+        xml_path (str): Path of the XBRL XML file.
+        json_path (str): Path of the JSON file to write.
+        streaming (bool): Parse incrementally with iterparse instead of building the full tree.
+        schema (str): SCHEMA_EMBEDDED or SCHEMA_NORMALIZED.
+
+    Returns:
+        str: None on success, otherwise the error message
+    """
+    try:
+        json_output = parse_xbrl_file_to_json(xml_path, streaming=streaming, schema=schema)
+        with open(json_path, 'w', encoding='utf-8') as jf:
+            jf.write(json_output)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert XBRL XML files in XBRL_XML to JSON.")
+    parser.add_argument("--no-streaming", action="store_true",
+                        help="Build the full element tree in memory instead of parsing incrementally")
+    parser.add_argument("--schema", choices=SCHEMAS, default=SCHEMA_EMBEDDED,
+                        help="'normalized' stores each context once and lets facts reference it by id")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes used to convert files in parallel (default: 1)")
+    parser.add_argument("--force", action="store_true",
+                        help="Convert every file, even those whose JSON is current in the pipeline manifest")
+    args = parser.parse_args(argv)
+
     project_root = os.path.dirname(os.path.dirname(__file__))
     xbrl_xml_folder = os.path.join(project_root, "XBRL_XML")
     xbrl_json_folder = os.path.join(project_root, "XBRL_XML_JSON")
     os.makedirs(xbrl_json_folder, exist_ok=True)
 
-    xml_files = [f for f in os.listdir(xbrl_xml_folder) if f.lower().endswith('.xml')]
+    # Withdraw the completion sentinel while XBRL_XML_JSON is being written
+    clear_ready(xbrl_json_folder)
+    json_files = convert_xml_folder(args, project_root, xbrl_xml_folder, xbrl_json_folder)
+    # Only reached when the conversion did not raise, so a crashed run never declares XBRL_XML_JSON ready; stale
+    # JSON of XML files that failed in this run is left out
+    publish_ready(xbrl_json_folder, json_files, MANIFEST_STAGE)
+
+
+def convert_xml_folder(args, project_root, xbrl_xml_folder, xbrl_json_folder):
+    """
+    Convert every XML file declared ready in xbrl_xml_folder that is not current in the pipeline manifest.
+
+    Returns:
+        list: Names of the JSON files written in this run or current in the pipeline manifest
+    """
+    xml_files = ready_files(xbrl_xml_folder, '.xml')
     if not xml_files:
         logging.info(f"No XML files found in {xbrl_xml_folder}")
-        return
+        return []
 
     logging.info(f"Found {len(xml_files)} XML file(s) in {xbrl_xml_folder}")
+    manifest = open_manifest(os.path.join(project_root, MANIFEST_FILE))
+    version = stage_version(args.schema)
+    pending = []
+    json_files = []
     for xml_file in xml_files:
         xml_path = os.path.join(xbrl_xml_folder, xml_file)
-        json_file = os.path.splitext(xml_file)[0] + ".json"
-        json_path = os.path.join(xbrl_json_folder, json_file)
-        logging.info(f"Processing {xml_file} ...")
-        try:
-            with open(xml_path, 'r', encoding='utf-8') as f:
-                xml_content = f.read()
-            json_output = parse_xbrl_to_json(xml_content)
-            with open(json_path, 'w', encoding='utf-8') as jf:
-                jf.write(json_output)
-            logging.info(f"Saved JSON to {json_path}")
-        except Exception as e:
-            logging.error(f"Failed to process {xml_file}: {e}")
+        json_path = os.path.join(xbrl_json_folder, os.path.splitext(xml_file)[0] + ".json")
+        if not args.force and is_current(manifest, MANIFEST_STAGE, xml_path, version):
+            logging.info(f"Skipping {xml_file}: JSON is current")
+            json_files.append(os.path.basename(json_path))
+            continue
+        pending.append((xml_file, xml_path, json_path))
+    streaming = not args.no_streaming
+
+    try:
+        if args.workers > 1 and len(pending) > 1:
+            workers = min(args.workers, len(pending))
+            # A few chunks per worker keeps the pool busy without paying an IPC round trip per file
+            chunksize = max(1, len(pending) // (workers * 4))
+            logging.info(f"Converting with {workers} worker processes")
+            with process_pool(workers) as executor:
+                # map() yields results in submission order, so the log reads the same as a serial run
+                errors = executor.map(convert_xml_file,
+                                      [xml_path for _, xml_path, _ in pending],
+                                      [json_path for _, _, json_path in pending],
+                                      [streaming] * len(pending), [args.schema] * len(pending),
+                                      chunksize=chunksize)
+                for (xml_file, xml_path, json_path), error in zip(pending, errors):
+                    logging.info(f"Processing {xml_file} ...")
+                    if log_conversion(manifest, version, xml_file, xml_path, json_path, error):
+                        json_files.append(os.path.basename(json_path))
+            return json_files
+
+        for xml_file, xml_path, json_path in pending:
+            logging.info(f"Processing {xml_file} ...")
+            error = convert_xml_file(xml_path, json_path, streaming, args.schema)
+            if log_conversion(manifest, version, xml_file, xml_path, json_path, error):
+                json_files.append(os.path.basename(json_path))
+    finally:
+        manifest.close()
+    return json_files
+
+
+def log_conversion(manifest, version, xml_file, xml_path, json_path, error):
+    """Log the outcome of one conversion and record successful ones in the pipeline manifest; True on success"""
+    if error is None:
+        logging.info(f"Saved JSON to {json_path}")
+        record_done(manifest, MANIFEST_STAGE, xml_path, version, [json_path])
+        return True
+    logging.error(f"Failed to process {xml_file}: {error}")
+    return False
 
 if __name__ == "__main__":
     logging.info("Starting XBRL XML to JSON batch conversion script...")
@@ -0,0 +1,150 @@
+"""
+xbrl_xml_to_table_batch.py
+
+This script
+    - batch-processes all XBRL XML files in the XBRL_XML directory,
+    - parses them straight into columnar tables,
+    - and saves them as Parquet files in the XBRL_XML_JSON_TABLE directory.
+It skips the intermediate JSON files of xbrl_xml_to_json_batch.py / xbrl_json_to_table_batch.py: the parsed facts
+and contexts are written column by column into an Arrow table with the same columns as the CSV output, and the
+filtered table for the configured element names is written alongside it.
+The script logs its progress and errors for easier debugging and traceability.
+"""
+
+import argparse
+import os
+import sys
+import logging
+import xml.etree.ElementTree as ET
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# The shared pipeline modules live in the project root; make them importable when the script is run directly
+# (python xbrl_xml_extractor/<script>.py) and not with python -m from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from xbrl_xml_extractor.xbrl_json_to_table_batch import TABLE_COLUMNS, filter_elements, flatten_context
+from xbrl_xml_extractor.xbrl_xml_to_json_batch import iterparse_xbrl
+from pipeline_manifest import MANIFEST_FILE, is_current, open_manifest, record_done, source_version
+from stage_readiness import ready_files
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+# Name of this stage in the pipeline manifest
+MANIFEST_STAGE = "xbrl_xml_to_table"
+
+# Fact keys feeding the table columns that do not come from the context
+FACT_COLUMNS = {
+    "ElementName": "elementName",
+    "Value": "value",
+    "unitref": "unitRef",
+    "decimals": "decimals",
+    "contextRef": "contextRef"
+}
+
+# Every column holds text, as in the CSV output
+TABLE_SCHEMA = pa.schema([(column, pa.string()) for column in TABLE_COLUMNS])
+
+
+def build_fact_table(contexts, data_elements):
+    """
+    Build the Arrow table of one XBRL instance from its parsed contexts and facts.
+
+    Args:
+        contexts (dict): Contexts by id, as returned by iterparse_xbrl.
+        data_elements (list): Facts without contextDetails, as returned by iterparse_xbrl(embed_contexts=False).
+
+    Returns:
+        pyarrow.Table: One row per fact with the TABLE_COLUMNS columns
+    """
+    flattened_contexts = {context_id: flatten_context(context) for context_id, context in contexts.items()}
+    missing_context = flatten_context(None)
+    columns = {column: [] for column in TABLE_COLUMNS}
+    fact_columns = [(columns[column], key) for column, key in FACT_COLUMNS.items()]
+    context_columns = [(columns[column], column) for column in TABLE_COLUMNS if column not in FACT_COLUMNS]
+
+    for item in data_elements:
+        for values, key in fact_columns:
+            values.append(item.get(key))
+        context = flattened_contexts.get(item.get("contextRef"), missing_context)
+        for values, column in context_columns:
+            values.append(context[column])
+
+    return pa.table(columns, schema=TABLE_SCHEMA)
+
+
+def convert_xml_file_to_parquet(xml_path, parquet_path, filtered_parquet_path):
+    """
+    Parse one XBRL XML file and write its full and filtered Parquet tables.
+
+    Args:
+        xml_path (str): Path of the XBRL XML file.
+        parquet_path (str): Path of the full table.
+        filtered_parquet_path (str): Path of the table limited to filter_elements.
+    """
+    contexts, data_elements = iterparse_xbrl(xml_path, embed_contexts=False)
+    table = build_fact_table(contexts, data_elements)
+
+    pq.write_table(table, parquet_path)
+    logging.info(f"Saved Parquet to {parquet_path}")
+
+    filtered_table = table.filter(pc.is_in(table["ElementName"], value_set=pa.array(filter_elements)))
+    pq.write_table(filtered_table, filtered_parquet_path)
+    logging.info(f"Saved filtered Parquet to {filtered_parquet_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert XBRL XML files in XBRL_XML directly to Parquet tables.")
+    parser.add_argument("--force", action="store_true",
+                        help="Convert every file, even those whose tables are current in the pipeline manifest")
+    args = parser.parse_args(argv)
+
+    project_root = os.path.dirname(os.path.dirname(__file__))
+    xbrl_xml_folder = os.path.join(project_root, "XBRL_XML")
+    table_folder = os.path.join(project_root, "XBRL_XML_JSON_TABLE")
+    os.makedirs(table_folder, exist_ok=True)
+
+    xml_files = ready_files(xbrl_xml_folder, '.xml')
+    if not xml_files:
+        logging.info(f"No XML files found in {xbrl_xml_folder}")
+        return
+
+    logging.info(f"Found {len(xml_files)} XML file(s) in {xbrl_xml_folder}")
+    manifest = open_manifest(os.path.join(project_root, MANIFEST_FILE))
+    version = source_version(__file__)
+    try:
+        for xml_file in xml_files:
+            xml_path = os.path.join(xbrl_xml_folder, xml_file)
+            base_name = os.path.splitext(xml_file)[0]
+            parquet_path = os.path.join(table_folder, base_name + ".parquet")
+            filtered_parquet_path = os.path.join(table_folder, base_name + "_filtered.parquet")
+            if not args.force and is_current(manifest, MANIFEST_STAGE, xml_path, version):
+                logging.info(f"Skipping {xml_file}: tables are current")
+                continue
+            logging.info(f"Processing {xml_file} ...")
+            try:
+                convert_xml_file_to_parquet(xml_path, parquet_path, filtered_parquet_path)
+            except ET.ParseError as e:
+                logging.error(f"Failed to parse XML {xml_file}: {e}")
+            except Exception as e:
+                logging.error(f"Failed to process {xml_file}: {e}")
+            else:
+                record_done(manifest, MANIFEST_STAGE, xml_path, version, [parquet_path, filtered_parquet_path])
+    finally:
+        manifest.close()
+
+
+if __name__ == "__main__":
+    logging.info("Starting XBRL XML to Parquet batch conversion script...")
+    main()